@@ -2,15 +2,35 @@
 # guaguastandup
 # zotero-pdf2zh
 import os
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response
 import base64
 import subprocess
 import json, toml
 import shutil
 from pypdf import PdfReader
-from utils.venv import VirtualEnvManager
+from utils.venv import VirtualEnvManager, stream_process
 from utils.config import Config
 from utils.cropper import Cropper
+from utils.jobs import JobManager
+from utils.admission import AdmissionController, QueueFullError
+from utils.ratelimit import RateBudget, budget_key
+from utils.autotune import QpsAutotuner, ThrottleWatcher
+from utils import metrics
+from utils.blobstore import BlobStore, is_sha256
+from utils.cache import ResultCache
+from utils.workspace import WorkspaceManager
+from utils.worker_pool import EngineWorkerPool, WorkerStartError
+from utils.sharding import PageSharder
+from utils.record import RecordTracker
+from utils.progress import ProgressReporter
+from utils.artifacts import ArtifactGraph
+from utils.serving import SERVE_MODES, serve_waitress, serve_gunicorn, worker_count, resolve_serve_mode
+from werkzeug.exceptions import HTTPException
+from utils import artifacts
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, wait
+import importlib.util
 import traceback
 import argparse
 import sys  # NEW: 用于退出脚本
@@ -18,6 +38,9 @@ import re   # NEW: 用于解析版本号
 import urllib.request # NEW: 用于下载文件
 import zipfile # NEW: 用于解压文件
 import tempfile # 引入tempfile来处理临时目录
+import hashlib
+import time
+from threading import Lock
 import io
 
 _VALUE_ERROR_RE = re.compile(r'(?m)^ValueError:\s*(?P<msg>.+)$')
@@ -49,6 +72,12 @@ else:
 root_path     = os.path.dirname(os.path.abspath(__file__))
 config_folder = os.path.join(root_path, 'config')
 output_folder = os.path.join(root_path, 'translated')
+cache_folder  = os.path.join(root_path, 'cache')
+blob_folder   = os.path.join(cache_folder, 'blobs') # 按sha256存储上传过的PDF
+result_folder = os.path.join(cache_folder, 'results') # 翻译结果缓存
+legacy_rendered_folder = os.path.join(config_folder, 'rendered') # 旧版本为每个请求生成的配置文件(含apiKey), 启动时删除
+record_db     = os.path.join(root_path, 'records', 'records.db') # 翻译记录
+autotune_path = os.path.join(config_folder, 'autotune.json') # qps自动调节学到的值
 config_path = { # 配置文件路径
     pdf2zh:      os.path.join(config_folder, 'config.json'),
     pdf2zh_next: os.path.join(config_folder, 'config.toml'),
@@ -65,36 +94,229 @@ default_env_tool = 'uv' # 默认使用uv管理venv
 enable_venv = True
 
 PORT = 8890     # 默认端口号
+job_workers = 2 # 默认同时执行的任务数
+sse_heartbeat = 15 # SSE心跳间隔(秒)
+record_poll_interval = 1.0 # 多进程模式下查询其他工作进程中任务进度的间隔(秒)
+upload_chunk_size = 1024 * 1024 # 上传文件按1MB分块写入磁盘
+
+# 请求本身有误(例如输入文件类型不匹配), 返回400而不是500
+class RequestError(ValueError):
+    status_code = 400
+
+# 请求中引用的 fileHash 在服务端不存在, 客户端需要重新上传PDF
+class BlobNotFoundError(RequestError):
+    status_code = 404
+
+# 请求体既不是JSON/multipart, 也不是PDF
+class UnsupportedMediaError(RequestError):
+    status_code = 415
+
 class PDFTranslator:
-    def __init__(self, args):
+    # 请求体即为PDF的上传方式接受的类型; 为空时表示没有请求体(只传 fileHash)
+    stream_mimetypes = ('application/pdf', 'application/octet-stream', '')
+
+    # gunicorn 的每个工作进程都会创建一个 PDFTranslator, 此时由主进程统一标记上次未完成的任务(report_interrupted=False)
+    def __init__(self, args, report_interrupted=True):
         self.app = Flask(__name__)
+        if args.max_upload_mb > 0: # 超出时返回413
+            self.app.config['MAX_CONTENT_LENGTH'] = args.max_upload_mb * 1024 * 1024
         if args.enable_venv:
             self.env_manager = VirtualEnvManager(config_path[venv], venv_name, args.env_tool, args.enable_mirror, args.skip_install, args.mirror_source)
+        # pdf2zh_next 常驻工作进程: 虚拟环境模式下由 env_manager 在引擎环境中启动, 否则使用当前python
+        self.engine_workers = None
+        if args.engine_workers > 0:
+            if args.enable_venv:
+                self.env_manager.configure_workers(args.engine_workers, args.worker_max_jobs, args.worker_max_rss_mb)
+            elif importlib.util.find_spec('pdf2zh_next') is not None:
+                self.engine_workers = EngineWorkerPool(sys.executable, args.engine_workers, args.worker_max_jobs, args.worker_max_rss_mb)
+                self.engine_workers.prewarm()
+            else:
+                print("⚠️ 当前python环境中未安装pdf2zh_next, 不启用常驻工作进程")
         self.cropper = Cropper()
+        self.postprocess_executor = None
+        self.postprocess_lock = Lock()
+        self.sharder = PageSharder(args.shard_pages)
+        self.rate_budget = RateBudget()
+        self.autotuner = QpsAutotuner(autotune_path) if args.auto_qps else None
+        self.shard_executor = ThreadPoolExecutor(max_workers=max(1, args.shard_workers), thread_name_prefix='pdf2zh-shard')
+        # 正在执行的任务: (操作, PDF哈希, 配置) -> job, 相同的请求直接复用该任务的结果
+        self.inflight = {}
+        self.inflight_lock = Lock()
+        self.coalesced = 0
+        self.records = RecordTracker(record_db)
+        if report_interrupted:
+            mark_interrupted(self.records)
+        # 同时执行的任务总数为 job_workers, 每个引擎可以单独设置更小的上限
+        self.admission = AdmissionController(args.job_workers, args.max_queue, {pdf2zh: args.pdf2zh_jobs, pdf2zh_next: args.pdf2zh_next_jobs})
+        self.job_manager = JobManager(max_workers=args.job_workers, on_update=self._on_job_update, admission=self.admission, rate_budget=self.rate_budget)
+        self.workspaces = WorkspaceManager(output_folder)
+        self.blob_store = BlobStore(blob_folder, max_bytes=args.blob_store_size * 1024 * 1024, chunk_size=upload_chunk_size)
+        self.result_cache = None
+        if args.enable_result_cache:
+            self.result_cache = ResultCache(result_folder, max_bytes=args.result_cache_size * 1024 * 1024, version=__version__)
+        self.register_gauges()
         self.setup_routes()
 
+    # 抓取 /metrics 时才计算的指标
+    def register_gauges(self):
+        admission_keys = ('key',)
+        metrics.registry.register(metrics.Gauge('pdf2zh_queue_depth', '排队等待执行的任务数', lambda: self.admission.queue_depth()))
+        metrics.registry.register(metrics.Gauge('pdf2zh_jobs_running', '正在执行的任务数', lambda: self.admission.stats()['running'], admission_keys))
+        metrics.registry.register(metrics.Gauge('pdf2zh_jobs_rejected_total', '队列已满被拒绝(429)的任务数', lambda: self.admission.stats()['rejected'], type='counter'))
+        metrics.registry.register(metrics.Gauge('pdf2zh_rate_budget_jobs', '正在使用同一个qps预算翻译的任务数', lambda: {k: v['jobs'] for k, v in self.rate_budget.stats().items()}, ('budget',)))
+        metrics.registry.register(metrics.Gauge('pdf2zh_rate_budget_waiting', '等待qps预算的任务数', lambda: {k: v['waiting'] for k, v in self.rate_budget.stats().items()}, ('budget',)))
+        if self.result_cache:
+            metrics.registry.register(metrics.Gauge('pdf2zh_result_cache_hit_ratio', '翻译结果缓存的命中率(服务重启后仍累计)', lambda: self.result_cache.stats()['hitRate']))
+            metrics.registry.register(metrics.Gauge('pdf2zh_result_cache_bytes', '翻译结果缓存占用的空间(字节)', lambda: self.result_cache.stats()['sizeBytes']))
+
     def setup_routes(self):
         self.app.add_url_rule('/translate', 'translate', self.translate, methods=['POST'])
         self.app.add_url_rule('/crop', 'crop', self.crop, methods=['POST']) 
         self.app.add_url_rule('/crop-compare', 'crop-compare', self.crop_compare, methods=['POST']) 
         self.app.add_url_rule('/compare', 'compare', self.compare, methods=['POST'])
         self.app.add_url_rule('/translatedFile/<filename>', 'download', self.download_file)
+        self.app.add_url_rule('/jobs', 'submit_job', self.submit_job, methods=['POST'])
+        self.app.add_url_rule('/jobs', 'job_stats', self.job_stats, methods=['GET'])
+        self.app.add_url_rule('/jobs/<job_id>', 'job_status', self.job_status, methods=['GET'])
+        self.app.add_url_rule('/jobs/<job_id>/events', 'job_events', self.job_events, methods=['GET'])
+        self.app.add_url_rule('/records', 'list_records', self.list_records, methods=['GET'])
+        self.app.add_url_rule('/blobs/<sha256>', 'head_blob', self.head_blob, methods=['HEAD'])
+        self.app.add_url_rule('/blobs/<sha256>', 'put_blob', self.put_blob, methods=['PUT'])
+        self.app.add_url_rule('/cache/stats', 'cache_stats', self.cache_stats, methods=['GET'])
+        self.app.add_url_rule('/env/status', 'env_status', self.env_status, methods=['GET'])
+        self.app.add_url_rule('/metrics', 'metrics', self.export_metrics, methods=['GET'])
 
     ##################################################################
+    # 支持三种上传方式:
+    # 1. application/json: fileContent 为 base64 编码的PDF (旧版插件)
+    # 2. multipart/form-data: file 字段为PDF, config 字段为JSON格式的配置
+    # 3. application/pdf: 请求体即为PDF, 配置放在 X-Pdf2zh-Config 请求头(JSON或base64编码的JSON)和query参数中
+    # 后两种方式按块写入磁盘, 不需要base64解码, 内存占用与PDF大小无关
+    # 所有上传的文件都会存入 BlobStore, 如果服务端已有该文件(HEAD /blobs/<sha256>), 客户端可以只传 fileHash 而不上传PDF
     def process_request(self):
-        data = request.get_json() # 获取请求的data
-        config = Config(data)
-        
-        file_content = data.get('fileContent', '')
-        if file_content.startswith('data:application/pdf;base64,'):
-            file_content = file_content[len('data:application/pdf;base64,'):]
+        data = self._request_metadata() # 获取请求的data
+        try:
+            config = Config(data)
+        except ValueError as e: # 请求中的参数无效, 例如不支持的保存方式
+            raise RequestError(str(e))
+
+        file_hash = None
+        file_name = data.get('fileName')
+        if request.mimetype == 'application/json':
+            file_content = data.get('fileContent', '')
+            if file_content.startswith('data:application/pdf;base64,'):
+                file_content = file_content[len('data:application/pdf;base64,'):]
+            if file_content:
+                start = time.time()
+                try:
+                    content = base64.b64decode(''.join(file_content.split()), validate=True) # 允许按行折叠的base64
+                except ValueError: # binascii.Error
+                    raise RequestError("fileContent 不是有效的base64编码")
+                if not content:
+                    raise RequestError("上传的文件为空")
+                file_hash, size = self.blob_store.put_bytes(content)
+                metrics.observe_upload('base64', size, time.time() - start)
+        elif request.mimetype == 'multipart/form-data':
+            upload = request.files.get('file')
+            if upload is not None:
+                file_name = file_name or upload.filename
+                file_hash = self._save_upload(upload.stream, file_name, 'multipart')
+        else: # _request_metadata 已经检查了请求类型
+            file_hash = self._save_upload(request.stream, file_name, 'stream')
+
+        if not file_name:
+            raise RequestError("缺少 fileName 参数")
+        if file_hash is None: # 没有上传文件, 使用服务端已有的文件
+            file_hash = data.get('fileHash')
+            if not file_hash:
+                raise RequestError("缺少文件内容, 请上传PDF文件或提供 fileHash")
+            if not self.blob_store.exists(file_hash):
+                raise BlobNotFoundError(f"服务端不存在该文件: {file_hash}, 请重新上传PDF文件")
+        elif data.get('fileHash') and data.get('fileHash') != file_hash:
+            raise RequestError(f"文件哈希不匹配: 期望 {data.get('fileHash')}, 实际为 {file_hash}")
+
+        # 每个任务在独立的工作目录中执行, workspace.input_path表示保存的pdf源文件路径
+        workspace = self.workspaces.create(file_name)
+        try:
+            self.blob_store.materialize(file_hash, workspace.input_path)
+        except FileNotFoundError: # exists() 之后被淘汰
+            workspace.cleanup()
+            raise BlobNotFoundError(f"服务端不存在该文件: {file_hash}, 请重新上传PDF文件")
+        except Exception:
+            workspace.cleanup()
+            raise
+        return workspace, config, file_hash
+
+    # 请求中的配置无效(JSON格式错误, base64解码失败等)时返回400
+    def _request_metadata(self):
+        if request.mimetype == 'application/json':
+            data = request.get_json() or {} # JSON格式错误时 flask 返回400
+        elif request.mimetype == 'multipart/form-data':
+            data = self._parse_json(request.form.get('config') or '{}', 'config 字段')
+            data.update({k: v for k, v in request.form.items() if k != 'config'})
+        elif request.mimetype in self.stream_mimetypes:
+            header = request.headers.get('X-Pdf2zh-Config', '').strip()
+            if header and not header.startswith('{'): # 请求头只能是ASCII, 含中文的配置需要base64编码
+                try:
+                    header = base64.b64decode(header, validate=True).decode('utf-8')
+                except ValueError: # binascii.Error, UnicodeDecodeError
+                    raise RequestError("X-Pdf2zh-Config 请求头不是有效的JSON或base64编码的JSON")
+            data = self._parse_json(header, 'X-Pdf2zh-Config 请求头') if header else {}
+            data.update(request.args.to_dict())
+        else:
+            raise UnsupportedMediaError(f"不支持的请求类型: {request.mimetype}, 可选: application/json, multipart/form-data, {', '.join(m for m in self.stream_mimetypes if m)}")
+        if not isinstance(data, dict):
+            raise RequestError("请求中的配置应为JSON对象")
+        return data
 
-        input_path = os.path.join(output_folder, data['fileName'])
-        with open(input_path, 'wb') as f:
-            f.write(base64.b64decode(file_content))
-        
-        # input_path表示保存的pdf源文件路径
-        return input_path, config
+    @staticmethod
+    def _parse_json(text, name):
+        try:
+            return json.loads(text)
+        except ValueError:
+            raise RequestError(f"{name} 不是有效的JSON")
+
+    def _save_upload(self, stream, file_name, method):
+        start = time.time()
+        file_hash, size = self.blob_store.put_stream(stream)
+        if file_hash:
+            metrics.observe_upload(method, size, time.time() - start)
+            print(f"📥 [Zotero PDF2zh Server] 接收文件: {file_name}, 大小为: {size/1024.0/1024.0:.2f} MB, sha256: {file_hash}")
+        return file_hash
+
+    # HEAD /blobs/<sha256>: 查询服务端是否已有该文件
+    def head_blob(self, sha256):
+        if not self.blob_store.exists(sha256):
+            return '', 404
+        try:
+            return send_file(self.blob_store.path(sha256), mimetype='application/pdf')
+        except FileNotFoundError: # exists() 之后被淘汰
+            return '', 404
+
+    # PUT /blobs/<sha256>: 只上传文件, 之后各接口可以通过 fileHash 引用
+    def put_blob(self, sha256):
+        try:
+            if not is_sha256(sha256):
+                raise RequestError(f"无效的sha256: {sha256}")
+            start = time.time()
+            try:
+                file_hash, size = self.blob_store.put_stream(request.stream, expected_sha256=sha256)
+            except ValueError as e:
+                raise RequestError(str(e))
+            if file_hash is None:
+                raise RequestError("上传的文件为空")
+            metrics.observe_upload('blob', size, time.time() - start)
+            return jsonify({'status': 'success', 'fileHash': file_hash, 'size': size}), 201
+        except Exception as e:
+            return self._handle_exception(e, context='/blobs')
+
+    # 将生成的文件也存入BlobStore, 之后客户端对这些文件做裁剪/对照时无需重新上传
+    def _register_outputs(self, file_list):
+        for path in file_list:
+            try:
+                self.blob_store.put_file(path)
+            except Exception as e:
+                print(f"⚠️ [Zotero PDF2zh Server] 登记文件 {path} 失败: {e}")
 
     # 下载文件 /translatedFile/<filename>
     def download_file(self, filename):
@@ -113,124 +335,373 @@ class PDFTranslator:
             traceback.print_exc()
             return jsonify({'status': 'error', 'message': str(e)}), 500
 
+    ############################# 任务调度 #############################
+    def _submit(self, operation):
+        handlers = {
+            'translate':    self._translate,
+            'crop':         self._crop,
+            'crop-compare': self._crop_compare,
+            'compare':      self._compare,
+        }
+        if operation not in handlers:
+            raise RequestError(f"不支持的操作: {operation}, 目前仅支持: {', '.join(handlers)}")
+        workspace, config, file_hash = self.process_request()
+        input_path = workspace.input_path
+        handler = handlers[operation]
+
+        info = {'fileHash': file_hash, 'config': config.cache_fields()}
+        flight_key = hashlib.sha256(json.dumps([operation, file_hash, info['config']], sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+        cache_key = None
+        if self.result_cache:
+            cache_key = self.result_cache.make_key(operation, file_hash, config.cache_fields())
+            job = self._cached_job(cache_key, operation, workspace, info)
+            metrics.CACHE_LOOKUPS.inc(result='hit' if job else 'miss')
+            if job:
+                return job
+
+        def run(job):
+            try:
+                try:
+                    progress = ProgressReporter(self.records, job.id)
+                    file_list = workspace.publish(handler(input_path, config, progress))
+                finally:
+                    workspace.cleanup()
+                self._register_outputs(file_list)
+                if cache_key:
+                    try:
+                        self.result_cache.put(cache_key, input_path, file_list)
+                    except Exception as e:
+                        print(f"⚠️ [Zotero PDF2zh Server] 写入翻译结果缓存失败: {e}")
+                return file_list
+            finally:
+                # 结果已写入缓存, 之后到达的相同请求直接命中缓存
+                with self.inflight_lock:
+                    if self.inflight.get(flight_key) is job:
+                        del self.inflight[flight_key]
+
+        on_error = lambda exc: self._error_payload(exc, context=f'/{operation}')
+        # 需要调用翻译引擎的任务按引擎分组限制并发; 只对已翻译的文件做裁剪/对照的任务只受总数限制
+        admission_key = 'postprocess'
+        if operation == 'translate' or self.get_filetype(input_path) == 'origin':
+            admission_key = pdf2zh_next if config.engine == pdf2zh_next else pdf2zh
+        self._apply_autotune(config, admission_key)
+        budget = self._rate_budget_for(config, admission_key)
+        # 相同的文件和配置已经在翻译中(例如重复点击), 不再重复调用翻译引擎和翻译服务, 等待同一个任务的结果
+        with self.inflight_lock:
+            job = self.inflight.get(flight_key)
+            if job is not None and not job.done.is_set():
+                workspace.cleanup()
+                self.coalesced += 1
+                print(f"🔗 [Zotero PDF2zh Server] 相同的请求正在执行, 复用任务 {job.id}: {workspace.file_name}")
+                return job
+            # 相同的任务可能恰好在上面查询缓存之后结束(结果已写入缓存, 并已从 inflight 中删除), 再查询一次缓存
+            job = self._cached_job(cache_key, operation, workspace, info, count_miss=False) if cache_key else None
+            if job:
+                return job
+            try:
+                job = self.job_manager.submit(operation, workspace.file_name, run, on_error, info, key=admission_key, budget=budget)
+            except QueueFullError: # 上传的PDF已存入BlobStore, 客户端重试时可以只传 fileHash
+                workspace.cleanup()
+                raise
+            self.inflight[flight_key] = job
+            return job
+
+    # 命中翻译结果缓存时返回已完成的任务, 否则返回 None
+    def _cached_job(self, cache_key, operation, workspace, info, count_miss=True):
+        cached = self.result_cache.get(cache_key, workspace.input_path, output_folder, count_miss)
+        if not cached:
+            return None
+        workspace.cleanup()
+        print(f"⚡ [Zotero PDF2zh Server] 命中翻译结果缓存, 直接返回: {[os.path.basename(p) for p in cached]}")
+        return self.job_manager.add_finished(operation, workspace.file_name, cached, info)
+
+    # 任务状态变化时同步到翻译记录, 并唤醒等待进度的客户端
+    def _on_job_update(self, job):
+        error_message = job.error.get('message') if job.error else None
+        percent = 100.0 if job.status == 'success' else (self.records.get_progress(job.id) or {}).get('percent')
+        files = job.file_names() if job.status == 'success' else None
+        if job.status == 'queued' or self.records.update_record(job.id, job.status, percent, error_message, files) is None:
+            self.records.add_record(job.filename, job.status, job.info.get('config'), error_message, record_id=job.id,
+                                    operation=job.operation, input_hash=job.info.get('fileHash'), files=files)
+        fields = {'status': job.status}
+        if job.status == 'success':
+            fields['percent'] = 100.0
+        self.records.update_progress(job.id, **fields)
+
+    # 同步接口: 提交任务后等待任务结束, 返回值与之前保持一致
+    def _run_sync(self, operation):
+        try:
+            job = self._submit(operation)
+        except Exception as e:
+            return self._handle_exception(e, context=f'/{operation}')
+        self.job_manager.wait(job)
+        if job.status == 'success':
+            return jsonify({'status': 'success', 'fileList': job.file_names()}), 200
+        return jsonify(job.error), job.status_code
+
+    # 异步接口 POST /jobs, 请求体与 /translate 等相同, 通过 operation 字段指定操作(默认translate)
+    def submit_job(self):
+        try:
+            data = self._request_metadata()
+            job = self._submit(data.get('operation', 'translate'))
+            return jsonify({'status': 'success', 'jobId': job.id, 'job': job.to_dict()}), 202
+        except Exception as e:
+            return self._handle_exception(e, context='/jobs')
+
+    # GET /jobs/<job_id>; 不在内存中的任务(例如服务重启前的任务, 或 gunicorn 其他工作进程中的任务)从翻译记录中查询
+    def job_status(self, job_id):
+        job = self.job_manager.get(job_id)
+        if job is None:
+            record = self.records.get_record(job_id)
+            if record is None:
+                return jsonify({'status': 'error', 'message': f'Job not found: {job_id}'}), 404
+            return jsonify({'status': 'success', 'job': record}), 200
+        data = job.to_dict()
+        data['progress'] = self.records.get_progress(job_id)
+        return jsonify({'status': 'success', 'job': data}), 200
+
+    # GET /jobs/<job_id>/events: 以 Server-Sent Events 推送任务进度, 任务结束时发送 done 事件后关闭
+    # 没有新进度时每隔 sse_heartbeat 秒发送一次注释行, 保持连接并让客户端判断服务端是否存活
+    def job_events(self, job_id):
+        job = self.job_manager.get(job_id)
+        if job is None:
+            record = self.records.get_record(job_id)
+            if record is None:
+                return jsonify({'status': 'error', 'message': f'Job not found: {job_id}'}), 404
+            if record['status'] in ('queued', 'running'): # 在其他工作进程中执行
+                headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+                return Response(self._poll_record_events(job_id), mimetype='text/event-stream', headers=headers)
+            done = f"event: done\ndata: {json.dumps(record, ensure_ascii=False)}\n\n"
+            return Response([done], mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+        def stream():
+            version = -1
+            while True:
+                entry = self.records.wait_progress(job_id, version, sse_heartbeat)
+                if entry is not None:
+                    version = entry['version']
+                    yield f"event: progress\ndata: {json.dumps(entry, ensure_ascii=False)}\n\n"
+                elif not job.done.is_set():
+                    yield ": heartbeat\n\n"
+                if job.done.is_set():
+                    yield f"event: done\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+                    return
+
+        headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        return Response(stream(), mimetype='text/event-stream', headers=headers)
+
+    # 多进程模式下任务可能在其他工作进程中执行, 只能从翻译记录中轮询进度(进度按 persist_interval 节流写入数据库)
+    def _poll_record_events(self, job_id):
+        version, idle = -1, 0.0
+        while True:
+            record = self.records.get_record(job_id)
+            if record is None or record['status'] not in ('queued', 'running'):
+                yield f"event: done\ndata: {json.dumps(record or {'jobId': job_id}, ensure_ascii=False)}\n\n"
+                return
+            progress = record['progress']
+            if progress and progress.get('version', 0) > version:
+                version, idle = progress['version'], 0.0
+                yield f"event: progress\ndata: {json.dumps(progress, ensure_ascii=False)}\n\n"
+            elif idle >= sse_heartbeat:
+                idle = 0.0
+                yield ": heartbeat\n\n"
+            time.sleep(record_poll_interval)
+            idle += record_poll_interval
+
+    # GET /records?page=1&pageSize=20&status=success&fileHash=<sha256>: 翻译记录, 按创建时间倒序分页
+    def list_records(self):
+        try:
+            page = max(1, int(request.args.get('page', 1)))
+            page_size = min(200, max(1, int(request.args.get('pageSize', 20))))
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'page 和 pageSize 必须是整数'}), 400
+        result = self.records.list_records(page, page_size, request.args.get('status'), request.args.get('fileHash'))
+        return jsonify({'status': 'success', **result}), 200
+
+    # GET /jobs
+    def job_stats(self):
+        stats = self.job_manager.stats()
+        with self.inflight_lock:
+            stats['inflight'] = len(self.inflight)
+            stats['coalesced'] = self.coalesced
+        stats['admission'] = self.admission.stats()
+        stats['rateBudget'] = self.rate_budget.stats()
+        if self.autotuner:
+            stats['autotune'] = self.autotuner.stats()
+        return jsonify({'status': 'success', 'stats': stats}), 200
+
+    # GET /cache/stats: 翻译结果缓存命中率
+    def cache_stats(self):
+        if not self.result_cache:
+            return jsonify({'status': 'success', 'enabled': False}), 200
+        return jsonify({'status': 'success', 'enabled': True, 'stats': self.result_cache.stats()}), 200
+
+    # GET /env/status: 已缓存的虚拟环境解析结果
+    def env_status(self):
+        if not args.enable_venv:
+            workers = self.engine_workers.status() if self.engine_workers else None
+            return jsonify({'status': 'success', 'enabled': False, 'workers': workers}), 200
+        return jsonify({'status': 'success', 'enabled': True, 'envs': self.env_manager.status()}), 200
+
+    # GET /metrics: Prometheus 文本格式的监控指标
+    def export_metrics(self):
+        return Response(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
     ############################# 核心逻辑 #############################
     # 翻译 /translate
     def translate(self):
-        try:
-            input_path, config = self.process_request()
-            infile_type = self.get_filetype(input_path)
-            engine = config.engine
-            if infile_type != 'origin':
-                return jsonify({'status': 'error', 'message': 'Input file must be an original PDF file.'}), 400
-            if engine == pdf2zh:
-                print("🔍 [Zotero PDF2zh Server] PDF2zh 开始翻译文件...")
-                fileList = self.translate_pdf(input_path, config)
-                mono_path, dual_path = fileList[0], fileList[1]
-                if config.mono_cut:
-                    mono_cut_path = self.get_filename_after_process(mono_path, 'mono-cut', engine)
-                    self.cropper.crop_pdf(config, mono_path, 'mono', mono_cut_path, 'mono-cut', dualFirst=config.trans_first, engine=engine)
-                    if os.path.exists(mono_cut_path):
-                        fileList.append(mono_cut_path)
-                if config.dual_cut:
-                    dual_cut_path = self.get_filename_after_process(dual_path, 'dual-cut', engine)
-                    self.cropper.crop_pdf(config, dual_path, 'dual', dual_cut_path, 'dual-cut', dualFirst=config.trans_first, engine=engine)
-                    if os.path.exists(dual_cut_path):
-                        fileList.append(dual_cut_path)
-                if config.crop_compare:
-                    crop_compare_path = self.get_filename_after_process(dual_path, 'crop-compare', engine)
-                    self.cropper.crop_pdf(config, dual_path, 'dual', crop_compare_path, 'crop-compare', dualFirst=config.trans_first, engine=engine)
-                    if os.path.exists(crop_compare_path):
-                        fileList.append(crop_compare_path)
-                if config.compare and config.babeldoc == False: # babeldoc不支持compare
-                    compare_path = self.get_filename_after_process(dual_path, 'compare', engine)
-                    self.cropper.merge_pdf(dual_path, compare_path, dualFirst=config.trans_first, engine=engine)
-                    if os.path.exists(compare_path):
-                        fileList.append(compare_path)
-                
-            elif engine == pdf2zh_next:
-                print("🔍 [Zotero PDF2zh Server] PDF2zh_next 开始翻译文件...")
-                if config.mono_cut or config.mono:
-                    config.no_mono = False
-                if config.dual or config.dual_cut or config.crop_compare or config.compare:
-                    config.no_dual = False
-
-                if config.no_dual and config.no_mono:
-                    raise ValueError("⚠️ [Zotero PDF2zh Server] pdf2zh_next 引擎至少需要生成 mono 或 dual 文件, 请检查 no_dual 和 no_mono 配置项")
-
-                fileList = []
-                retList = self.translate_pdf_next(input_path, config)
-
-                if config.no_mono:
-                    dual_path = retList[0]
-                elif config.no_dual:
-                    mono_path = retList[0]
-                    fileList.append(mono_path)
-                else:
-                    mono_path, dual_path = retList[0], retList[1]
-                    fileList.append(mono_path)
-                
-                if config.dual_cut or config.crop_compare or config.compare:
-                    LR_dual_path = dual_path.replace('.dual.pdf', '.LR_dual.pdf')
-                    TB_dual_path = dual_path.replace('.dual.pdf', '.TB_dual.pdf')
-                    if config.dual_mode == 'LR':
-                        self.cropper.pdf_dual_mode(dual_path, 'LR', 'TB')
-                        if config.dual:
-                            fileList.append(LR_dual_path)
-                    elif config.dual_mode == 'TB':
-                        os.rename(dual_path, TB_dual_path)
-                        if config.dual:
-                            fileList.append(TB_dual_path)
-                elif config.dual:
-                    fileList.append(dual_path)
-
-                if config.mono_cut:
-                    mono_cut_path = self.get_filename_after_process(mono_path, 'mono-cut', engine)
-                    self.cropper.crop_pdf(config, mono_path, 'mono', mono_cut_path, 'mono-cut', dualFirst=config.trans_first, engine=engine)
-                    if os.path.exists(mono_cut_path):
-                        fileList.append(mono_cut_path)
-
-                if config.dual_cut: # use TB_dual_path
-                    dual_cut_path = self.get_filename_after_process(TB_dual_path, 'dual-cut', engine)
-                    self.cropper.crop_pdf(config, TB_dual_path, 'dual', dual_cut_path, 'dual-cut', dualFirst=config.trans_first, engine=engine)
-                    if os.path.exists(dual_cut_path):
-                        fileList.append(dual_cut_path)
-
-                if config.crop_compare: # use TB_dual_path
-                    crop_compare_path = self.get_filename_after_process(TB_dual_path, 'crop-compare', engine)
-                    self.cropper.crop_pdf(config, TB_dual_path, 'dual', crop_compare_path, 'crop-compare', dualFirst=config.trans_first, engine=engine)
-                    if os.path.exists(crop_compare_path):
-                        fileList.append(crop_compare_path)
-
-                if config.compare: # use TB_dual_path
-                    if config.dual_mode == 'TB':
-                        compare_path = self.get_filename_after_process(TB_dual_path, 'compare', engine)
-                        self.cropper.merge_pdf(TB_dual_path, compare_path, dualFirst=config.trans_first, engine=engine)
-                        if os.path.exists(compare_path):
-                            fileList.append(compare_path)
-                    else:
-                        print("🐲 无需生成compare文件, 等同于dual文件(Left&Right)")
+        return self._run_sync('translate')
+
+    def _translate(self, input_path, config, progress=None):
+        infile_type = self.get_filetype(input_path)
+        engine = config.engine
+        if infile_type != 'origin':
+            raise RequestError('Input file must be an original PDF file.')
+        graph = ArtifactGraph()
+        settings = artifacts.crop_settings(config)
+        first = config.trans_first
+        leaves = []
+        if engine == pdf2zh:
+            print("🔍 [Zotero PDF2zh Server] PDF2zh 开始翻译文件...")
+            mono_path, dual_path = self._translate_sharded(self.translate_pdf, input_path, config, progress)
+            graph.add('mono', mono_path)
+            graph.add('dual', dual_path)
+            leaves = ['mono', 'dual']
+            if config.mono_cut:
+                path = self.get_filename_after_process(mono_path, 'mono-cut', engine)
+                graph.add('mono-cut', path, artifacts.crop, (settings, mono_path, 'mono', path, 'mono-cut', first, engine, config.save_profile_for('mono-cut')), deps=['mono'], chunked=True)
+                leaves.append('mono-cut')
+            outputs = [name for name, enabled in [
+                ('dual-cut', config.dual_cut),
+                ('crop-compare', config.crop_compare),
+                ('compare', config.compare and config.babeldoc == False), # babeldoc不支持compare
+            ] if enabled]
+            self._add_dual_outputs(graph, leaves, config, settings, 'dual', dual_path, outputs)
+
+        elif engine == pdf2zh_next:
+            print("🔍 [Zotero PDF2zh Server] PDF2zh_next 开始翻译文件...")
+            if config.mono_cut or config.mono:
+                config.no_mono = False
+            if config.dual or config.dual_cut or config.crop_compare or config.compare:
+                config.no_dual = False
+
+            if config.no_dual and config.no_mono:
+                raise ValueError("⚠️ [Zotero PDF2zh Server] pdf2zh_next 引擎至少需要生成 mono 或 dual 文件, 请检查 no_dual 和 no_mono 配置项")
+
+            # 上下交替(TB)的双语文件中包含了mono的所有页面, 此时只让引擎生成双语文件, 再按页提取mono, 省去引擎渲染和保存mono的时间
+            # 不需要返回LR双语文件时, 也直接生成TB双语文件, 省去LR到TB的拆分
+            dual_mode = config.dual_mode
+            derive_mono = not config.no_mono and not config.no_dual and (config.dual_mode == 'TB' or not config.dual)
+            if derive_mono:
+                print("🐲 引擎只生成上下交替(TB)的双语文件, mono文件从双语文件中提取")
+                config.no_mono = True
+                config.dual_mode = 'TB'
+
+            retList = self._translate_sharded(self.translate_pdf_next, input_path, config, progress)
+            if config.no_mono:
+                dual_path = retList[0]
+            elif config.no_dual:
+                mono_path = retList[0]
             else:
-                raise ValueError(f"⚠️ [Zotero PDF2zh Server] 输入了不支持的翻译引擎: {engine}, 目前脚本仅支持: pdf2zh/pdf2zh_next")
-            
-            fileNameList = [os.path.basename(path) for path in fileList]
-            existing = [p for p in fileList if os.path.exists(p)]
-            missing  = [p for p in fileList if not os.path.exists(p)]
-
-            for m in missing:
-                print(f"⚠️ 期望生成但不存在: {m}")
-            for f in existing:
-                size = os.path.getsize(f)
-                print(f"🐲 翻译成功, 生成文件: {f}, 大小为: {size/1024.0/1024.0:.2f} MB")
+                mono_path, dual_path = retList[0], retList[1]
+            if derive_mono:
+                config.no_mono = False
+                mono_path = dual_path.replace('.dual.pdf', '.mono.pdf')
+            elif not config.no_mono:
+                graph.add('mono', mono_path)
+            if not config.no_mono:
+                leaves.append('mono')
+            if not config.no_dual:
+                graph.add('dual', dual_path)
+
+            if config.dual_cut or config.crop_compare or config.compare:
+                # 裁剪和拼接都基于上下交替(TB)的双语文件
+                LR_dual_path = dual_path.replace('.dual.pdf', '.LR_dual.pdf')
+                TB_dual_path = dual_path.replace('.dual.pdf', '.TB_dual.pdf')
+                if config.dual_mode == 'LR':
+                    graph.add('LR_dual', LR_dual_path, artifacts.rename, (dual_path, LR_dual_path), deps=['dual'], inline=True)
+                    graph.add('TB_dual', TB_dual_path, artifacts.split, (LR_dual_path, TB_dual_path, config.crop_mode, config.save_profile_for('TB_dual')), deps=['LR_dual'], chunked=True)
+                    if config.dual:
+                        leaves.append('LR_dual')
+                elif config.dual_mode == 'TB':
+                    graph.add('TB_dual', TB_dual_path, artifacts.rename, (dual_path, TB_dual_path), deps=['dual'], inline=True)
+                    if config.dual:
+                        leaves.append('TB_dual')
+            elif config.dual:
+                leaves.append('dual')
+
+            if derive_mono: # TB_dual 由 dual 改名而来, 改名后从 TB_dual 中提取
+                source, source_path = ('TB_dual', TB_dual_path) if 'TB_dual' in graph.nodes else ('dual', dual_path)
+                graph.add('mono', mono_path, artifacts.extract_mono, (source_path, mono_path, config.trans_first, config.save_profile_for('mono', 'fast')), deps=[source])
+
+            if config.mono_cut:
+                path = self.get_filename_after_process(mono_path, 'mono-cut', engine)
+                graph.add('mono-cut', path, artifacts.crop, (settings, mono_path, 'mono', path, 'mono-cut', first, engine, config.save_profile_for('mono-cut')), deps=['mono'], chunked=True)
+                leaves.append('mono-cut')
+
+            # use TB_dual_path
+            outputs = [name for name, enabled in [
+                ('dual-cut', config.dual_cut),
+                ('crop-compare', config.crop_compare),
+                ('compare', config.compare and dual_mode == 'TB'),
+            ] if enabled]
+            if config.compare and dual_mode != 'TB':
+                print("🐲 无需生成compare文件, 等同于dual文件(Left&Right)")
+            if outputs:
+                self._add_dual_outputs(graph, leaves, config, settings, 'TB_dual', TB_dual_path, outputs)
+        else:
+            raise ValueError(f"⚠️ [Zotero PDF2zh Server] 输入了不支持的翻译引擎: {engine}, 目前脚本仅支持: pdf2zh/pdf2zh_next")
+        
+        if progress:
+            progress.stage('postprocess')
+        fileList = list(graph.run(leaves, self._postprocess_pool(), progress).values())
+        existing = [p for p in fileList if os.path.exists(p)]
+        missing  = [p for p in fileList if not os.path.exists(p)]
+
+        for m in missing:
+            print(f"⚠️ 期望生成但不存在: {m}")
+        for f in existing:
+            size = os.path.getsize(f)
+            print(f"🐲 翻译成功, 生成文件: {f}, 大小为: {size/1024.0/1024.0:.2f} MB")
 
-            if not existing:
-                return jsonify({'status': 'error', 'message': '操作失败，请查看详细日志。'}), 500
+        if not existing:
+            raise RuntimeError('操作失败，请查看详细日志。')
+        return existing
 
-            fileNameList = [os.path.basename(p) for p in existing]
-            return jsonify({'status': 'success', 'fileList': fileNameList}), 200
-        except Exception as e:
-            return self._handle_exception(e, context='/translate')
+    # 从双语文件生成 dual-cut / crop-compare / compare
+    # 需要生成多个时合并为一个节点: 只打开一次双语文件, dual-cut 和 crop-compare 共享各栏的 redaction 结果
+    def _add_dual_outputs(self, graph, leaves, config, settings, source, source_path, outfile_types):
+        engine, first = config.engine, config.trans_first
+        outputs = {}
+        for outfile_type in outfile_types:
+            path = self.get_filename_after_process(source_path, outfile_type, engine)
+            outputs[outfile_type] = (path, config.save_profile_for(outfile_type, 'balanced' if outfile_type == 'compare' else 'compact'))
+        if len(outputs) > 1:
+            paths = tuple(path for path, _ in outputs.values())
+            graph.add('dual-outputs', paths, artifacts.dual_outputs, (settings, source_path, outputs, first, engine), deps=[source], chunked=True)
+            for outfile_type, (path, _) in outputs.items():
+                graph.add(outfile_type, path, deps=['dual-outputs'])
+        else:
+            for outfile_type, (path, save_profile) in outputs.items():
+                if outfile_type == 'compare':
+                    graph.add(outfile_type, path, artifacts.merge, (source_path, path, first, engine, save_profile), deps=[source])
+                else:
+                    graph.add(outfile_type, path, artifacts.crop, (settings, source_path, 'dual', path, outfile_type, first, engine, save_profile), deps=[source], chunked=True)
+        leaves.extend(outputs)
 
     def _handle_exception(self, exc, status_code=500, context=None):
+        payload, status_code = self._error_payload(exc, status_code, context)
+        response = jsonify(payload)
+        if isinstance(exc, QueueFullError):
+            response.headers['Retry-After'] = str(exc.retry_after)
+        return response, status_code
+
+    # 生成错误信息, 任务线程中没有flask上下文, 因此这里只返回dict
+    def _error_payload(self, exc, status_code=500, context=None):
+        if isinstance(exc, QueueFullError): # 正常的限流, 不打印调用栈
+            print(f"⏳ [Zotero PDF2zh Server] {context or ''} {exc}")
+            metrics.FAILURES.inc(endpoint=context or '', errorType='QueueFullError')
+            return {'status': 'error', 'ok': False, 'errorType': 'QueueFullError', 'message': str(exc), 'retryAfter': exc.retry_after}, exc.status_code
         if context:
             print(f"⚠️ [Zotero PDF2zh Server] {context} Error: {exc}")
         else:
@@ -245,11 +716,19 @@ class PDFTranslator:
         error_type = info.get('errorType')
         if error_type:
             payload['errorType'] = error_type
+        metrics.FAILURES.inc(endpoint=context or '', errorType=error_type or '')
         if isinstance(exc, subprocess.CalledProcessError):
             payload['exitCode'] = exc.returncode
-        return jsonify(payload), status_code
+        if isinstance(exc, HTTPException): # 例如上传的文件超过 --max_upload_mb
+            status_code = exc.code
+        return payload, getattr(exc, 'status_code', status_code)
 
     def _derive_error_info(self, exc):
+        if isinstance(exc, RequestError):
+            return {
+                'errorType': exc.__class__.__name__,
+                'message': str(exc),
+            }
         parts = []
         if isinstance(exc, subprocess.CalledProcessError) and getattr(exc, 'stderr', None):
             parts.append(exc.stderr)
@@ -313,117 +792,111 @@ class PDFTranslator:
 
     # 裁剪 /crop
     def crop(self):
-        try:
-            input_path, config = self.process_request()
-            infile_type = self.get_filetype(input_path)
+        return self._run_sync('crop')
 
-            new_type = self.get_filetype_after_crop(input_path)
-            if new_type == 'unknown':
-                return jsonify({'status': 'error', 'message': f'Input file is not valid PDF type {infile_type} for crop()'}), 400
+    def _crop(self, input_path, config, progress=None):
+        infile_type = self.get_filetype(input_path)
 
-            new_path = self.get_filename_after_process(input_path, new_type, config.engine)
-            self.cropper.crop_pdf(config, input_path, infile_type, new_path, new_type, dualFirst=config.trans_first, engine=config.engine)
+        new_type = self.get_filetype_after_crop(input_path)
+        if new_type == 'unknown':
+            raise RequestError(f'Input file is not valid PDF type {infile_type} for crop()')
 
-            print(f"🔍 [Zotero PDF2zh Server] 开始裁剪文件: {input_path}, {infile_type}, 裁剪类型: {new_type}, {new_path}")
-            
-            if os.path.exists(new_path):
-                fileName = os.path.basename(new_path)
-                return jsonify({'status': 'success', 'fileList': [fileName]}), 200
-            else:
-                return jsonify({'status': 'error', 'message': f'Crop failed: {new_path} not found'}), 500
-        except Exception as e:
-            return self._handle_exception(e, context='/crop')
+        new_path = self.get_filename_after_process(input_path, new_type, config.engine)
+        with metrics.artifact_timer(new_type, new_path):
+            self.cropper.crop_pdf(config, input_path, infile_type, new_path, new_type, dualFirst=config.trans_first, engine=config.engine, executor=self._postprocess_pool(), save_profile=config.save_profile_for(new_type))
+
+        print(f"🔍 [Zotero PDF2zh Server] 开始裁剪文件: {input_path}, {infile_type}, 裁剪类型: {new_type}, {new_path}")
+        
+        if not os.path.exists(new_path):
+            raise RuntimeError(f'Crop failed: {new_path} not found')
+        return [new_path]
 
     def crop_compare(self):
-        try:
-            input_path, config = self.process_request()
-            infile_type = self.get_filetype(input_path)
-            engine = config.engine
-
-            if infile_type == 'origin':
-                if engine == pdf2zh or engine != pdf2zh_next: # 默认为pdf2zh
-                    config.engine = 'pdf2zh'
-                    fileList = self.translate_pdf(input_path, config)
-                    dual_path = fileList[1] # 会生成mono和dual文件
-                    if not os.path.exists(dual_path):
-                        return jsonify({'status': 'error', 'message': f'Unable to translate origin file, could not generate: {dual_path}'}), 500
-                    input_path = dual_path # crop_compare输入的是dual路径的文件
-
-                else: # pdf2zh_next
-                    config.dual_mode = 'TB'
-                    config.no_dual = False
-                    config.no_mono = True
-                    fileList = self.translate_pdf_next(input_path, config)
-                    dual_path = fileList[0] # 仅生成dual文件
-                    if not os.path.exists(dual_path):
-                        return jsonify({'status': 'error', 'message': f'Dual file not found: {dual_path}'}), 500
-                    input_path = dual_path
-
-            infile_type = self.get_filetype(input_path)
-            new_type = self.get_filetype_after_cropCompare(input_path)
-            if new_type == 'unknown':
-                return jsonify({'status': 'error', 'message': f'Input file is not valid PDF type {infile_type} for crop-compare()'}), 400
-            
-            new_path = self.get_filename_after_process(input_path, new_type, engine)
+        return self._run_sync('crop-compare')
+
+    def _crop_compare(self, input_path, config, progress=None):
+        infile_type = self.get_filetype(input_path)
+        engine = config.engine
+
+        if infile_type == 'origin':
+            if engine == pdf2zh or engine != pdf2zh_next: # 默认为pdf2zh
+                config.engine = 'pdf2zh'
+                fileList = self._translate_sharded(self.translate_pdf, input_path, config, progress)
+                dual_path = fileList[1] # 会生成mono和dual文件
+                if not os.path.exists(dual_path):
+                    raise RuntimeError(f'Unable to translate origin file, could not generate: {dual_path}')
+                input_path = dual_path # crop_compare输入的是dual路径的文件
+
+            else: # pdf2zh_next
+                config.dual_mode = 'TB'
+                config.no_dual = False
+                config.no_mono = True
+                fileList = self._translate_sharded(self.translate_pdf_next, input_path, config, progress)
+                dual_path = fileList[0] # 仅生成dual文件
+                if not os.path.exists(dual_path):
+                    raise RuntimeError(f'Dual file not found: {dual_path}')
+                input_path = dual_path
+
+        infile_type = self.get_filetype(input_path)
+        new_type = self.get_filetype_after_cropCompare(input_path)
+        if new_type == 'unknown':
+            raise RequestError(f'Input file is not valid PDF type {infile_type} for crop-compare()')
+        
+        new_path = self.get_filename_after_process(input_path, new_type, engine)
+        with metrics.artifact_timer(new_type, new_path):
             if infile_type == 'dual-cut':
-                self.cropper.merge_pdf(input_path, new_path, dualFirst=config.trans_first, engine=engine)
+                self.cropper.merge_pdf(input_path, new_path, dualFirst=config.trans_first, engine=engine, save_profile=config.save_profile_for(new_type, 'balanced'))
             else:
-                new_path = self.get_filename_after_process(input_path, new_type, engine)
-                self.cropper.crop_pdf(config, input_path, infile_type, new_path, new_type, dualFirst=config.trans_first, engine=engine)
-            if os.path.exists(new_path):
-                fileName = os.path.basename(new_path)
-                size = os.path.getsize(new_path)
-                print(f"🐲 双语对照成功(裁剪后拼接), 生成文件: {fileName}, 大小为: {size/1024.0/1024.0:.2f} MB")
-                return jsonify({'status': 'success', 'fileList': [fileName]}), 200
-            else:
-                return jsonify({'status': 'error', 'message': f'Crop-compare failed: {new_path} not found'}), 500
-        except Exception as e:
-            return self._handle_exception(e, context='/crop-compare')
+                self.cropper.crop_pdf(config, input_path, infile_type, new_path, new_type, dualFirst=config.trans_first, engine=engine, executor=self._postprocess_pool(), save_profile=config.save_profile_for(new_type))
+        if not os.path.exists(new_path):
+            raise RuntimeError(f'Crop-compare failed: {new_path} not found')
+        size = os.path.getsize(new_path)
+        print(f"🐲 双语对照成功(裁剪后拼接), 生成文件: {os.path.basename(new_path)}, 大小为: {size/1024.0/1024.0:.2f} MB")
+        return [new_path]
 
     # /compare
     def compare(self):
-        try:
-            input_path, config = self.process_request()
-            infile_type = self.get_filetype(input_path)
-            engine = config.engine
-            if infile_type == 'origin': 
-                if engine == pdf2zh or engine != pdf2zh_next:
-                    config.engine = 'pdf2zh'
-                    fileList = self.translate_pdf(input_path, config)
-                    dual_path = fileList[1]
-                    if not os.path.exists(dual_path):
-                        return jsonify({'status': 'error', 'message': f'Dual file not found: {dual_path}'}), 500
-                    input_path = dual_path
-                    infile_type = self.get_filetype(input_path)
-                    new_type = self.get_filetype_after_compare(input_path)
-                    if new_type == 'unknown':
-                        return jsonify({'status': 'error', 'message': f'Input file is not valid PDF type {infile_type} for compare()'}), 400
-                    new_path = self.get_filename_after_process(input_path, new_type, engine)
-                    self.cropper.merge_pdf(input_path, new_path, dualFirst=config.trans_first, engine=engine)
-                else:
-                    config.dual_mode = 'LR' # 直接生成dualMode为LR的文件, 就是Compare模式
-                    config.no_dual = False
-                    config.no_mono = True
-                    fileList = self.translate_pdf_next(input_path, config)
-                    dual_path = fileList[0]
-                    if not os.path.exists(dual_path):
-                        return jsonify({'status': 'error', 'message': f'Dual file not found: {dual_path}'}), 500
-                    new_path = self.get_filename_after_process(input_path, 'compare', engine)
-                    os.rename(dual_path, new_path) # 直接将dual文件重命名为compare文件
-            else:
+        return self._run_sync('compare')
+
+    def _compare(self, input_path, config, progress=None):
+        infile_type = self.get_filetype(input_path)
+        engine = config.engine
+        if infile_type == 'origin': 
+            if engine == pdf2zh or engine != pdf2zh_next:
+                config.engine = 'pdf2zh'
+                fileList = self._translate_sharded(self.translate_pdf, input_path, config, progress)
+                dual_path = fileList[1]
+                if not os.path.exists(dual_path):
+                    raise RuntimeError(f'Dual file not found: {dual_path}')
+                input_path = dual_path
+                infile_type = self.get_filetype(input_path)
                 new_type = self.get_filetype_after_compare(input_path)
                 if new_type == 'unknown':
-                    return jsonify({'status': 'error', 'message': f'Input file is not valid PDF type {infile_type} for compare()'}), 400
+                    raise RequestError(f'Input file is not valid PDF type {infile_type} for compare()')
                 new_path = self.get_filename_after_process(input_path, new_type, engine)
-                self.cropper.merge_pdf(input_path, new_path, dualFirst=config.trans_first, engine=engine)
-            if os.path.exists(new_path):
-                fileName = os.path.basename(new_path)
-                print(f"🐲 双语对照成功, 生成文件: {fileName}, 大小为: {os.path.getsize(new_path)/1024.0/1024.0:.2f} MB")
-                return jsonify({'status': 'success', 'fileList': [fileName]}), 200
+                with metrics.artifact_timer(new_type, new_path):
+                    self.cropper.merge_pdf(input_path, new_path, dualFirst=config.trans_first, engine=engine, save_profile=config.save_profile_for(new_type, 'balanced'))
             else:
-                return jsonify({'status': 'error', 'message': f'Compare failed: {new_path} not found'}), 500
-        except Exception as e:
-            return self._handle_exception(e, context='/compare')
+                config.dual_mode = 'LR' # 直接生成dualMode为LR的文件, 就是Compare模式
+                config.no_dual = False
+                config.no_mono = True
+                fileList = self._translate_sharded(self.translate_pdf_next, input_path, config, progress)
+                dual_path = fileList[0]
+                if not os.path.exists(dual_path):
+                    raise RuntimeError(f'Dual file not found: {dual_path}')
+                new_path = self.get_filename_after_process(input_path, 'compare', engine)
+                os.rename(dual_path, new_path) # 直接将dual文件重命名为compare文件
+        else:
+            new_type = self.get_filetype_after_compare(input_path)
+            if new_type == 'unknown':
+                raise RequestError(f'Input file is not valid PDF type {infile_type} for compare()')
+            new_path = self.get_filename_after_process(input_path, new_type, engine)
+            with metrics.artifact_timer(new_type, new_path):
+                self.cropper.merge_pdf(input_path, new_path, dualFirst=config.trans_first, engine=engine, save_profile=config.save_profile_for(new_type, 'balanced'))
+        if not os.path.exists(new_path):
+            raise RuntimeError(f'Compare failed: {new_path} not found')
+        print(f"🐲 双语对照成功, 生成文件: {os.path.basename(new_path)}, 大小为: {os.path.getsize(new_path)/1024.0/1024.0:.2f} MB")
+        return [new_path]
 
     def get_filetype(self, path):
         if 'mono.pdf' in path:
@@ -481,9 +954,155 @@ class PDFTranslator:
                 return inpath.replace('.pdf', f'.{outtype}.pdf')
             return inpath.replace(f'{intype}.pdf', f'{outtype}.pdf')
 
-    def translate_pdf(self, input_path, config):
-        # TODO: 如果翻译失败了, 自动执行跳过字体子集化, 并且显示生成的文件的大小
-        config.update_config_file(config_path[pdf2zh])
+    # 后处理(裁剪, 拼接)的进程池, 第一次使用时创建; PyMuPDF 在线程中无法并行, 因此使用进程
+    # 使用 spawn 而不是 fork, 避免在多线程的服务进程中 fork 导致子进程死锁
+    def _postprocess_pool(self):
+        if args.postprocess_workers <= 1:
+            return None
+        with self.postprocess_lock:
+            if self.postprocess_executor is None:
+                self.postprocess_executor = ProcessPoolExecutor(max_workers=args.postprocess_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self.postprocess_executor
+
+    # 引擎的输出文件写入输入文件所在的目录(即任务的工作目录)
+    # 长文档按页拆分, 各分片并行调用 translate, 再拼接成完整的 mono / dual 文件; 不需要分片时直接调用 translate
+    # pdf2zh 1.x 的输出未做字体子集化(见 translate_pdf), 翻译完成后在服务端子集化
+    def _translate_sharded(self, translate, input_path, config, progress=None):
+        if self.autotuner and translate == self.translate_pdf_next and progress and config.qps:
+            output_files = self._translate_autotuned(translate, input_path, config, progress)
+        else:
+            output_files = self._translate_with_budget(translate, input_path, config, progress)
+        if translate == self.translate_pdf and not config.skip_font_subsets:
+            self._subset_fonts(output_files, config, progress)
+        return output_files
+
+    # mono 和 dual 在进程池中同时子集化; 子集化失败不影响翻译结果, 只是文件较大
+    def _subset_fonts(self, paths, config, progress=None):
+        paths = [p for p in paths if os.path.exists(p)]
+        if progress:
+            progress.stage('subset-fonts')
+        jobs = [(p, config.save_profile_for(self.get_filetype(p), 'balanced')) for p in paths]
+        executor = self._postprocess_pool()
+        if executor is None or len(jobs) < 2:
+            for job in jobs:
+                artifacts.subset_fonts(*job)
+            return
+        wait([executor.submit(artifacts.subset_fonts, *job) for job in jobs])
+
+    # 同一个翻译服务和apiKey的任务共用请求中设置的 qps(见 ratelimit.py); 份额在任务开始前由 JobManager 取得
+    # 分到的份额小于请求的qps时, 按比例缩小 qps, 线程数和 pool_size
+    # watcher 为 qps自动调节的 ThrottleWatcher, 在引擎启动前开始计时并记录实际使用的qps
+    def _translate_with_budget(self, translate, input_path, config, progress=None, watcher=None):
+        share = self._budget_share(progress)
+        if not share or share >= config.qps:
+            if watcher:
+                watcher.start(config.qps)
+            return self._translate_shards(translate, input_path, config, progress)
+        limits = config.scale_limits(share, config.qps)
+        print(f"🚦 [Zotero PDF2zh Server] 其他任务正在使用 {config.service} 的qps预算, 本任务 qps: {config.qps}, 线程数: {config.thread_num}, pool_size: {config.pool_size}")
+        try:
+            if watcher:
+                watcher.start(config.qps)
+            return self._translate_shards(translate, input_path, config, progress)
+        finally:
+            config.restore_limits(limits)
+
+    def _budget_share(self, progress):
+        job = self.job_manager.get(progress.record_id) if progress else None
+        return job.budget_share if job else None
+
+    # 需要共用qps预算的任务返回 (预算的key, qps), 否则返回 None
+    # 只有使用apiKey的 pdf2zh_next 服务按key限流; 免费服务(siliconflowfree, bing, google等)没有apiKey, 不限制
+    # pdf2zh 1.x 没有qps参数, 也不使用预算
+    def _rate_budget_for(self, config, admission_key):
+        if admission_key != pdf2zh_next or not config.qps:
+            return None
+        api_key = config.llm_api.get('apiKey', '')
+        if not api_key:
+            return None
+        return budget_key(config.service, api_key), config.qps
+
+    # 提交任务时使用学到的qps(pdf2zh 1.x 没有qps参数, 不调节), 这样qps预算也按学到的值计算
+    def _apply_autotune(self, config, admission_key):
+        if not self.autotuner or admission_key != pdf2zh_next or not config.qps:
+            return
+        key = self.autotuner.key(config.service, config.llm_api.get('model', ''))
+        requested = config.qps
+        learned = self.autotuner.suggest(key)
+        if learned and learned != requested:
+            config.set_qps(learned)
+            print(f"🎛️ [qps自动调节] {key}: 使用学到的 qps: {config.qps}, pool_size: {config.pool_size} (请求中为 {requested})")
+
+    # 翻译结束后根据引擎输出中的限流和超时调整下一个任务的qps
+    def _translate_autotuned(self, translate, input_path, config, progress):
+        key = self.autotuner.key(config.service, config.llm_api.get('model', ''))
+        watcher = ThrottleWatcher()
+        progress.listeners.append(watcher.on_line)
+        qps, succeeded = config.qps, False
+        try:
+            output_files = self._translate_with_budget(translate, input_path, config, progress, watcher)
+            succeeded = True
+            return output_files
+        finally:
+            progress.listeners.remove(watcher.on_line)
+            try:
+                pages = len(PdfReader(input_path).pages)
+            except Exception:
+                pages = 0
+            self.autotuner.record(key, qps, watcher, pages, succeeded)
+
+    def _translate_shards(self, translate, input_path, config, progress=None):
+        if progress:
+            progress.stage('translate')
+        on_line = progress.on_line if progress else None
+        if not self.sharder.shard_pages or (config.skip_last_pages and config.skip_last_pages > 0):
+            return self._run_engine(translate, input_path, config, on_line)
+        work_dir = os.path.join(os.path.dirname(input_path), 'shards')
+        shard_paths = self.sharder.split(input_path, work_dir)
+        if not shard_paths:
+            return self._run_engine(translate, input_path, config, on_line)
+        if progress:
+            progress.update(shardCount=len(shard_paths))
+
+        # 各分片同时请求翻译服务, 按并行数平分 qps 和线程数, 总请求速率与不分片时相同
+        parallel = min(len(shard_paths), max(1, args.shard_workers))
+        limits = config.split_limits(parallel)
+        try:
+            futures = [
+                self.shard_executor.submit(self._run_engine, translate, shard_path, config, progress.for_shard(i).on_line if progress else None)
+                for i, shard_path in enumerate(shard_paths)
+            ]
+            wait(futures)
+        finally:
+            config.restore_limits(limits)
+        results = [future.result() for future in futures] # 有分片失败时抛出异常
+
+        if progress:
+            progress.stage('merge-shards')
+        out_dir = os.path.dirname(input_path)
+        output_files = []
+        for i, shard_output in enumerate(results[0]):
+            output_path = os.path.join(out_dir, os.path.basename(shard_output))
+            parts = [result[i] for result in results]
+            missing = [p for p in parts if not os.path.exists(p)]
+            if missing:
+                print(f"⚠️ 分片翻译结果不完整, 无法拼接 {os.path.basename(output_path)}: {missing}")
+            else:
+                self.sharder.concat(parts, output_path, config.save_profile_for(self.get_filetype(output_path)))
+                print(f"🧩 已拼接 {len(parts)} 个分片: {output_path}")
+            output_files.append(output_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return output_files
+
+    # 记录翻译引擎的运行时间(见 metrics.py)
+    def _run_engine(self, translate, input_path, config, on_line=None):
+        engine = pdf2zh_next if translate == self.translate_pdf_next else pdf2zh
+        with metrics.timed(metrics.ENGINE_SECONDS, engine=engine, service=config.service):
+            return translate(input_path, config, on_line)
+
+    def translate_pdf(self, input_path, config, on_line=None):
+        out_dir = os.path.dirname(input_path)
+        config_file = config.render_config_file(config_path[pdf2zh], out_dir)
         if config.targetLang == 'zh-CN': # TOFIX, pdf2zh 1.x converter没有通过
             config.targetLang = 'zh'
         if config.sourceLang == 'zh-CN': # TOFIX, pdf2zh 1.x converter没有通过
@@ -492,40 +1111,32 @@ class PDFTranslator:
             pdf2zh, 
             input_path, 
             '--t', str(config.thread_num),
-            '--output', str(output_folder),
+            '--output', str(out_dir),
             '--service', str(config.service),
             '--lang-in', str(config.sourceLang),
             '--lang-out', str(config.targetLang),
-            '--config', str(config_path[pdf2zh]), # 使用默认的config path路径
+            '--config', str(config_file), # 本次请求独立的配置文件
         ]
 
         if config.skip_last_pages and config.skip_last_pages > 0:
             end = len(PdfReader(input_path).pages) - config.skip_last_pages
             cmd.append('-p '+str(1)+'-'+str(end))
-        if config.skip_font_subsets:
-            cmd.append('--skip-subset-fonts')
+        # 字体子集化容易在翻译的最后一步失败, 失败后只能重新翻译; 因此总是跳过, 翻译完成后由服务端子集化(见 _subset_fonts)
+        cmd.append('--skip-subset-fonts')
         if config.babeldoc:
             print("🔍 [Zotero PDF2zh Server] 不推荐使用pdf2zh 1.x + babeldoc, 如有需要，请考虑直接使用pdf2zh_next")
             cmd.append('--babeldoc')
-        try:
-            if args.enable_venv:
-                self.env_manager.execute_in_env(cmd)
-            else:
-                subprocess.run(cmd, check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"⚠️ 翻译失败, 错误信息: {e}, 尝试跳过字体子集化, 重新渲染\n")
-            cmd.append('--skip-subset-fonts')
-            if args.enable_venv:
-                self.env_manager.execute_in_env(cmd)
-            else:
-                subprocess.run(cmd, check=True)
+        if args.enable_venv:
+            self.env_manager.execute_in_env(cmd, on_line)
+        else:
+            stream_process(cmd, on_line)
         fileName = os.path.basename(input_path).replace('.pdf', '')
         if config.babeldoc:
-            output_path_mono = os.path.join(output_folder, f"{fileName}.{config.targetLang}.mono.pdf")
-            output_path_dual = os.path.join(output_folder, f"{fileName}.{config.targetLang}.dual.pdf")
+            output_path_mono = os.path.join(out_dir, f"{fileName}.{config.targetLang}.mono.pdf")
+            output_path_dual = os.path.join(out_dir, f"{fileName}.{config.targetLang}.dual.pdf")
         else:
-            output_path_mono = os.path.join(output_folder, f"{fileName}-mono.pdf")
-            output_path_dual = os.path.join(output_folder, f"{fileName}-dual.pdf")
+            output_path_mono = os.path.join(out_dir, f"{fileName}-mono.pdf")
+            output_path_dual = os.path.join(out_dir, f"{fileName}-dual.pdf")
         output_files = [output_path_mono, output_path_dual]
         for f in output_files: # 显示生成
             if not os.path.exists(f):
@@ -535,7 +1146,7 @@ class PDFTranslator:
             print(f"🐲 pdf2zh 翻译成功, 生成文件: {f}, 大小为: {size/1024.0/1024.0:.2f} MB")
         return output_files
     
-    def translate_pdf_next(self, input_path, config):
+    def translate_pdf_next(self, input_path, config, on_line=None):
         service_map = {
             'ModelScope': 'modelscope',
             'openailiked': 'openaicompatible',
@@ -546,17 +1157,18 @@ class PDFTranslator:
         }
         if config.service in service_map:
             config.service = service_map[config.service]
-        config.update_config_file(config_path[pdf2zh_next])
+        out_dir = os.path.dirname(input_path)
+        config_file = config.render_config_file(config_path[pdf2zh_next], out_dir)
 
         cmd = [
             pdf2zh_next,
             input_path,
             '--' + config.service,
             '--qps', str(config.qps),
-            '--output', str(output_folder),
+            '--output', str(out_dir),
             '--lang-in', str(config.sourceLang),
             '--lang-out', str(config.targetLang),
-            '--config-file', str(config_path[pdf2zh_next]), # 使用默认的config path路径
+            '--config-file', str(config_file), # 本次请求独立的配置文件
         ]
         # TODO: 术语表的地址
         if config.no_watermark:
@@ -596,10 +1208,10 @@ class PDFTranslator:
             cmd.extend(['--pool-max-worker', str(config.pool_size)])
 
         fileName = os.path.basename(input_path).replace('.pdf', '')
-        no_watermark_mono = os.path.join(output_folder, f"{fileName}.no_watermark.{config.targetLang}.mono.pdf")
-        no_watermark_dual = os.path.join(output_folder, f"{fileName}.no_watermark.{config.targetLang}.dual.pdf")
-        watermark_mono = os.path.join(output_folder, f"{fileName}.{config.targetLang}.mono.pdf")
-        watermark_dual = os.path.join(output_folder, f"{fileName}.{config.targetLang}.dual.pdf")
+        no_watermark_mono = os.path.join(out_dir, f"{fileName}.no_watermark.{config.targetLang}.mono.pdf")
+        no_watermark_dual = os.path.join(out_dir, f"{fileName}.no_watermark.{config.targetLang}.dual.pdf")
+        watermark_mono = os.path.join(out_dir, f"{fileName}.{config.targetLang}.mono.pdf")
+        watermark_dual = os.path.join(out_dir, f"{fileName}.{config.targetLang}.dual.pdf")
 
         output_path = []
         if config.no_watermark: # 无水印
@@ -693,6 +1305,8 @@ class PDFTranslator:
                         stderr_lines.append(line)
                         sys.stderr.write(line)
                         sys.stderr.flush()
+                        if on_line:
+                            on_line(line)
                     process.stderr.close()
 
                 return_code = process.wait()
@@ -724,9 +1338,15 @@ class PDFTranslator:
                         raise ValueError(value_error)
                     raise RuntimeError(f"pdf2zh.exe 退出码 {r.returncode}\nstdout:\n{r.stdout}\nstderr:\n{r.stderr}")
         elif args.enable_venv:
-            self.env_manager.execute_in_env(cmd)
+            self.env_manager.execute_in_env(cmd, on_line)
+        elif self.engine_workers and not self.engine_workers.disabled:
+            try:
+                self.engine_workers.run(cmd[1:], on_line)
+            except WorkerStartError as e:
+                print(f"⚠️ {e}\n⚠️ 回退到启动新进程的方式执行")
+                stream_process(cmd, on_line)
         else:
-            subprocess.run(cmd, check=True)
+            stream_process(cmd, on_line)
         existing = [p for p in output_path if os.path.exists(p)]
 
         for f in existing:
@@ -738,14 +1358,30 @@ class PDFTranslator:
 
         return existing
 
-    def run(self, port, debug=False):
+    # gunicorn 模式见 __main__, 每个工作进程各自创建 PDFTranslator
+    def run(self, port, debug=False, serve_mode='dev'):
         # print(f"🔍 [温馨提示] 如果遇到Network Error错误，请检查Zotero插件设置中的Python Server IP端口号是否与此处端口号一致: {port}, 并检查端口是否开放.")
-        self.app.run(host='0.0.0.0', port=port, debug=debug)
+        if serve_mode == 'waitress':
+            serve_waitress(self.app, port, args.serve_threads, args.max_upload_mb * 1024 * 1024)
+        else:
+            self.app.run(host='0.0.0.0', port=port, debug=debug)
+
+# 上次服务异常退出时未完成的任务
+def mark_interrupted(records):
+    interrupted = records.mark_interrupted()
+    if not interrupted:
+        return
+    print(f"⚠️ [Zotero PDF2zh Server] 上次运行时有 {len(interrupted)} 个任务未完成, 已标记为 interrupted, 请重新提交:")
+    for record in interrupted:
+        print(f"   - {record['fileName']} ({record['operation']}, 任务 {record['jobId']}, 创建于 {record['createdAt']})")
 
 def prepare_path():
     print("🔍 [配置文件] 检查文件路径中...")
     # output folder
     os.makedirs(output_folder, exist_ok=True)
+    if os.path.isdir(legacy_rendered_folder): # 配置文件现在生成在任务的工作目录中
+        shutil.rmtree(legacy_rendered_folder, ignore_errors=True)
+        print(f"🧹 [配置文件] 删除旧版本生成的配置文件: {legacy_rendered_folder}")
     # config file 路径和格式检查
     for (_, path) in config_path.items():
         # if not os.path.exists(path):
@@ -1059,6 +1695,24 @@ if __name__ == '__main__':
     parser.add_argument('--winexe_path', type=str, default='./pdf2zh-v2.6.3-BabelDOC-v0.5.7-win64/pdf2zh/pdf2zh.exe', help='Windows可执行文件的路径')
     parser.add_argument('--winexe_attach_console', type=str2bool, default=True, help='Winexe模式是否尝试附着父控制台显示实时日志 (默认True)')
     parser.add_argument('--skip_install', type=str2bool, default=False, help='跳过虚拟环境中的安装')
+    parser.add_argument('--blob_store_size', type=int, default=2048, help='已上传PDF缓存的最大容量(MB), 0表示不限制')
+    parser.add_argument('--enable_result_cache', type=str2bool, default=True, help='缓存翻译结果, 相同文件和相同配置再次翻译时直接返回')
+    parser.add_argument('--result_cache_size', type=int, default=4096, help='翻译结果缓存的最大容量(MB), 0表示不限制')
+    parser.add_argument('--job_workers', type=int, default=job_workers, help='同时执行的翻译/裁剪任务数, 超出的任务会排队等待')
+    parser.add_argument('--max_queue', type=int, default=16, help='最多排队等待的任务数, 超出时返回429和建议的重试时间(Retry-After), 0表示不排队')
+    parser.add_argument('--pdf2zh_jobs', type=int, default=0, help='同时执行的pdf2zh任务数上限, 0表示只受job_workers限制')
+    parser.add_argument('--pdf2zh_next_jobs', type=int, default=0, help='同时执行的pdf2zh_next任务数上限, 0表示只受job_workers限制')
+    parser.add_argument('--auto_qps', type=str2bool, default=False, help='根据翻译服务的限流情况自动调节pdf2zh_next的qps和pool_size, 按服务/模型保存在config/autotune.json中, 代替请求中的qps')
+    parser.add_argument('--shard_pages', type=int, default=0, help='超过该页数的文档拆分为多个分片并行翻译, 0表示不拆分')
+    parser.add_argument('--shard_workers', type=int, default=2, help='同一文档同时翻译的分片数')
+    parser.add_argument('--postprocess_workers', type=int, default=2, help='同时执行的裁剪/拼接进程数, 单个文件的裁剪也会按页分块并行; 1表示在任务线程中依次执行')
+    parser.add_argument('--engine_workers', type=int, default=0, help='pdf2zh_next 常驻工作进程数, 预先加载模型以减少每次翻译的启动时间, 0表示不启用')
+    parser.add_argument('--worker_max_jobs', type=int, default=20, help='每个常驻工作进程最多执行的任务数, 之后重启该进程, 0表示不限制')
+    parser.add_argument('--worker_max_rss_mb', type=int, default=4096, help='常驻工作进程内存占用(MB)超过该值后重启该进程, 0表示不限制')
+    parser.add_argument('--serve_mode', type=str, default='dev', choices=SERVE_MODES, help='运行方式: dev(Flask开发服务器), waitress(多线程), gunicorn(多进程+多线程, 仅限Linux/macOS)')
+    parser.add_argument('--serve_workers', type=int, default=1, help='gunicorn 工作进程数, 0表示CPU核数; 每个进程各自执行 job_workers 个任务, 准入控制和qps预算也按进程计算, 建议保持为1')
+    parser.add_argument('--serve_threads', type=int, default=32, help='waitress / gunicorn 每个进程处理请求的线程数, 同步翻译请求和SSE连接各占用一个线程')
+    parser.add_argument('--max_upload_mb', type=int, default=0, help='请求体(上传的PDF)的最大大小(MB), 超出时返回413, 0表示不限制')
     args = parser.parse_args()
     print(f"🚀 启动参数: {args}\n")
     print("💡 如果您来自网络上的视频教程/文字教程, 并且在执行中遇到问题, 请优先阅读【本项目主页】, 以获得最准确的安装信息: \ngithub: https://github.com/guaguastandup/zotero-pdf2zh\ngitee: https://gitee.com/guaguastandup/zotero-pdf2zh")
@@ -1087,5 +1741,10 @@ if __name__ == '__main__':
     print("🏠 当前版本: ", __version__)
     # 正常的启动流程
     prepare_path()
-    translator = PDFTranslator(args)
-    translator.run(args.port, debug=args.debug)
\ No newline at end of file
+    serve_mode = resolve_serve_mode(args.serve_mode)
+    if serve_mode == 'gunicorn':
+        mark_interrupted(RecordTracker(record_db))
+        serve_gunicorn(lambda: PDFTranslator(args, report_interrupted=False).app, args.port, worker_count(args.serve_workers), args.serve_threads)
+    else:
+        translator = PDFTranslator(args)
+        translator.run(args.port, debug=args.debug, serve_mode=serve_mode)
\ No newline at end of file
@@ -0,0 +1,29 @@
+import argparse
+import os
+import sys
+
+import pytest
+
+# 测试直接导入 server/utils 下的模块, 与 server.py 的运行方式相同
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server # noqa: E402
+
+# 使用临时目录的 PDFTranslator, 不启动翻译引擎; 参数可以覆盖, 例如 make_translator(enable_result_cache=True)
+@pytest.fixture
+def make_translator(tmp_path, monkeypatch):
+    for name in ['output_folder', 'blob_folder', 'result_folder', 'autotune_path']:
+        monkeypatch.setattr(server, name, str(tmp_path / name))
+    monkeypatch.setattr(server, 'record_db', str(tmp_path / 'records.db'))
+    def make(**overrides):
+        options = dict(enable_venv=False, engine_workers=0, job_workers=1, max_queue=4, pdf2zh_jobs=0, pdf2zh_next_jobs=0,
+                       shard_pages=0, shard_workers=1, auto_qps=False, blob_store_size=0, enable_result_cache=False,
+                       result_cache_size=0, max_upload_mb=0)
+        options.update(overrides)
+        monkeypatch.setattr(server, 'args', argparse.Namespace(**options), raising=False)
+        return server.PDFTranslator(server.args)
+    return make
+
+@pytest.fixture
+def client(make_translator):
+    return make_translator().app.test_client()
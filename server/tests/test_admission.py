@@ -0,0 +1,55 @@
+from threading import Event, Thread
+import time
+
+import pytest
+
+from utils.admission import AdmissionController, QueueFullError
+
+def test_rejects_when_queue_is_full():
+    admission = AdmissionController(max_running=1, max_queue=1, default_duration=60)
+    admission.reserve('pdf2zh')
+    started_at = admission.acquire('pdf2zh') # 第一个任务正在执行
+    admission.reserve('pdf2zh')              # 第二个任务排队
+    with pytest.raises(QueueFullError) as info:
+        admission.reserve('pdf2zh')
+    # 前面还有2个任务, 新任务在第3批执行; 正在执行的任务平均还剩一半时间: 60 * 3 - 30
+    assert info.value.status_code == 429 and info.value.retry_after == 150
+    assert admission.stats()['rejected'] == 1
+    admission.release('pdf2zh', started_at)
+
+def test_retry_after_uses_recent_durations():
+    admission = AdmissionController(max_running=1, max_queue=0)
+    admission.reserve('pdf2zh')
+    admission.release('pdf2zh', admission.acquire('pdf2zh') - 9.99)
+    admission.reserve('pdf2zh')
+    admission.acquire('pdf2zh')
+    with pytest.raises(QueueFullError) as info:
+        admission.reserve('pdf2zh')
+    assert info.value.retry_after == 15
+
+def test_engine_limit_does_not_block_other_keys():
+    admission = AdmissionController(max_running=2, max_queue=1, limits={'pdf2zh_next': 1})
+    admission.reserve('pdf2zh_next')
+    admission.acquire('pdf2zh_next')
+    admission.reserve('pdf2zh_next')
+    admission.reserve('postprocess') # 还有空闲的名额, 不计入队列上限
+    admission.acquire('postprocess')
+    acquired = Event()
+    thread = Thread(target=lambda: (admission.acquire('pdf2zh_next'), acquired.set()))
+    thread.start()
+    time.sleep(0.1)
+    assert not acquired.is_set()
+    assert admission.stats()['running'] == {'pdf2zh_next': 1, 'postprocess': 1}
+    admission.release('pdf2zh_next', time.time())
+    assert acquired.wait(5)
+    thread.join(5)
+
+def test_full_queue_returns_429_with_retry_after(make_translator):
+    translator = make_translator(job_workers=1, max_queue=0)
+    translator.admission.reserve('postprocess')
+    started_at = translator.admission.acquire('postprocess')
+    response = translator.app.test_client().post('/jobs?fileName=paper.pdf', data=b'%PDF-1.4 test', content_type='application/pdf')
+    assert response.status_code == 429
+    assert response.json['errorType'] == 'QueueFullError'
+    assert int(response.headers['Retry-After']) == response.json['retryAfter'] >= 1
+    translator.admission.release('postprocess', started_at)
@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+import pytest
+
+from utils.artifacts import ArtifactGraph
+
+def _slow_write(path):
+    time.sleep(0.5)
+    with open(path, 'w') as f:
+        f.write('done')
+
+def _fail(path):
+    raise RuntimeError('inline failed')
+
+def test_inline_failure_waits_for_running_nodes(tmp_path):
+    source = tmp_path / 'source.pdf'
+    source.write_text('source')
+    slow = str(tmp_path / 'slow.pdf')
+    graph = ArtifactGraph()
+    graph.add('source', str(source))
+    graph.add('slow', slow, _slow_write, (slow,), deps=['source'])
+    graph.add('broken', str(tmp_path / 'broken.pdf'), _fail, (None,), deps=['source'], inline=True)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(RuntimeError, match='inline failed'):
+            graph.run(['slow', 'broken'], executor=executor)
+        # 抛出异常时进程池中的节点已经结束, 调用方可以安全地删除工作目录
+        assert os.path.exists(slow)
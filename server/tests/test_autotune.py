@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from utils.autotune import QpsAutotuner, ThrottleWatcher
+
+@pytest.mark.parametrize('line', [
+    "Translating:   5%|▌         | 21/429 [00:05<01:40,  4.05it/s]",
+    "Translate Paragraphs (1/1) ━━━━━━╸━━━━━━━ 21/429 0:00:12 0:00:11",
+    "21/429",
+    "Processing page 429 of 500",
+    "Timeout settings loaded",
+    "qps=10, timeout=60",
+    "Rate limit: 10 requests per second",
+    "Errors: 0, pages: 429",
+])
+def test_ignores_harmless_lines(line):
+    watcher = ThrottleWatcher()
+    watcher.on_line(line)
+    assert (watcher.rate_limited, watcher.timeouts) == (0, 0)
+
+@pytest.mark.parametrize('line', [
+    "openai.RateLimitError: Error code: 429 - {'error': {'message': 'Rate limit reached'}}",
+    "httpx.HTTPStatusError: Client error '429 Too Many Requests' for url 'https://api.example.com'",
+    "HTTP Request: POST https://api.example.com/v1/chat/completions \"HTTP/1.1 429 Too Many Requests\"",
+    "request failed, status_code=429",
+    "rate_limit_exceeded",
+    "ThrottlingException: Rate exceeded",
+])
+def test_detects_rate_limits(line):
+    watcher = ThrottleWatcher()
+    watcher.on_line(line)
+    assert watcher.rate_limited == 1
+
+@pytest.mark.parametrize('line', [
+    "openai.APITimeoutError: Request timed out.",
+    "httpx.ReadTimeout: The read operation timed out",
+    "httpx.ConnectTimeout",
+])
+def test_detects_timeouts(line):
+    watcher = ThrottleWatcher()
+    watcher.on_line(line)
+    assert (watcher.rate_limited, watcher.timeouts) == (0, 1)
+
+def test_backoff_after_rate_limit(tmp_path):
+    autotuner = QpsAutotuner(str(tmp_path / 'autotune.json'))
+    watcher = ThrottleWatcher()
+    watcher.on_line("openai.RateLimitError: Error code: 429")
+    assert autotuner.record('openai/gpt', 10, watcher, 12, True) == 7
+    assert autotuner.suggest('openai/gpt') == 7
+
+def test_probe_counts_only_translation_time(tmp_path):
+    autotuner = QpsAutotuner(str(tmp_path / 'autotune.json'), probe_min_seconds=30)
+    watcher = ThrottleWatcher()
+    watcher.started_at = time.time() - 60 # 排队和等待预算了60秒, 还没有开始翻译
+    watcher.start(10)
+    assert autotuner.record('openai/gpt', 10, watcher, 12, True) == 10
+    watcher.started_at = time.time() - 60
+    assert autotuner.record('openai/gpt', 10, watcher, 12, True) == 12
+
+def test_no_probe_when_budget_was_shared(tmp_path):
+    autotuner = QpsAutotuner(str(tmp_path / 'autotune.json'), probe_min_seconds=0)
+    watcher = ThrottleWatcher()
+    watcher.start(5) # 与其他任务平分了预算
+    assert autotuner.record('openai/gpt', 10, watcher, 12, True) == 10
+    watcher.on_line("openai.RateLimitError: Error code: 429")
+    assert autotuner.record('openai/gpt', 10, watcher, 12, True) == 7
+
+def test_job_without_translation_keeps_qps(tmp_path):
+    autotuner = QpsAutotuner(str(tmp_path / 'autotune.json'), probe_min_seconds=0)
+    watcher = ThrottleWatcher() # 引擎没有启动(例如等待预算时失败)
+    assert autotuner.record('openai/gpt', 10, watcher, 0, False) == 10
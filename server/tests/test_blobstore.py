@@ -0,0 +1,58 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from utils.blobstore import BlobStore, is_sha256
+
+def test_same_content_is_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path))
+    content = b'%PDF-1.7 paper'
+    sha256, size = store.put_stream(io.BytesIO(content))
+    assert (sha256, size) == (hashlib.sha256(content).hexdigest(), len(content))
+    assert store.put_bytes(content) == (sha256, size)
+    source = tmp_path / 'paper.pdf'
+    source.write_bytes(content)
+    assert store.put_file(str(source)) == sha256
+    blobs = [name for _, _, files in os.walk(tmp_path) for name in files if name.endswith('.pdf') and name != 'paper.pdf']
+    assert blobs == [sha256 + '.pdf']
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+def test_put_stream_checks_expected_hash(tmp_path):
+    store = BlobStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.put_stream(io.BytesIO(b'%PDF-1.7'), expected_sha256='0' * 64)
+    assert store.put_stream(io.BytesIO(b'')) == (None, 0)
+    assert not is_sha256('0' * 63) and not store.exists('../../etc/passwd')
+
+def test_prune_removes_least_recently_used(tmp_path):
+    store = BlobStore(str(tmp_path / 'blobs'))
+    hashes = []
+    for i in range(3):
+        sha256, _ = store.put_bytes(bytes([i]) * 100)
+        os.utime(store.path(sha256), (1000 + i, 1000 + i))
+        hashes.append(sha256)
+    # 最早的blob被使用过, 之后淘汰的是第二个
+    store.materialize(hashes[0], str(tmp_path / 'copy.pdf'))
+    store.max_bytes = 250
+    store.prune()
+    assert [store.exists(sha256) for sha256 in hashes] == [True, False, True]
+    assert store.total_bytes == 200
+
+def test_new_blob_is_kept_when_over_capacity(tmp_path):
+    store = BlobStore(str(tmp_path / 'blobs'), max_bytes=150)
+    old, _ = store.put_bytes(b'a' * 100)
+    new, _ = store.put_bytes(b'b' * 100)
+    assert store.exists(new) and not store.exists(old)
+    with pytest.raises(FileNotFoundError):
+        store.materialize(old, str(tmp_path / 'copy.pdf'))
+
+def test_blob_routes(client):
+    content = b'%PDF-1.7 blob'
+    sha256 = hashlib.sha256(content).hexdigest()
+    assert client.head(f'/blobs/{sha256}').status_code == 404
+    assert client.put(f'/blobs/{"0" * 64}', data=content).status_code == 400
+    response = client.put(f'/blobs/{sha256}', data=content)
+    assert response.status_code == 201 and response.json['fileHash'] == sha256
+    assert client.head(f'/blobs/{sha256}').status_code == 200
@@ -0,0 +1,50 @@
+import os
+import time
+
+from utils.cache import ResultCache
+
+def make_outputs(folder, stem, size):
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for suffix in ('.zh.mono.pdf', '.zh.dual.pdf'):
+        path = os.path.join(folder, stem + suffix)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        paths.append(path)
+    return paths
+
+def test_hit_restores_names_for_new_input(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    key = cache.make_key('translate', 'a' * 64, {'targetLang': 'zh'})
+    assert key != cache.make_key('translate', 'a' * 64, {'targetLang': 'en'})
+    assert cache.get(key, 'paper.pdf', str(tmp_path)) is None
+    cache.put(key, 'paper.pdf', make_outputs(str(tmp_path / 'out'), 'paper', 10))
+    files = cache.get(key, 'other.pdf', str(tmp_path))
+    assert [os.path.basename(path) for path in files] == ['other.zh.mono.pdf', 'other.zh.dual.pdf']
+    # 再次查询同一个key时未命中不计入
+    assert cache.get('missing', 'paper.pdf', str(tmp_path), count_miss=False) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries'], stats['sizeBytes']) == (1, 1, 1, 20)
+
+def test_evicts_least_recently_used_over_limit(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=50)
+    out = str(tmp_path / 'out')
+    cache.put('a', 'a.pdf', make_outputs(out, 'a', 10))
+    time.sleep(0.01)
+    cache.put('b', 'b.pdf', make_outputs(out, 'b', 10))
+    time.sleep(0.01)
+    assert cache.get('a', 'a.pdf', out) # a 最近被使用过
+    time.sleep(0.01)
+    cache.put('c', 'c.pdf', make_outputs(out, 'c', 10))
+    assert cache.get('b', 'b.pdf', out) is None
+    assert cache.get('a', 'a.pdf', out) and cache.get('c', 'c.pdf', out)
+    assert not os.path.exists(os.path.join(cache.root, 'b'))
+    stats = cache.stats()
+    assert (stats['evictions'], stats['entries'], stats['sizeBytes']) == (1, 2, 40)
+
+def test_keeps_new_entry_larger_than_limit(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=10)
+    out = str(tmp_path / 'out')
+    cache.put('a', 'a.pdf', make_outputs(out, 'a', 10))
+    assert cache.get('a', 'a.pdf', out)
+    assert cache.stats()['entries'] == 1
@@ -0,0 +1,50 @@
+from threading import Event
+
+PDF = b'%PDF-1.4 test'
+
+def _post(client):
+    return client.post('/jobs?fileName=paper.pdf', data=PDF, content_type='application/pdf')
+
+def _fake_translate(calls, release=None):
+    def translate(input_path, config, progress):
+        calls.append(input_path)
+        if release:
+            release.wait(5)
+        output = input_path.replace('.pdf', '-mono.pdf')
+        with open(output, 'wb') as f:
+            f.write(b'translated')
+        return [output]
+    return translate
+
+def test_identical_requests_share_one_job(make_translator):
+    translator = make_translator()
+    calls, release = [], Event()
+    translator._translate = _fake_translate(calls, release)
+    client = translator.app.test_client()
+    first, second = _post(client).json['jobId'], _post(client).json['jobId']
+    release.set()
+    translator.job_manager.wait(translator.job_manager.get(first))
+    assert first == second and len(calls) == 1 and translator.coalesced == 1
+
+def test_job_finishing_between_cache_and_inflight_checks(make_translator):
+    translator = make_translator(enable_result_cache=True, result_cache_size=100)
+    calls = []
+    translator._translate = _fake_translate(calls)
+    client = translator.app.test_client()
+    first = translator.job_manager.get(_post(client).json['jobId'])
+
+    # 第二个请求第一次查询缓存未命中后, 第一个任务才结束并写入缓存, 同时从 inflight 中删除
+    real_get = translator.result_cache.get
+    lookups = []
+    def get(*args, **kwargs):
+        result = real_get(*args, **kwargs)
+        if not lookups:
+            translator.job_manager.wait(first)
+        lookups.append(result)
+        return result
+    translator.result_cache.get = get
+    response = _post(client)
+    job = translator.job_manager.get(response.json['jobId'])
+    translator.job_manager.wait(job)
+    assert job.status == 'success' and len(calls) == 1
+    assert len(job.file_list) == 1 and job.file_list[0].endswith('paper-mono.pdf')
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from utils.config import Config
+
+def test_save_profiles_json_string():
+    config = Config({'saveProfile': 'compact', 'saveProfiles': '{"crop-compare": "fast"}'})
+    assert config.save_profile_for('crop-compare') == 'fast'
+    assert config.save_profile_for('dual-cut') == 'compact'
+
+@pytest.mark.parametrize('data', [
+    {'saveProfiles': 'not json'},
+    {'saveProfiles': '["fast"]'},
+    {'saveProfiles': {'crop-compare': 'fastest'}},
+    {'saveProfile': 'tiny'},
+])
+def test_invalid_save_profiles(data):
+    with pytest.raises(ValueError):
+        Config(data)
+
+# 表单字段的值都是字符串, saveProfiles 为JSON字符串
+def _post_multipart(client, save_profiles):
+    data = {'config': json.dumps({'engine': 'pdf2zh'}), 'fileName': 'paper.pdf', 'saveProfiles': save_profiles}
+    return client.post('/crop', data=data, content_type='multipart/form-data')
+
+def test_multipart_save_profiles_string(client):
+    # 配置有效时继续处理请求, 这里因为没有上传文件而返回400
+    response = _post_multipart(client, '{"dual-cut": "fast"}')
+    assert response.status_code == 400
+    assert '缺少文件内容' in response.json['message']
+
+def test_multipart_unknown_save_profile(client):
+    response = _post_multipart(client, '{"dual-cut": "fastest"}')
+    assert response.status_code == 400
+    assert response.json['errorType'] == 'RequestError'
+    assert 'fastest' in response.json['message']
+
+def test_crop_mode():
+    assert Config({}).crop_mode == 'redact'
+    assert Config({'cropMode': 'CLIP'}).crop_mode == 'clip'
+    with pytest.raises(ValueError, match='cropMode'):
+        Config({'cropMode': 'clipp'})
+
+def test_multipart_unknown_crop_mode(client):
+    data = {'config': json.dumps({'cropMode': 'reduct'}), 'fileName': 'paper.pdf'}
+    response = client.post('/crop', data=data, content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert 'reduct' in response.json['message']
@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+import pytest
+
+from utils.artifacts import crop_settings
+from utils.config import Config
+from utils.cropper import CROP_MODES, Cropper, _chunk_ranges
+
+PAGES = 40 # 多于一个分块(CHUNK_PAGES)
+
+def make_two_column_pdf(path, pages=PAGES):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page(width=600, height=800)
+        page.insert_text((60, 100), f"left {i}")
+        page.insert_text((360, 100), f"right {i}")
+    doc.save(path)
+    doc.close()
+    return path
+
+def summary(path):
+    with fitz.open(path) as doc:
+        return [(round(page.rect.width, 2), round(page.rect.height, 2), page.get_text().split()) for page in doc]
+
+# 按页分块的路径和依次处理的路径生成相同的页面; 单线程的执行器避免多个线程同时使用 fitz
+def run_both(tmp_path, func):
+    serial = func(None, str(tmp_path / 'serial'))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        chunked = func(executor, str(tmp_path / 'chunked'))
+    return serial, chunked
+
+@pytest.mark.parametrize('page_count, step, ranges', [
+    (40, 1, [(0, 14), (14, 28), (28, 40)]),
+    (40, 2, [(0, 14), (14, 28), (28, 40)]),
+    (16, 1, [(0, 16)]),
+    (0, 1, []),
+])
+def test_chunk_ranges_cover_all_pages(page_count, step, ranges):
+    assert _chunk_ranges(page_count, step) == ranges
+
+@pytest.mark.parametrize('crop_mode', CROP_MODES)
+def test_chunked_crop_matches_serial(tmp_path, crop_mode):
+    input_pdf = make_two_column_pdf(str(tmp_path / 'paper.mono.pdf'))
+    settings = crop_settings(Config({'cropMode': crop_mode}))
+    def crop(executor, prefix):
+        output = prefix + '.mono-cut.pdf'
+        Cropper().crop_pdf(settings, input_pdf, 'mono', output, 'mono-cut', executor=executor, save_profile='fast')
+        return summary(output)
+    serial, chunked = run_both(tmp_path, crop)
+    assert len(serial) == 2 * PAGES
+    assert chunked == serial
+
+def test_chunked_dual_outputs_match_serial(tmp_path):
+    input_pdf = make_two_column_pdf(str(tmp_path / 'paper.dual.pdf'))
+    settings = crop_settings(Config({}))
+    def process(executor, prefix):
+        outputs = {outfile_type: (f"{prefix}.{outfile_type}.pdf", 'fast') for outfile_type in ('dual-cut', 'crop-compare', 'compare')}
+        Cropper().process_dual(settings, input_pdf, outputs, executor=executor)
+        return [summary(path) for path, _ in outputs.values()]
+    serial, chunked = run_both(tmp_path, process)
+    assert all(serial)
+    assert chunked == serial
+
+def test_chunked_split_matches_serial(tmp_path):
+    input_pdf = make_two_column_pdf(str(tmp_path / 'paper.LR_dual.pdf'))
+    def split(executor, prefix):
+        output = prefix + '.TB_dual.pdf'
+        Cropper().split_pdf(input_pdf, output, executor=executor, save_profile='fast')
+        return summary(output)
+    serial, chunked = run_both(tmp_path, split)
+    assert serial[:2] == [(300.0, 800.0, ['left', '0']), (300.0, 800.0, ['right', '0'])]
+    assert chunked == serial
@@ -0,0 +1,71 @@
+from threading import Event
+import time
+
+from utils.admission import AdmissionController
+from utils.jobs import JobManager
+from utils.ratelimit import RateBudget
+
+def on_error(exc):
+    return {'status': 'error', 'message': str(exc)}, 400
+
+def test_job_lifecycle():
+    updates = []
+    manager = JobManager(max_workers=1, on_update=lambda job: updates.append(job.status))
+    started, release = Event(), Event()
+
+    def work(job):
+        started.set()
+        release.wait(5)
+        return ['paper.zh.mono.pdf']
+
+    job = manager.submit('translate', 'paper.pdf', work, on_error)
+    assert manager.get(job.id) is job
+    assert started.wait(5)
+    assert job.to_dict()['status'] == 'running' and manager.stats()['running'] == 1
+    release.set()
+    assert manager.wait(job, 5)
+    assert (job.status, job.file_list, job.error) == ('success', ['paper.zh.mono.pdf'], None)
+    assert updates == ['queued', 'running', 'success']
+    assert job.started_at and job.finished_at
+
+def test_failed_job_reports_error():
+    manager = JobManager(max_workers=1)
+    def fail(job):
+        raise ValueError('bad config')
+    job = manager.submit('translate', 'paper.pdf', fail, on_error)
+    assert manager.wait(job, 5)
+    assert (job.status, job.status_code, job.error['message']) == ('error', 400, 'bad config')
+    # on_error 本身出错时任务也要结束
+    job = manager.submit('translate', 'paper.pdf', fail, lambda exc: 1 / 0)
+    assert manager.wait(job, 5)
+    assert (job.status, job.status_code) == ('error', 500)
+
+def test_history_keeps_recent_finished_jobs():
+    manager = JobManager(max_workers=1, max_history=2)
+    jobs = []
+    for i in range(4):
+        jobs.append(manager.submit('crop', f'{i}.pdf', lambda job: [], on_error))
+        assert manager.wait(jobs[-1], 5)
+        time.sleep(0.01)
+    assert [manager.get(job.id) is not None for job in jobs] == [False, False, True, True]
+
+def test_job_waiting_for_budget_does_not_hold_admission_slot():
+    admission = AdmissionController(max_running=2, max_queue=4)
+    manager = JobManager(max_workers=2, admission=admission, rate_budget=RateBudget())
+    started, release = Event(), Event()
+
+    def hold(job):
+        started.set()
+        release.wait(5)
+        return []
+
+    first = manager.submit('translate', 'a.pdf', hold, on_error, key='pdf2zh_next', budget=('openai:key', 1))
+    assert started.wait(5)
+    second = manager.submit('translate', 'b.pdf', lambda job: [], on_error, key='pdf2zh_next', budget=('openai:key', 1))
+    # 第二个任务在排队等待qps预算, 不占用名额, 其他任务仍然可以执行
+    crop = manager.submit('crop', 'c.pdf', lambda job: [], on_error, key='postprocess')
+    assert manager.wait(crop, 5)
+    assert (first.status, second.status, first.budget_share) == ('running', 'queued', 1)
+    release.set()
+    assert manager.wait(second, 5)
+    assert (second.status, second.budget_share) == ('success', 1)
@@ -0,0 +1,103 @@
+from threading import Event, Lock, Thread
+import time
+
+from utils.config import Config
+from utils.ratelimit import RateBudget, budget_key
+
+def test_budget_key_hides_api_key():
+    key = budget_key('openai', 'sk-secret')
+    assert key.startswith('openai:') and 'sk-secret' not in key
+    assert budget_key('bing') == 'bing'
+
+def hold_leases(budget, key, rates):
+    lock = Lock()
+    held = []
+    peak = [0]
+    shares = []
+    entered = Event()
+    release = Event()
+
+    def job(rate):
+        with budget.lease(key, rate, expected=True) as share:
+            with lock:
+                held.append(share)
+                shares.append(share)
+                peak[0] = max(peak[0], sum(held))
+                if len(held) == len(rates):
+                    entered.set()
+            release.wait(5)
+            with lock:
+                held.remove(share)
+
+    for rate in rates: # 和 JobManager.submit 一样, 提交时先登记
+        budget.expect(key, rate)
+    threads = [Thread(target=job, args=(rate,)) for rate in rates]
+    for thread in threads:
+        thread.start()
+    overlapped = entered.wait(5)
+    stats = budget.stats()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return overlapped, shares, peak[0], stats
+
+def test_two_concurrent_leases_overlap():
+    budget = RateBudget()
+    overlapped, shares, peak, stats = hold_leases(budget, 'openai:key', [10, 10])
+    # 两个任务同时翻译, 平分预算
+    assert overlapped
+    assert sorted(shares) == [5, 5]
+    assert peak <= 10
+    assert stats['openai:key'] == {'capacity': 10, 'allocated': 10, 'jobs': 2, 'waiting': 0, 'expected': 0}
+    assert budget.stats() == {}
+
+def test_overlapping_leases_stay_within_budget():
+    budget = RateBudget()
+    overlapped, shares, peak, _ = hold_leases(budget, 'openai:key', [10, 10, 10])
+    assert overlapped
+    assert len(shares) == 3 and min(shares) >= 1
+    assert peak <= 10
+    assert budget.stats() == {}
+
+def test_small_budget_gives_each_job_at_least_one():
+    budget = RateBudget()
+    budget.expect('k', 2)
+    budget.expect('k', 2)
+    budget.expect('k', 2)
+    with budget.lease('k', 2, expected=True) as first, budget.lease('k', 2, expected=True) as second:
+        assert (first, second) == (1, 1)
+        # 预算已经全部分出, 第三个任务等待
+        assert budget.stats()['k']['expected'] == 1
+    budget.cancel('k')
+    assert budget.stats() == {}
+
+def test_waiting_lease_gets_returned_budget():
+    budget = RateBudget()
+    waits = []
+    shares = []
+
+    def job():
+        with budget.lease('k', 8, lambda: waits.append(1)) as share:
+            shares.append(share)
+
+    with budget.lease('k', 5) as first:
+        assert first == 5
+        thread = Thread(target=job)
+        thread.start()
+        time.sleep(0.1)
+        assert waits == [1] and not shares
+    thread.join(5)
+    # 没有其他任务时, 预算为本任务请求的qps
+    assert shares == [8]
+
+def test_only_keyed_pdf2zh_next_jobs_use_budget(make_translator):
+    translator = make_translator()
+    def config(**overrides):
+        data = {'engine': 'pdf2zh_next', 'service': 'openai', 'qps': 10, 'llm_api': {'apiKey': 'sk-secret'}}
+        data.update(overrides)
+        return Config(data)
+    assert translator._rate_budget_for(config(), 'pdf2zh_next') == (budget_key('openai', 'sk-secret'), 10)
+    # 免费服务没有apiKey, pdf2zh 1.x 使用 thread_num, 都不使用预算
+    assert translator._rate_budget_for(config(service='siliconflowfree', llm_api={}), 'pdf2zh_next') is None
+    assert translator._rate_budget_for(config(engine='pdf2zh'), 'pdf2zh') is None
+    assert translator._rate_budget_for(config(), 'postprocess') is None
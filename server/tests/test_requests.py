@@ -0,0 +1,27 @@
+import base64
+
+import pytest
+
+def test_invalid_base64_header(client):
+    response = client.post('/translate', data=b'%PDF-1.4', content_type='application/pdf', headers={'X-Pdf2zh-Config': 'not base64!'})
+    assert response.status_code == 400
+    assert 'X-Pdf2zh-Config' in response.json['message']
+
+def test_invalid_json_header(client):
+    header = base64.b64encode(b'{fileName: x}').decode()
+    response = client.post('/translate', data=b'%PDF-1.4', content_type='application/pdf', headers={'X-Pdf2zh-Config': header})
+    assert response.status_code == 400
+
+def test_invalid_multipart_config(client):
+    response = client.post('/translate', data={'config': 'not json'}, content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert 'config' in response.json['message']
+
+@pytest.mark.parametrize('content', ['not base64!', '===='])
+def test_invalid_file_content(client, content):
+    response = client.post('/translate', json={'fileName': 'paper.pdf', 'fileContent': content})
+    assert response.status_code == 400
+
+def test_unsupported_mimetype(client):
+    response = client.post('/translate?fileName=paper.pdf', data='hello', content_type='text/plain')
+    assert response.status_code == 415
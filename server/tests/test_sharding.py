@@ -0,0 +1,42 @@
+import os
+
+import fitz
+import pytest
+
+from utils.sharding import PageSharder
+
+def make_pdf(path, pages):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"page {i + 1}")
+    doc.save(path)
+    doc.close()
+    return path
+
+def page_texts(path):
+    with fitz.open(path) as doc:
+        return [page.get_text().strip() for page in doc]
+
+@pytest.mark.parametrize('shard_pages, page_count, ranges', [
+    (0, 100, []),
+    (50, 50, []),
+    (50, 51, [(0, 25), (26, 50)]),
+    (10, 25, [(0, 8), (9, 17), (18, 24)]),
+    (1, 3, [(0, 0), (1, 1), (2, 2)]),
+])
+def test_plan_balances_pages(shard_pages, page_count, ranges):
+    assert PageSharder(shard_pages).plan(page_count) == ranges
+
+def test_split_and_concat_keep_page_order(tmp_path):
+    input_path = make_pdf(str(tmp_path / 'paper.pdf'), 7)
+    sharder = PageSharder(3)
+    shards = sharder.split(input_path, str(tmp_path / 'work'))
+    assert [os.path.basename(path) for path in shards] == ['paper.pdf'] * 3
+    assert [page_texts(path) for path in shards] == [['page 1', 'page 2', 'page 3'], ['page 4', 'page 5', 'page 6'], ['page 7']]
+    output = sharder.concat(shards, str(tmp_path / 'merged.pdf'))
+    assert page_texts(output) == page_texts(input_path)
+
+def test_short_document_is_not_split(tmp_path):
+    input_path = make_pdf(str(tmp_path / 'paper.pdf'), 2)
+    assert PageSharder(3).split(input_path, str(tmp_path / 'work')) == []
+    assert not os.path.exists(tmp_path / 'work')
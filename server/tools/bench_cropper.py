@@ -0,0 +1,244 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+import argparse
+import os
+import sys
+import time
+import fitz
+
+# 对比裁剪算法的耗时和临时文档数量, 并检查输出是否与旧算法一致(逐页比较文本和渲染结果); 同时对比各裁剪模式的耗时
+# 用法: python tools/bench_cropper.py [--pages 60] [--repeat 3] [input.pdf ...]
+# 不指定输入文件时, 生成包含双栏文字, 图形以及跨页共享的 Form XObject 的测试文档
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.cropper import CROP_MODES, Cropper, _apply_redactions_outside_clip
+
+OFFSETS = (40, 20, 5.0) # 与默认配置相同: pdf_w_offset, pdf_h_offset, pdf_offset_ratio
+
+############################# 旧算法(每页每栏拷贝临时文档) #############################
+def legacy_crop_pages(src_doc, new_doc, start, end, offsets, infile_type, outfile_type, dualFirst=True, engine="pdf2zh"):
+    w_offset, h_offset, r = offsets
+    mediabox = src_doc[0].mediabox
+    w = mediabox.width
+    h = mediabox.height
+    half_w = w / 2
+
+    left_clip = fitz.Rect(w_offset, h_offset, half_w + w_offset / r, h - h_offset)
+    right_clip = fitz.Rect(half_w - w_offset / r, h_offset, w - w_offset, h - h_offset) 
+    clip_rects = [left_clip, right_clip]
+
+    # 创建源文档的完整拷贝，避免多次拷贝单个页面
+    temp_src_doc = fitz.open()
+    temp_src_doc.insert_pdf(src_doc, from_page=start, to_page=end - 1)
+
+    if infile_type == 'mono' or infile_type == 'origin':
+        for page_num in range(len(temp_src_doc)):
+            # 为每个页面创建一个临时拷贝（仅一次），然后为每个栏分别处理redaction
+            temp_page_doc_base = fitz.open()
+            temp_page_doc_base.insert_pdf(temp_src_doc, from_page=page_num, to_page=page_num)
+            for clip_rect in clip_rects:
+                # 由于redaction是破坏性的，为每个栏拷贝base
+                temp_page_doc = fitz.open()
+                temp_page_doc.insert_pdf(temp_page_doc_base)
+                temp_page = temp_page_doc[0]
+                _apply_redactions_outside_clip(temp_page, clip_rect)
+                # 创建新页面：直接切分为上页（左栏）和下页（右栏）
+                new_page = new_doc.new_page(width=clip_rect.width, height=clip_rect.height)
+                new_page.show_pdf_page(new_page.rect, temp_page_doc, 0, clip=clip_rect)
+                new_page.clean_contents()
+                temp_page_doc.close()
+            temp_page_doc_base.close()
+
+    elif infile_type == 'dual':
+        for i in range(0, len(temp_src_doc), 2):
+            odd_page_num = i
+            even_page_num = i + 1
+            if engine == "pdf2zh" and dualFirst == True:
+                odd_page_num = i + 1
+                even_page_num = i
+            # 为奇数页和偶数页各创建一个base拷贝
+            odd_base_doc = fitz.open()
+            odd_base_doc.insert_pdf(temp_src_doc, from_page=odd_page_num, to_page=odd_page_num)
+            even_base_doc = fitz.open()
+            even_base_doc.insert_pdf(temp_src_doc, from_page=even_page_num, to_page=even_page_num)
+            for clip_rect in clip_rects:
+                if outfile_type == 'crop-compare':  # 左右拼接
+                    new_page = new_doc.new_page(width=w, height=h - 2 * h_offset)
+                    target_left_rect = fitz.Rect(0, 0, w / 2, h - 2 * h_offset)
+                    target_right_rect = fitz.Rect(w / 2, 0, w, h - 2 * h_offset)
+                    # 处理奇数页（原文）
+                    odd_temp_doc = fitz.open()
+                    odd_temp_doc.insert_pdf(odd_base_doc)
+                    odd_temp_page = odd_temp_doc[0]
+                    _apply_redactions_outside_clip(odd_temp_page, clip_rect)
+                    new_page.show_pdf_page(target_left_rect, odd_temp_doc, 0, clip=clip_rect)
+                    odd_temp_doc.close()
+                    # 处理偶数页（翻译）
+                    even_temp_doc = fitz.open()
+                    even_temp_doc.insert_pdf(even_base_doc)
+                    even_temp_page = even_temp_doc[0]
+                    _apply_redactions_outside_clip(even_temp_page, clip_rect)
+                    new_page.show_pdf_page(target_right_rect, even_temp_doc, 0, clip=clip_rect)
+                    even_temp_doc.close()
+                    new_page.clean_contents()
+                elif outfile_type == 'dual-cut':
+                    # 对于每个栏：原文半页 -> 对应翻译半页
+                    # 处理原文
+                    odd_temp_doc = fitz.open()
+                    odd_temp_doc.insert_pdf(odd_base_doc)
+                    odd_temp_page = odd_temp_doc[0]
+                    _apply_redactions_outside_clip(odd_temp_page, clip_rect)
+                    odd_new_page = new_doc.new_page(width=clip_rect.width, height=clip_rect.height)
+                    odd_new_page.show_pdf_page(odd_new_page.rect, odd_temp_doc, 0, clip=clip_rect)
+                    odd_new_page.clean_contents()
+                    odd_temp_doc.close()
+                    # 处理翻译
+                    even_temp_doc = fitz.open()
+                    even_temp_doc.insert_pdf(even_base_doc)
+                    even_temp_page = even_temp_doc[0]
+                    _apply_redactions_outside_clip(even_temp_page, clip_rect)
+                    even_new_page = new_doc.new_page(width=clip_rect.width, height=clip_rect.height)
+                    even_new_page.show_pdf_page(even_new_page.rect, even_temp_doc, 0, clip=clip_rect)
+                    even_new_page.clean_contents()
+                    even_temp_doc.close()
+            odd_base_doc.close()
+            even_base_doc.close()
+    temp_src_doc.close()
+
+def legacy_split_pages(src_doc, new_doc, start, end):
+    mediabox = src_doc[0].mediabox
+    w = mediabox.width
+    h = mediabox.height
+    half_w = w / 2
+
+    left_clip = fitz.Rect(0, 0, half_w, h)
+    right_clip = fitz.Rect(half_w, 0, w, h)
+    clip_rects = [left_clip, right_clip]
+
+    # 创建源文档的完整拷贝，避免多次拷贝单个页面
+    temp_src_doc = fitz.open()
+    temp_src_doc.insert_pdf(src_doc, from_page=start, to_page=end - 1)
+    for page_num in range(len(temp_src_doc)):
+        # 为每个页面创建一个临时拷贝（仅一次），然后为每个栏分别处理redaction
+        temp_page_doc_base = fitz.open()
+        temp_page_doc_base.insert_pdf(temp_src_doc, from_page=page_num, to_page=page_num)
+        for clip_rect in clip_rects:
+            # 由于redaction是破坏性的，为每个栏拷贝base
+            temp_page_doc = fitz.open()
+            temp_page_doc.insert_pdf(temp_page_doc_base)
+            temp_page = temp_page_doc[0]
+            _apply_redactions_outside_clip(temp_page, clip_rect)
+            # 创建新页面：直接切分为上页（左栏）和下页（右栏）
+            new_page = new_doc.new_page(width=clip_rect.width, height=clip_rect.height)
+            new_page.show_pdf_page(new_page.rect, temp_page_doc, 0, clip=clip_rect)
+            new_page.clean_contents()
+            temp_page_doc.close()
+        temp_page_doc_base.close()
+    temp_src_doc.close()
+
+############################# 测试 #############################
+# 统计 fitz.open 的调用次数(即创建的文档数)
+class OpenCounter:
+    def __init__(self):
+        self.count = 0
+        self.open = fitz.open
+
+    def __enter__(self):
+        def counting_open(*a, **kw):
+            self.count += 1
+            return self.open(*a, **kw)
+        fitz.open = counting_open
+        return self
+
+    def __exit__(self, *exc):
+        fitz.open = self.open
+
+def make_document(path, pages):
+    stamp = fitz.open()
+    stamp_page = stamp.new_page(width=200, height=60)
+    stamp_page.insert_text((10, 30), "SHARED-STAMP", fontsize=14)
+    stamp_page.draw_rect(fitz.Rect(5, 5, 195, 55))
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page(width=595, height=842)
+        for y in range(60, 800, 14):
+            page.insert_text((50, y), f"P{i} L{y} left column text", fontsize=9)
+            page.insert_text((320, y), f"P{i} R{y} right column text", fontsize=9)
+        page.draw_rect(fitz.Rect(100, 100, 500, 200))
+        # 同一个 XObject 在不同页面上分别放在左栏和右栏, 用于检查 redaction 是否会影响其他页面或其他栏
+        x = 60 if i % 2 == 0 else 330
+        page.show_pdf_page(fitz.Rect(x, 700, x + 200, 760), stamp, 0)
+    doc.save(path, garbage=4, deflate=True)
+    doc.close()
+    stamp.close()
+
+def fingerprint(doc):
+    return [(page.get_text(), page.get_pixmap(dpi=36).samples) for page in doc]
+
+def run_case(func, input_pdf, repeat):
+    best, docs = None, 0
+    for _ in range(repeat):
+        src_doc = fitz.open(input_pdf)
+        new_doc = fitz.open()
+        with OpenCounter() as counter:
+            start = time.perf_counter()
+            func(src_doc, new_doc)
+            data = new_doc.tobytes(garbage=4, deflate=True, clean=True, deflate_images=True, deflate_fonts=True)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        docs = counter.count
+        result = fingerprint(fitz.open("pdf", data))
+        new_doc.close()
+        src_doc.close()
+    return best, docs, len(data), result
+
+def bench(input_pdf, repeat):
+    cropper = Cropper()
+    page_count = len(fitz.open(input_pdf))
+    even = page_count - page_count % 2
+    cases = [
+        ('mono-cut', lambda s, n: legacy_crop_pages(s, n, 0, page_count, OFFSETS, 'mono', 'mono-cut'),
+                     lambda s, n, m='redact': cropper._crop_pages(s, n, 0, page_count, OFFSETS, 'mono', 'mono-cut', crop_mode=m)),
+        ('dual-cut', lambda s, n: legacy_crop_pages(s, n, 0, even, OFFSETS, 'dual', 'dual-cut'),
+                     lambda s, n, m='redact': cropper._crop_pages(s, n, 0, even, OFFSETS, 'dual', 'dual-cut', crop_mode=m)),
+        ('crop-compare', lambda s, n: legacy_crop_pages(s, n, 0, even, OFFSETS, 'dual', 'crop-compare'),
+                         lambda s, n, m='redact': cropper._crop_pages(s, n, 0, even, OFFSETS, 'dual', 'crop-compare', crop_mode=m)),
+        ('split', lambda s, n: legacy_split_pages(s, n, 0, page_count),
+                  lambda s, n, m='redact': cropper._split_pages(s, n, 0, page_count, crop_mode=m)),
+    ]
+    print(f"📄 {input_pdf}: {page_count} 页")
+    print(f"{'输出':<14}{'旧算法(s)':>10}{'新算法(s)':>10}{'加速':>8}{'旧文档数':>10}{'新文档数':>10}{'旧大小(KB)':>12}{'新大小(KB)':>12}  结果一致")
+    for name, legacy, current in cases:
+        old_time, old_docs, old_size, old_result = run_case(legacy, input_pdf, repeat)
+        new_time, new_docs, new_size, new_result = run_case(current, input_pdf, repeat)
+        same = '✅' if old_result == new_result else '❌'
+        print(f"{name:<14}{old_time:>10.2f}{new_time:>10.2f}{old_time / new_time:>7.1f}x{old_docs:>10}{new_docs:>10}"
+              f"{old_size / 1024:>12.0f}{new_size / 1024:>12.0f}  {same}")
+
+    # 各裁剪模式(cropMode)的耗时和输出大小
+    print(f"{'输出':<14}" + ''.join(f"{mode + '(s)':>12}{mode + '(KB)':>14}" for mode in CROP_MODES))
+    for name, _, current in cases:
+        row = f"{name:<14}"
+        for mode in CROP_MODES:
+            elapsed, _, size, _ = run_case(lambda s, n: current(s, n, mode), input_pdf, repeat)
+            row += f"{elapsed:>12.2f}{size / 1024:>14.0f}"
+        print(row)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='对比新旧裁剪算法')
+    parser.add_argument('inputs', nargs='*', help='输入的PDF文件, 不指定时生成测试文档')
+    parser.add_argument('--pages', type=int, default=60, help='生成的测试文档页数')
+    parser.add_argument('--repeat', type=int, default=3, help='每种情况重复的次数, 取最短耗时')
+    bench_args = parser.parse_args()
+    inputs = bench_args.inputs
+    if not inputs:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_cropper.pdf')
+        make_document(path, bench_args.pages)
+        inputs = [path]
+    try:
+        for input_pdf in inputs:
+            bench(input_pdf, bench_args.repeat)
+    finally:
+        if not bench_args.inputs:
+            os.remove(inputs[0])
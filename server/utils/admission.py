@@ -0,0 +1,88 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+from collections import deque
+from threading import Condition
+import math
+import time
+
+# 准入控制: 限制同时执行的任务数(全部任务 / 每个翻译引擎), 超出的任务排队等待
+# 排队的任务数有上限, 队列已满时拒绝新任务(429), 并根据最近任务的耗时估计客户端应等待的时间(Retry-After)
+# 每个引擎进程本身就会开多个线程请求翻译服务, 同时运行太多引擎进程只会互相抢占CPU和内存, 所有任务都变慢
+
+class QueueFullError(Exception):
+    status_code = 429
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class AdmissionController:
+    # limits: {key: 同时执行数}, 不在 limits 中的 key(例如只做裁剪的任务)只受 max_running 限制
+    def __init__(self, max_running, max_queue=16, limits=None, history=20, default_duration=60):
+        self.max_running = max(1, int(max_running))
+        self.max_queue = max(0, int(max_queue))
+        self.limits = {key: min(limit, self.max_running) for key, limit in (limits or {}).items() if limit > 0}
+        self.default_duration = default_duration # 没有历史记录时, 估计每个任务的耗时(秒)
+        self.durations = {}  # key -> 最近 history 个任务的耗时
+        self.history = history
+        self.running = {}
+        self.queued = {}
+        self.rejected = 0
+        self.changed = Condition()
+
+    # 提交任务时调用, 队列已满时抛出 QueueFullError; 有空闲位置时任务可以立即执行, 不计入队列上限
+    def reserve(self, key):
+        with self.changed:
+            if sum(self.queued.values()) >= self.max_queue + self._free_slots(key):
+                self.rejected += 1
+                retry_after = self._estimate_wait(key)
+                raise QueueFullError(f"服务端任务已满(正在执行 {sum(self.running.values())} 个, 排队 {sum(self.queued.values())} 个), 请 {retry_after} 秒后重试", retry_after)
+            self.queued[key] = self.queued.get(key, 0) + 1
+
+    # 任务线程中调用, 等待可以执行; 返回开始执行的时间, 结束时传给 release
+    def acquire(self, key):
+        with self.changed:
+            self.changed.wait_for(lambda: self._can_run(key))
+            self.queued[key] -= 1
+            self.running[key] = self.running.get(key, 0) + 1
+        return time.time()
+
+    def release(self, key, started_at):
+        with self.changed:
+            self.running[key] -= 1
+            self.durations.setdefault(key, deque(maxlen=self.history)).append(time.time() - started_at)
+            self.changed.notify_all()
+
+    def _can_run(self, key):
+        return self._free_slots(key) > 0
+
+    def _free_slots(self, key):
+        free = self.max_running - sum(self.running.values())
+        return max(0, min(free, self.limits.get(key, self.max_running) - self.running.get(key, 0)))
+
+    # 前面的任务按 limit 个一批执行完之后才轮到新任务; 正在执行的任务平均已经执行了大约一半的时间
+    def _estimate_wait(self, key):
+        recent = self.durations.get(key) or [d for values in self.durations.values() for d in values]
+        duration = sum(recent) / len(recent) if recent else self.default_duration
+        limit = self.limits.get(key, self.max_running)
+        ahead = self.queued.get(key, 0) + self.running.get(key, 0)
+        wait = duration * math.ceil((ahead + 1) / limit) - (duration / 2 if self.running.get(key) else 0)
+        return max(1, math.ceil(wait))
+
+    def queue_depth(self):
+        with self.changed:
+            return sum(self.queued.values())
+
+    def stats(self):
+        with self.changed:
+            return {
+                'maxRunning': self.max_running,
+                'maxQueue': self.max_queue,
+                'limits': dict(self.limits),
+                'running': {k: v for k, v in self.running.items() if v},
+                'queued': {k: v for k, v in self.queued.items() if v},
+                'queueDepth': sum(self.queued.values()),
+                'rejected': self.rejected,
+                'avgDuration': {k: round(sum(v) / len(v), 1) for k, v in self.durations.items() if v},
+            }
@@ -0,0 +1,145 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+from concurrent.futures import FIRST_COMPLETED, wait
+from types import SimpleNamespace
+import os
+import time
+from .cropper import Cropper
+from .metrics import observe_artifact
+
+# 翻译结果的后处理(裁剪, 拼接, 转换双语模式)建模为依赖图:
+#   origin -> mono -> mono-cut
+#   origin -> dual -> LR_dual / TB_dual -> dual-cut / crop-compare / compare
+# 只计算请求的文件及其依赖, 已经存在的中间文件直接复用, 互不依赖的节点(例如 mono-cut 和 dual-cut)在进程池中并行执行
+# 节点函数必须是模块级函数, 参数只包含路径和简单的值, 以便传递给子进程
+
+def crop_settings(config):
+    return SimpleNamespace(
+        pdf_w_offset=config.pdf_w_offset,
+        pdf_h_offset=config.pdf_h_offset,
+        pdf_offset_ratio=config.pdf_offset_ratio,
+        crop_mode=config.crop_mode,
+    )
+
+def crop(settings, input_pdf, infile_type, output_pdf, outfile_type, dualFirst=True, engine='pdf2zh', save_profile='compact', executor=None):
+    Cropper().crop_pdf(settings, input_pdf, infile_type, output_pdf, outfile_type, dualFirst=dualFirst, engine=engine, executor=executor, save_profile=save_profile)
+    return output_pdf
+
+def merge(input_pdf, output_pdf, dualFirst=True, engine='pdf2zh', save_profile='balanced'):
+    Cropper().merge_pdf(input_pdf, output_pdf, dualFirst=dualFirst, engine=engine, save_profile=save_profile)
+    return output_pdf
+
+# 一次打开双语文件, 同时生成 outputs 中的多个文件, outputs 为 {类型: (路径, 保存方式)}
+def dual_outputs(settings, input_pdf, outputs, dualFirst=True, engine='pdf2zh', executor=None):
+    Cropper().process_dual(settings, input_pdf, outputs, dualFirst=dualFirst, engine=engine, executor=executor)
+    return tuple(path for path, _ in outputs.values())
+
+# 从上下交替(TB)的双语文件中提取译文页面, 得到 mono 文件; trans_first 时每对页面中译文在前
+def extract_mono(input_pdf, output_pdf, trans_first=False, save_profile='fast'):
+    Cropper().select_pages(input_pdf, output_pdf, 0 if trans_first else 1, 2, save_profile)
+    return output_pdf
+
+# 原地对 input_pdf 做字体子集化, 失败时保留原文件
+def subset_fonts(input_pdf, save_profile='balanced'):
+    return Cropper().subset_fonts(input_pdf, save_profile)
+
+# LR(左右并排) -> TB(上下交替)
+def split(input_pdf, output_pdf, crop_mode='redact', save_profile='compact', executor=None):
+    Cropper().split_pdf(input_pdf, output_pdf, executor=executor, crop_mode=crop_mode, save_profile=save_profile)
+    return output_pdf
+
+# 只改名, 不复制文件
+def rename(input_pdf, output_pdf):
+    os.replace(input_pdf, output_pdf)
+    return output_pdf
+
+class Artifact:
+    def __init__(self, name, path, func=None, args=(), deps=(), inline=False, chunked=False):
+        self.name = name
+        self.func = func      # None 且没有依赖时表示源文件(例如翻译引擎的输出), 必须已经存在; 有依赖时表示由依赖节点一起生成的文件
+        self.path = path      # 同时生成多个文件的节点为路径的 tuple
+        self.args = args
+        self.deps = list(deps)
+        self.inline = inline  # 开销很小的节点(例如改名)直接在当前线程执行
+        self.chunked = chunked # 在当前线程执行时, 将进程池传给 func(executor=...), 按页分块并行处理
+
+    def exists(self):
+        paths = self.path if isinstance(self.path, tuple) else (self.path,)
+        return all(os.path.exists(path) for path in paths)
+
+class ArtifactGraph:
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, name, path, func=None, args=(), deps=(), inline=False, chunked=False):
+        self.nodes[name] = Artifact(name, path, func, args, deps, inline, chunked)
+        return path
+
+    # 计算生成 leaves 需要执行的节点; 文件已存在的节点直接复用, 也不再需要它的依赖
+    def plan(self, leaves):
+        order, visited = [], set()
+        def visit(name):
+            if name in visited:
+                return
+            visited.add(name)
+            node = self.nodes[name]
+            if (node.func is None and not node.deps) or node.exists():
+                return
+            for dep in node.deps:
+                visit(dep)
+            order.append(name)
+        for leaf in leaves:
+            visit(leaf)
+        return order
+
+    # 执行计划, 返回 {name: path}; executor 为 None 时按顺序执行
+    def run(self, leaves, executor=None, progress=None):
+        pending = self.plan(leaves)
+        done = {name for name in self.nodes if name not in pending}
+        running = {}
+        started = {}
+        while pending or running:
+            ready = [name for name in pending if all(dep in done for dep in self.nodes[name].deps)]
+            for name in ready:
+                pending.remove(name)
+                node = self.nodes[name]
+                if node.func is None: # 已由依赖节点生成
+                    observe_artifact(name, None, node.path)
+                    done.add(name)
+                    continue
+                if progress:
+                    progress.stage(name)
+                started[name] = time.time()
+                # 只有一个可执行的节点时也直接执行, 避免进程间传递的开销; 此时进程池空闲, 可以用来按页分块
+                if executor is None or node.inline or (len(ready) == 1 and not running):
+                    try:
+                        if node.chunked and executor is not None:
+                            node.func(*node.args, executor=executor)
+                        else:
+                            node.func(*node.args)
+                    except Exception:
+                        wait(list(running)) # 同上, 等待进程池中的节点结束后再抛出异常
+                        raise
+                    self._finished(name, started)
+                    done.add(name)
+                else:
+                    running[executor.submit(node.func, *node.args)] = name
+            if not running:
+                if pending and not ready:
+                    raise RuntimeError(f"无法生成 {pending}, 依赖的文件不存在")
+                continue
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                if future.exception() is not None:
+                    wait(list(running)) # 等待其他节点结束后再抛出异常, 避免工作目录被提前删除
+                    raise future.exception()
+                self._finished(name, started)
+                done.add(name)
+        return {name: self.nodes[name].path for name in leaves}
+
+    # 记录生成耗时和文件大小(见 metrics.py); 同时生成多个文件的节点只记录耗时, 文件大小由各文件的节点记录
+    def _finished(self, name, started):
+        node = self.nodes[name]
+        observe_artifact(name, time.time() - started[name], () if isinstance(node.path, tuple) else node.path)
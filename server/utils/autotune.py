@@ -0,0 +1,116 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+from threading import Lock
+import datetime
+import json
+import math
+import os
+import re
+import time
+from .progress import parse_progress_line
+
+# qps 自动调节(--auto_qps): 从引擎输出中识别翻译服务的限流和超时, 按 服务/模型 记录合适的qps, 下一个任务直接使用
+#   出现限流(429, rate limit 等)或多次超时: qps * backoff
+#   没有限流且任务运行了足够长的时间(确实以该qps请求过一段时间): qps * probe, 逐步试探更高的qps
+# 学到的值保存在 config/autotune.json 中, 服务重启后继续使用; 多个进程(gunicorn)共用该文件, 每次读写时重新读取
+
+# 只匹配错误信息中的429(例如 "Error code: 429", "status_code=429", "HTTP/1.1 429", "429 Too Many Requests"),
+# 避免把页数(例如进度条中的 "21/429")或普通的配置输出误认为限流
+_RATE_LIMIT_RE = re.compile(
+    r'(?:status[ _]?code|HTTP|error)\D{0,10}\b429\b|HTTP/\d(?:\.\d)? 429\b|\b429 (?:Too Many|Client Error)'
+    r'|rate[ _-]?limit(?:error|ed|[ _]exceeded|[ _]reached)|too many requests|quota exceeded|throttl(?:ed|ing)',
+    re.IGNORECASE)
+_TIMEOUT_RE = re.compile(r'timed out|timeout ?(?:error|exception)|(?:read|connect(?:ion)?|pool|request)[ _]?timeout', re.IGNORECASE)
+
+# 统计一个任务(包括各分片)的引擎输出中的限流和超时次数
+# 翻译引擎启动时(已经取得qps预算之后)调用 start, 排队和等待预算的时间不计入
+class ThrottleWatcher:
+    def __init__(self):
+        self.rate_limited = 0
+        self.timeouts = 0
+        self.started_at = None
+        self.qps = None # 本任务实际使用的qps(与其他任务平分预算之后)
+
+    def start(self, qps):
+        self.started_at = time.time()
+        self.qps = qps
+
+    def elapsed(self):
+        return time.time() - self.started_at if self.started_at else 0
+
+    def on_line(self, line):
+        if parse_progress_line(line): # 进度条
+            return
+        if _RATE_LIMIT_RE.search(line):
+            self.rate_limited += 1
+        elif _TIMEOUT_RE.search(line):
+            self.timeouts += 1
+
+class QpsAutotuner:
+    def __init__(self, path, min_qps=1, max_qps=100, backoff=0.7, probe=1.2, probe_min_seconds=30, max_timeouts=3):
+        self.path = path
+        self.min_qps = min_qps
+        self.max_qps = max_qps # qps=100 时默认的 pool_size 为 1000, 即 Config 中 pool_size 的上限
+        self.backoff = backoff
+        self.probe = probe
+        self.probe_min_seconds = probe_min_seconds
+        self.max_timeouts = max_timeouts # 偶尔超时不一定是限流, 超过该次数才降低qps
+        self.lock = Lock()
+
+    @staticmethod
+    def key(service, model=''):
+        return f"{service}/{model}" if model else service
+
+    # 已学到的qps, 没有记录时返回 None
+    def suggest(self, key):
+        with self.lock:
+            entry = self._load().get(key)
+        return entry['qps'] if entry else None
+
+    # 任务结束后调用; qps 为本任务的qps预算(与其他任务平分之前), pages 为翻译的页数
+    # 限流时降低预算(同时翻译的任务合计按预算请求); 只有本任务单独用满预算时才提高, 只分到一部分时没有试探过该qps
+    def record(self, key, qps, watcher, pages, succeeded):
+        elapsed = watcher.elapsed()
+        full_budget = (watcher.qps or qps) >= qps
+        if watcher.rate_limited or watcher.timeouts >= self.max_timeouts:
+            new_qps, reason = max(self.min_qps, int(qps * self.backoff)), f'限流 {watcher.rate_limited} 次, 超时 {watcher.timeouts} 次'
+        elif succeeded and full_budget and elapsed >= self.probe_min_seconds:
+            new_qps, reason = min(self.max_qps, max(qps + 1, math.ceil(qps * self.probe))), '没有限流'
+        else:
+            new_qps, reason = qps, None
+        with self.lock:
+            entries = self._load()
+            entry = entries.setdefault(key, {'qps': qps, 'jobs': 0, 'rateLimited': 0, 'timeouts': 0})
+            entry['qps'] = new_qps
+            entry['jobs'] += 1
+            entry['rateLimited'] += watcher.rate_limited
+            entry['timeouts'] += watcher.timeouts
+            if succeeded and pages and elapsed > 0: # 每分钟翻译的页数, 指数移动平均
+                throughput = pages * 60.0 / elapsed
+                entry['pagesPerMinute'] = round(throughput if 'pagesPerMinute' not in entry else 0.7 * entry['pagesPerMinute'] + 0.3 * throughput, 2)
+            entry['updatedAt'] = datetime.datetime.now().isoformat()
+            self._save(entries)
+        if reason and new_qps != qps:
+            print(f"🎛️ [qps自动调节] {key}: {reason}, qps {qps} -> {new_qps}")
+        return new_qps
+
+    def stats(self):
+        with self.lock:
+            return self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ [qps自动调节] 读取 {self.path} 失败, 重新开始记录: {e}")
+            return {}
+
+    def _save(self, entries):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
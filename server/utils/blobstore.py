@@ -0,0 +1,145 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+from threading import Lock
+
+# 按 SHA-256 存储上传过的PDF (content-addressed)
+# 客户端可以先 HEAD /blobs/<sha256> 确认服务端已有该文件, 然后只传 fileHash, 不再重复上传PDF
+
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+def is_sha256(value):
+    return isinstance(value, str) and bool(_SHA256_RE.match(value))
+
+class BlobStore:
+    def __init__(self, root, max_bytes=0, chunk_size=1024 * 1024, prune_interval=300):
+        self.root = root
+        self.max_bytes = max_bytes   # 0 表示不限制大小
+        self.chunk_size = chunk_size
+        self.prune_interval = prune_interval # 其他进程(gunicorn)也会写入, 每隔一段时间重新统计一次实际大小
+        self.total_bytes = None      # 上次统计的总大小加上之后本进程新增的大小, None 表示还没有统计过
+        self.last_scan = 0
+        self.prune_lock = Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256 + '.pdf')
+
+    def exists(self, sha256):
+        return is_sha256(sha256) and os.path.exists(self.path(sha256))
+
+    # 边写入边计算哈希, 写完后原子地移动到最终位置, 返回 (sha256, size)
+    def put_stream(self, stream, expected_sha256=None):
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            if size == 0: # 没有上传内容
+                return None, 0
+            sha256 = digest.hexdigest()
+            if expected_sha256 and sha256 != expected_sha256:
+                raise ValueError(f"文件哈希不匹配: 期望 {expected_sha256}, 实际为 {sha256}")
+            self._commit(tmp_path, sha256)
+            return sha256, size
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put_bytes(self, content):
+        sha256 = hashlib.sha256(content).hexdigest()
+        if not self.exists(sha256):
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            self._commit(tmp_path, sha256)
+        return sha256, len(content)
+
+    # 登记服务端生成的文件
+    def put_file(self, path):
+        with open(path, 'rb') as f:
+            sha256 = self.hash_stream(f)
+        if not self.exists(sha256):
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+            os.close(fd)
+            shutil.copyfile(path, tmp_path)
+            self._commit(tmp_path, sha256)
+        return sha256
+
+    def hash_stream(self, stream):
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: stream.read(self.chunk_size), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    # 将blob复制到目标路径; 不使用硬链接, 因为翻译引擎可能会直接覆盖写入同名文件
+    # blob 可能在 exists() 之后被淘汰, 此时抛出 FileNotFoundError
+    def materialize(self, sha256, dest_path):
+        src = self.path(sha256)
+        shutil.copyfile(src, dest_path)
+        os.utime(src) # 更新访问时间, 用于淘汰最久未使用的blob
+        return dest_path
+
+    def _commit(self, tmp_path, sha256):
+        final_path = self.path(sha256)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        if os.path.exists(final_path):
+            os.utime(final_path)
+            os.remove(tmp_path)
+            return
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, final_path)
+        if not self.max_bytes:
+            return
+        with self.prune_lock:
+            if self.total_bytes is not None:
+                self.total_bytes += size
+            # 只在可能超出容量或距离上次统计太久时遍历目录, 避免每次上传都遍历整个目录
+            needs_prune = self.total_bytes is None or self.total_bytes > self.max_bytes or time.time() - self.last_scan > self.prune_interval
+        if needs_prune:
+            self.prune(keep=final_path)
+
+    # 超出容量时, 按修改时间淘汰最久未使用的blob
+    def prune(self, keep=None):
+        if not self.max_bytes:
+            return
+        with self.prune_lock:
+            self.last_scan = time.time()
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.root):
+                for name in files:
+                    if not name.endswith('.pdf'):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError: # 被其他进程淘汰
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self.total_bytes = total
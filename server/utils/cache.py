@@ -0,0 +1,147 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+from contextlib import contextmanager
+from threading import Lock
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+# 翻译结果缓存: key = sha256(操作 + PDF哈希 + 影响输出的配置项)
+# 命中时直接返回之前生成的文件, 不再重新调用翻译引擎
+# 索引存放在 sqlite 中, 超出容量时按最近访问时间(LRU)淘汰
+
+class ResultCache:
+    def __init__(self, root, max_bytes=0, version=''):
+        self.root = root
+        self.max_bytes = max_bytes  # 0 表示不限制大小
+        self.version = version      # server版本号, 升级后旧缓存自动失效
+        self.lock = Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self.db_path = os.path.join(self.root, 'index.db')
+        with self._connect() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                files TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                last_access REAL NOT NULL
+            )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)')
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn: # 自动提交/回滚
+                yield conn
+        finally:
+            conn.close()
+
+    def make_key(self, operation, file_hash, config_fields):
+        payload = {
+            'version': self.version,
+            'operation': operation,
+            'fileHash': file_hash,
+            'config': config_fields,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    # 命中时将缓存的文件复制到 output_folder, 文件名按照本次请求的输入文件名还原; 未命中返回None
+    # count_miss=False 用于再次查询同一个key, 未命中时不重复计入命中率
+    def get(self, key, input_path, output_folder, count_miss=True):
+        with self.lock, self._connect() as conn:
+            row = conn.execute('SELECT files FROM entries WHERE key = ?', (key,)).fetchone()
+            entry_dir = os.path.join(self.root, key)
+            if row is None or not os.path.isdir(entry_dir):
+                if count_miss:
+                    self._count(conn, 'misses')
+                return None
+            stem = self._stem(input_path)
+            file_list = []
+            for item in json.loads(row[0]):
+                name = stem + item['name'] if item['relative'] else item['name']
+                dest = os.path.join(output_folder, name)
+                self._atomic_copy(os.path.join(entry_dir, item['file']), dest)
+                file_list.append(dest)
+            conn.execute('UPDATE entries SET hits = hits + 1, last_access = ? WHERE key = ?', (datetime.datetime.now().timestamp(), key))
+            self._count(conn, 'hits')
+            return file_list
+
+    def put(self, key, input_path, file_list):
+        stem = self._stem(input_path)
+        entry_dir = os.path.join(self.root, key)
+        tmp_dir = tempfile.mkdtemp(dir=self.root, suffix='.tmp')
+        try:
+            files, size = [], 0
+            for i, path in enumerate(file_list):
+                name = os.path.basename(path)
+                relative = name.startswith(stem)
+                stored = f"{i}.pdf"
+                shutil.copyfile(path, os.path.join(tmp_dir, stored))
+                size += os.path.getsize(path)
+                files.append({'file': stored, 'name': name[len(stem):] if relative else name, 'relative': relative})
+            with self.lock, self._connect() as conn:
+                if os.path.isdir(entry_dir):
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(tmp_dir, entry_dir)
+                now = datetime.datetime.now()
+                conn.execute('INSERT OR REPLACE INTO entries (key, files, size, hits, created_at, last_access) VALUES (?, ?, ?, 0, ?, ?)',
+                             (key, json.dumps(files, ensure_ascii=False), size, now.isoformat(), now.timestamp()))
+                self._evict(conn, keep=key)
+        finally:
+            if os.path.isdir(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def stats(self):
+        with self.lock, self._connect() as conn:
+            counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hitRate': hits / (hits + misses) if hits + misses else 0.0,
+            'evictions': counters.get('evictions', 0),
+            'entries': entries,
+            'sizeBytes': size,
+            'maxBytes': self.max_bytes,
+        }
+
+    def _evict(self, conn, keep=None):
+        if not self.max_bytes:
+            return
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY last_access ASC').fetchall():
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            total -= size
+            self._count(conn, 'evictions')
+            print(f"🧹 [缓存] 淘汰翻译结果缓存: {key}")
+
+    def _count(self, conn, name):
+        conn.execute('INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1', (name,))
+
+    @staticmethod
+    def _stem(input_path):
+        name = os.path.basename(input_path)
+        return name[:-len('.pdf')] if name.lower().endswith('.pdf') else name
+
+    @staticmethod
+    def _atomic_copy(src, dest):
+        tmp = dest + '.tmp'
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
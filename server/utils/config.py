@@ -2,12 +2,33 @@
 # guaguastandup
 # zotero-pdf2zh
 import json, toml
+from collections import OrderedDict
+import copy
+import hashlib
 import os
+import threading
 from utils.config_map import pdf2zh_config_map, pdf2zh_next_config_map
+from utils.cropper import CROP_MODES, SAVE_PROFILES
 
 pdf2zh = 'pdf2zh'
 pdf2zh_next = 'pdf2zh_next'
 
+_render_lock = threading.Lock()
+_templates = {}      # 模板路径 -> (mtime, 解析后的配置)
+_rendered_texts = OrderedDict() # 请求中的服务配置 -> 生成的配置文件内容, 只保留最近使用的 _rendered_limit 个
+_rendered_limit = 64
+
+def _load_template(template_file, mtime):
+    with _render_lock:
+        cached = _templates.get(template_file)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(template_file, 'r', encoding='utf-8') as f:
+        data = toml.load(f) if template_file.endswith('.toml') else json.load(f)
+    with _render_lock:
+        _templates[template_file] = (mtime, data)
+    return data
+
 def stringToBoolean(value):
     if value == 'true' or value == 'True' or value == True or value == 1:
         return True
@@ -83,6 +104,27 @@ class Config:
         self.pdf_h_offset = int(request_data.get('pdf_h_offset', 20))
         self.pdf_offset_ratio = float(request_data.get('pdf_offset_ratio', 5))
         self.pdf_white_margin = int(request_data.get('pdf_white_margin', 0))
+        # 裁剪模式: redact(默认, 移除栏外的隐藏文本和图形) / hybrid(只移除文本) / clip(只裁剪显示区域, 最快)
+        # 不支持的裁剪模式抛出 ValueError, 由服务端返回400, 避免拼写错误时悄悄改变生成的文件
+        self.crop_mode = str(request_data.get('cropMode') or 'redact').lower()
+        if self.crop_mode not in CROP_MODES:
+            raise ValueError(f"不支持的裁剪模式 cropMode: {self.crop_mode}, 可选: {', '.join(CROP_MODES)}")
+        # 保存生成文件时的压缩程度: fast / balanced / compact, 不设置时使用各文件原来的设置(裁剪: compact, 拼接: balanced)
+        # saveProfiles 可以为每种文件单独设置, 例如 {"crop-compare": "fast"}; multipart表单和请求头中为JSON字符串
+        # 不支持的保存方式抛出 ValueError, 由服务端返回400
+        self.save_profile = request_data.get('saveProfile') or None
+        save_profiles = request_data.get('saveProfiles') or {}
+        if isinstance(save_profiles, str):
+            try:
+                save_profiles = json.loads(save_profiles)
+            except ValueError:
+                raise ValueError(f"saveProfiles 不是有效的JSON: {save_profiles}")
+        if not isinstance(save_profiles, dict):
+            raise ValueError(f"saveProfiles 应为对象, 例如 {{\"crop-compare\": \"fast\"}}, 实际为: {save_profiles}")
+        self.save_profiles = dict(save_profiles)
+        for name, profile in [('saveProfile', self.save_profile)] + list(self.save_profiles.items()):
+            if profile is not None and profile not in SAVE_PROFILES:
+                raise ValueError(f"不支持的保存方式 {name}: {profile}, 可选: {', '.join(SAVE_PROFILES)}")
 
         self.mono = stringToBoolean(request_data.get('mono', True))
         self.dual = stringToBoolean(request_data.get('dual', True))
@@ -121,7 +163,53 @@ class Config:
             'extraData': request_data.get('llm_api', {}).get('extraData', {})
         }
 
-    def update_config_file(self, config_file):
+    # 生成 artifact(例如 mono-cut, compare)时使用的保存方式
+    def save_profile_for(self, artifact, default='compact'):
+        return self.save_profiles.get(artifact) or self.save_profile or default
+
+    # 多个引擎进程同时请求同一个翻译服务(并行的分片)时按 parts 平分请求速率
+    # pool_size 与 qps 按相同的比例缩小, 保持 __init__ 中按服务计算的比例(例如 zhipu); 返回原来的值, 用于恢复
+    def split_limits(self, parts):
+        limits = (self.qps, self.thread_num, self.pool_size)
+        if self.qps:
+            self.set_qps(max(1, self.qps // parts))
+        else:
+            self.pool_size //= parts
+        self.thread_num = max(1, self.thread_num // parts)
+        return limits
+
+    # 按 share / total 的比例缩小 qps, 线程数和 pool_size (例如从共用的qps预算中分到的份额); 返回原来的值, 用于恢复
+    def scale_limits(self, share, total):
+        limits = (self.qps, self.thread_num, self.pool_size)
+        if self.qps:
+            self.set_qps(max(1, self.qps * share // total))
+        else:
+            self.pool_size = max(1, self.pool_size * share // total)
+        self.thread_num = max(1, self.thread_num * share // total)
+        return limits
+
+    # 修改 qps(例如 qps 自动调节), pool_size 按相同比例变化
+    def set_qps(self, qps):
+        if self.qps:
+            self.pool_size = min(1000, self.pool_size * qps // self.qps)
+        self.qps = qps
+
+    def restore_limits(self, limits):
+        self.qps, self.thread_num, self.pool_size = limits
+
+    # 影响翻译结果的配置项, 用于翻译结果缓存的key
+    # thread_num / qps / pool_size 只影响速度, apiKey 不影响结果, 因此不参与计算
+    def cache_fields(self):
+        fields = {k: v for k, v in self.__dict__.items() if k not in ('llm_api', 'thread_num', 'qps', 'pool_size')}
+        fields['llm_api'] = {
+            'apiUrl': self.llm_api.get('apiUrl', ''),
+            'model': self.llm_api.get('model', ''),
+            'extraData': self.llm_api.get('extraData', {}),
+        }
+        return fields
+
+    # 在模板配置的基础上写入本次请求的服务配置, 返回新的配置; 无需映射时返回None
+    def build_config(self, old_config):
         service = self.service
         engine = self.engine
         if engine == pdf2zh:
@@ -129,12 +217,9 @@ class Config:
             config_map = pdf2zh_config_map.get(service, {})
             if not config_map: # 无需映射, 直接跳过
                 print(f"🔍 No config_map found for service: {service}, 如果是新的服务, 请联系开发者更新config_map, 如果不是请忽略")
-                return
-
-            with open(config_file, 'r', encoding='utf-8') as f:
-                old_config = json.load(f)
+                return None
 
-            new_config = old_config.copy()
+            new_config = copy.deepcopy(old_config) # 模板会被缓存复用, 不能修改
 
             # 更新字体
             if os.path.exists(self.font_file):
@@ -195,20 +280,15 @@ class Config:
                     del translator['envs'][key]
                     print(f"✏️ 删除旧 {key}")
 
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(new_config, f, indent=4, ensure_ascii=False)
-                print(f"✏️ 更新 config file: {config_file}")
+            return new_config
             
         elif engine == pdf2zh_next: # toml文件, 格式参考server/config/config.toml.example
             config_map = pdf2zh_next_config_map.get(service, {})
             if not config_map:
                 print(f"✏️ No config_map found for service: {service}, 如果是新的服务, 请联系开发者更新config_map")
-                return
-            
-            with open(config_file, 'r', encoding='utf-8') as f:
-                old_config = toml.load(f)
+                return None
 
-            new_config = old_config.copy() # 我们假设config.toml文件的格式没有问题
+            new_config = copy.deepcopy(old_config) # 我们假设config.toml文件的格式没有问题
             translator = None 
             if f'{service}_detail' in new_config:
                 translator = new_config[f'{service}_detail']
@@ -259,8 +339,43 @@ class Config:
                     print(f"✏️ 删除旧 {key}")
 
             # print("查看toml config结构", new_config)
-            with open(config_file, 'w', encoding='utf-8') as f:
-                toml.dump(new_config, f)
-                print(f"✏️ 更新 config file: {config_file}")
+            return new_config
         else:
             print(f"✏️ 不支持的引擎类型: {engine}")
+            return None
+
+    # 为本次请求生成独立的配置文件, 不再改写全局的 config.json / config.toml
+    # 配置文件中含有apiKey, 因此写入任务的工作目录(out_dir), 权限为0600, 随工作目录一起删除
+    # 文件按内容哈希命名且不再修改, 同一任务的各分片复用同一个文件, 并发任务之间互不影响
+    def render_config_file(self, template_file, out_dir):
+        mtime = os.path.getmtime(template_file)
+        memo_key = (template_file, mtime, self.engine, self.service, self.font_file,
+                    json.dumps(self.llm_api, sort_keys=True, ensure_ascii=False, default=str))
+        with _render_lock:
+            text = _rendered_texts.get(memo_key)
+            if text is not None:
+                _rendered_texts.move_to_end(memo_key)
+        if text is None:
+            new_config = self.build_config(_load_template(template_file, mtime))
+            if new_config is None: # 无需映射, 直接使用模板
+                return template_file
+            if template_file.endswith('.toml'):
+                text = toml.dumps(new_config)
+            else:
+                text = json.dumps(new_config, indent=4, ensure_ascii=False)
+            with _render_lock:
+                _rendered_texts[memo_key] = text
+                while len(_rendered_texts) > _rendered_limit:
+                    _rendered_texts.popitem(last=False)
+
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+        name, ext = os.path.splitext(os.path.basename(template_file))
+        rendered = os.path.join(out_dir, f".{name}-{digest}{ext}")
+        if not os.path.exists(rendered):
+            tmp = f"{rendered}.{os.getpid()}.{threading.get_ident()}.tmp"
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp, rendered)
+            print(f"✏️ 生成 config file: {rendered}")
+        return rendered
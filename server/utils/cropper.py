@@ -8,9 +8,34 @@ import fitz
 import os
 import traceback
 import shutil
+import math
+import glob
+import time
+from concurrent.futures import wait
+
+# 裁剪模式:
+#   redact: 移除栏外的文字和图形(默认), 生成的文件中没有隐藏文字, 但最慢
+#   hybrid: 只移除栏外的文字, 保留图形, 较快
+#   clip:   不修改页面内容, 只按栏裁剪显示区域, 最快, 栏外的文字仍然可以被搜索和复制
+CROP_MODES = ('redact', 'hybrid', 'clip')
+
+# 保存PDF时的参数, 压缩越充分越慢:
+#   fast:     只清理未使用的对象, 适合只预览一次的文件
+#   balanced: 合并重复的对象, 压缩未压缩的数据流, 不重新压缩图片和字体
+#   compact:  在 balanced 的基础上清理内容流, 重新压缩图片和字体, 文件最小
+SAVE_PROFILES = {
+    'fast': dict(garbage=1, deflate=True),
+    'balanced': dict(garbage=4, deflate=True),
+    'compact': dict(garbage=4, deflate=True, clean=True, deflate_images=True, deflate_fonts=True),
+}
+
+def save_pdf(doc, path, profile='compact'):
+    start = time.time()
+    doc.save(path, **SAVE_PROFILES[profile])
+    print(f"💾 保存 {os.path.basename(path)} ({profile}): {os.path.getsize(path)/1024.0/1024.0:.2f} MB, 用时 {time.time() - start:.2f}s")
 
 # thanks Grok
-def _apply_redactions_outside_clip(page, clip_rect):
+def _apply_redactions_outside_clip(page, clip_rect, crop_mode='redact'):
     """辅助函数：移除clip_rect外的所有内容，使用redaction永久删除。"""
     page_rect = page.rect  # 页面全矩形
     redact_rects = [] # 计算clip外的矩形（左、上、右、下）
@@ -25,6 +50,9 @@ def _apply_redactions_outside_clip(page, clip_rect):
     # 添加redaction注解（移除填充以减少大小）
     for r_rect in redact_rects:
         page.add_redact_annot(r_rect, fill=None)  # 无填充，仅移除内容
+    if crop_mode == 'hybrid': # 只移除文本, 不处理图像和图形
+        page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE, graphics=fitz.PDF_REDACT_LINE_ART_NONE, text=fitz.PDF_REDACT_TEXT_REMOVE)
+        return
     # 应用redaction：移除文本、图像、图形（调整参数以优化大小）
     page.apply_redactions(
         # images=fitz.PDF_REDACT_IMAGE_REMOVE,  # 完全移除重叠图像
@@ -32,17 +60,131 @@ def _apply_redactions_outside_clip(page, clip_rect):
         text=fitz.PDF_REDACT_TEXT_REMOVE
     )  # 移除重叠文本
 
+# 拷贝 src_doc 的 [start, end) 页, 并移除每页 clip_rect 以外的内容
+# 同一文档中的页面共享字体等资源, show_pdf_page 时只会复制一次
+def _redacted_copy(src_doc, start, end, clip_rect, crop_mode='redact'):
+    col_doc = fitz.open()
+    col_doc.insert_pdf(src_doc, from_page=start, to_page=end - 1)
+    for page in col_doc:
+        _apply_redactions_outside_clip(page, clip_rect, crop_mode)
+    return col_doc
+
+# 返回每一栏用于生成新页面的文档, 以及 start 页在这些文档中的页码
+# clip 模式不修改页面, 直接使用源文档
+def _column_docs(src_doc, start, end, clip_rects, crop_mode='redact'):
+    if crop_mode == 'clip':
+        return [src_doc] * len(clip_rects), start
+    return [_redacted_copy(src_doc, start, end, clip_rect, crop_mode) for clip_rect in clip_rects], 0
+
+def _close_column_docs(col_docs, src_doc):
+    for col_doc in col_docs:
+        if col_doc is not src_doc:
+            col_doc.close()
+
+CHUNK_PAGES = 16 # 并行裁剪时每个分块的最大页数
+
+# 将 [0, page_count) 按 step 对齐(双语文件按页对)划分为页数尽量平均的分块 [(start, end), ...], 不包含end
+def _chunk_ranges(page_count, step=1, chunk_pages=CHUNK_PAGES):
+    units = page_count // step
+    count = max(1, math.ceil(units / max(1, chunk_pages // step)))
+    size = math.ceil(units / count) if units else 0
+    return [(start * step, min(start + size, units) * step) for start in range(0, units, size)] if size else []
+
+# 在子进程中裁剪一个分块, 结果写入 chunk_path; fitz 文档不能跨进程共享, 因此在子进程中重新打开
+def _crop_chunk(chunk_path, start, end, input_pdf, offsets, infile_type, outfile_type, dualFirst, engine, crop_mode):
+    src_doc = fitz.open(input_pdf)
+    new_doc = fitz.open()
+    try:
+        Cropper()._crop_pages(src_doc, new_doc, start, end, offsets, infile_type, outfile_type, dualFirst, engine, crop_mode)
+        new_doc.save(chunk_path, garbage=1)
+    finally:
+        new_doc.close()
+        src_doc.close()
+    return chunk_path
+
+# 同时生成多个双语输出的分块, 每种输出写入 chunk_path.<输出类型>
+def _dual_chunk(chunk_path, start, end, input_pdf, offsets, outfile_types, dualFirst, engine, crop_mode):
+    src_doc = fitz.open(input_pdf)
+    new_docs = {outfile_type: fitz.open() for outfile_type in outfile_types}
+    try:
+        Cropper()._dual_pages(src_doc, new_docs, start, end, offsets, dualFirst, engine, crop_mode)
+        paths = []
+        for outfile_type, new_doc in new_docs.items():
+            paths.append(f"{chunk_path}.{outfile_type}")
+            new_doc.save(paths[-1], garbage=1)
+    finally:
+        for new_doc in new_docs.values():
+            new_doc.close()
+        src_doc.close()
+    return paths
+
+def _split_chunk(chunk_path, start, end, input_pdf, crop_mode):
+    src_doc = fitz.open(input_pdf)
+    new_doc = fitz.open()
+    try:
+        Cropper()._split_pages(src_doc, new_doc, start, end, crop_mode)
+        new_doc.save(chunk_path, garbage=1)
+    finally:
+        new_doc.close()
+        src_doc.close()
+    return chunk_path
+
 class Cropper():
     def __init__(self):
         pass
-    
+
+    # executor 为进程池时, 页数较多的文档按页分块并行处理, 再按顺序拼接; 否则在当前进程中依次处理
+    # func 返回一个分块文件, 或多个输出各自的分块文件列表; 返回拼接后的文档列表
+    def _run_chunks(self, executor, func, ranges, output_pdf, *chunk_args):
+        chunk_paths = [f"{output_pdf}.part{i:03d}" for i in range(len(ranges))]
+        futures = [executor.submit(func, path, start, end, *chunk_args) for path, (start, end) in zip(chunk_paths, ranges)]
+        try:
+            new_docs = []
+            for future in futures:
+                parts = future.result()
+                for i, part_path in enumerate(parts if isinstance(parts, list) else [parts]):
+                    if i == len(new_docs):
+                        new_docs.append(fitz.open())
+                    with fitz.open(part_path) as part:
+                        new_docs[i].insert_pdf(part)
+            return new_docs
+        finally:
+            wait(futures) # 某个分块失败时, 等待其余分块结束后再删除临时文件
+            for path in chunk_paths:
+                for part_path in glob.glob(glob.escape(path) + '*'):
+                    os.remove(part_path)
+
     # very prefect!
-    def crop_pdf(self, config, input_pdf, infile_type, output_pdf, outfile_type, dualFirst=True, engine="pdf2zh"):
-        w_offset = config.pdf_w_offset   # 左右边距
-        h_offset = config.pdf_h_offset   # 上下边距
-        r = config.pdf_offset_ratio      # 偏移比例
+    def crop_pdf(self, config, input_pdf, infile_type, output_pdf, outfile_type, dualFirst=True, engine="pdf2zh", executor=None, save_profile='compact'):
+        offsets = (config.pdf_w_offset, config.pdf_h_offset, config.pdf_offset_ratio) # 左右边距, 上下边距, 偏移比例
+        crop_mode = config.crop_mode
         src_doc = fitz.open(input_pdf)  # 打开输入PDF
-        new_doc = fitz.open()
+        page_count = len(src_doc)
+        if infile_type == 'dual' and page_count % 2 != 0:
+            src_doc.close()
+            raise ValueError("❗️ PDF page number is not even, cropping skipped.")
+        ranges = _chunk_ranges(page_count, 2 if infile_type == 'dual' else 1) if executor else []
+        if len(ranges) > 1:
+            print(f"✂️ 并行裁剪 {page_count} 页, 分为 {len(ranges)} 块")
+            new_doc = self._run_chunks(executor, _crop_chunk, ranges, output_pdf, input_pdf, offsets, infile_type, outfile_type, dualFirst, engine, crop_mode)[0]
+        else:
+            new_doc = fitz.open()
+            self._crop_pages(src_doc, new_doc, 0, page_count, offsets, infile_type, outfile_type, dualFirst, engine, crop_mode)
+        # 保存时优化大小：垃圾回收、压缩、清理
+        save_pdf(new_doc, output_pdf, save_profile)
+        new_doc.close()
+        src_doc.close()
+        if crop_mode == 'clip':
+            print(f"✅ 处理完成，新PDF保存为 {output_pdf}. 裁剪模式: clip, 未移除隐藏文本。")
+        else:
+            print(f"✅ 处理完成，新PDF保存为 {output_pdf}. 已移除隐藏文本，并优化文件大小。")
+
+    # 裁剪 src_doc 的 [start, end) 页, 追加到 new_doc; 页面尺寸以第一页为准
+    def _crop_pages(self, src_doc, new_doc, start, end, offsets, infile_type, outfile_type, dualFirst=True, engine="pdf2zh", crop_mode='redact'):
+        if infile_type == 'dual':
+            self._dual_pages(src_doc, {outfile_type: new_doc}, start, end, offsets, dualFirst, engine, crop_mode)
+            return
+        w_offset, h_offset, r = offsets
         mediabox = src_doc[0].mediabox
         w = mediabox.width
         h = mediabox.height
@@ -52,92 +194,126 @@ class Cropper():
         right_clip = fitz.Rect(half_w - w_offset / r, h_offset, w - w_offset, h - h_offset) 
         clip_rects = [left_clip, right_clip]
 
-        # 创建源文档的完整拷贝，避免多次拷贝单个页面
-        temp_src_doc = fitz.open()
-        temp_src_doc.insert_pdf(src_doc)
-
-        if infile_type == 'mono' or infile_type == 'origin':
-            for page_num in range(len(temp_src_doc)):
-                # 为每个页面创建一个临时拷贝（仅一次），然后为每个栏分别处理redaction
-                temp_page_doc_base = fitz.open()
-                temp_page_doc_base.insert_pdf(temp_src_doc, from_page=page_num, to_page=page_num)
-                for clip_rect in clip_rects:
-                    # 由于redaction是破坏性的，为每个栏拷贝base
-                    temp_page_doc = fitz.open()
-                    temp_page_doc.insert_pdf(temp_page_doc_base)
-                    temp_page = temp_page_doc[0]
-                    _apply_redactions_outside_clip(temp_page, clip_rect)
-                    # 创建新页面：直接切分为上页（左栏）和下页（右栏）
-                    new_page = new_doc.new_page(width=clip_rect.width, height=clip_rect.height)
-                    new_page.show_pdf_page(new_page.rect, temp_page_doc, 0, clip=clip_rect)
-                    new_page.clean_contents()
-                    temp_page_doc.close()
-                temp_page_doc_base.close()
+        # 每个栏只拷贝一次页面范围, 在拷贝上移除栏外的内容; 各栏使用独立的拷贝, redaction互不影响
+        col_docs, first = _column_docs(src_doc, start, end, clip_rects, crop_mode)
+        try:
+            if infile_type == 'mono' or infile_type == 'origin':
+                for page_num in range(first, first + end - start):
+                    for col_doc, clip_rect in zip(col_docs, clip_rects):
+                        # 创建新页面：直接切分为上页（左栏）和下页（右栏）
+                        new_page = new_doc.new_page(width=clip_rect.width, height=clip_rect.height)
+                        new_page.show_pdf_page(new_page.rect, col_doc, page_num, clip=clip_rect)
+                        new_page.clean_contents()
+
+        finally:
+            _close_column_docs(col_docs, src_doc)
 
-        elif infile_type == 'dual':
-            if len(temp_src_doc) % 2 != 0:
-                raise ValueError("❗️ PDF page number is not even, cropping skipped.")
+    # 一次打开双语文件, 同时生成多个输出(dual-cut, crop-compare, compare), outputs 为 {输出类型: (路径, 保存方式)}
+    # dual-cut 和 crop-compare 共享每一栏的 redaction 结果
+    def process_dual(self, config, input_pdf, outputs, dualFirst=True, engine="pdf2zh", executor=None):
+        offsets = (config.pdf_w_offset, config.pdf_h_offset, config.pdf_offset_ratio)
+        crop_mode = config.crop_mode
+        outfile_types = list(outputs)
+        src_doc = fitz.open(input_pdf)
+        page_count = len(src_doc)
+        if page_count % 2 != 0:
+            src_doc.close()
+            raise ValueError("❗️ PDF page number is not even, cropping skipped.")
+        ranges = _chunk_ranges(page_count, 2) if executor else []
+        if len(ranges) > 1:
+            print(f"✂️ 并行处理 {page_count} 页, 分为 {len(ranges)} 块")
+            new_docs = self._run_chunks(executor, _dual_chunk, ranges, outputs[outfile_types[0]][0], input_pdf, offsets, outfile_types, dualFirst, engine, crop_mode)
+        else:
+            new_docs = [fitz.open() for _ in outfile_types]
+            self._dual_pages(src_doc, dict(zip(outfile_types, new_docs)), 0, page_count, offsets, dualFirst, engine, crop_mode)
+        for outfile_type, new_doc in zip(outfile_types, new_docs):
+            output_pdf, save_profile = outputs[outfile_type]
+            save_pdf(new_doc, output_pdf, save_profile)
+            new_doc.close()
+        src_doc.close()
+        print(f"✅ 处理完成，同时生成 {', '.join(outfile_types)}: {input_pdf}")
+
+    # 从双语文件的 [start, end) 页生成 new_docs 中的各个输出, new_docs 为 {输出类型: 文档}
+    def _dual_pages(self, src_doc, new_docs, start, end, offsets, dualFirst=True, engine="pdf2zh", crop_mode='redact'):
+        w_offset, h_offset, r = offsets
+        mediabox = src_doc[0].mediabox
+        w = mediabox.width
+        h = mediabox.height
+        half_w = w / 2
 
-            for i in range(0, len(temp_src_doc), 2):
+        left_clip = fitz.Rect(w_offset, h_offset, half_w + w_offset / r, h - h_offset)
+        right_clip = fitz.Rect(half_w - w_offset / r, h_offset, w - w_offset, h - h_offset) 
+        clip_rects = [left_clip, right_clip]
+
+        cut_doc = new_docs.get('dual-cut')
+        crop_compare_doc = new_docs.get('crop-compare')
+        compare_doc = new_docs.get('compare')
+        if cut_doc is not None or crop_compare_doc is not None:
+            col_docs, first = _column_docs(src_doc, start, end, clip_rects, crop_mode)
+        else:
+            col_docs, first = [], start
+        try:
+            for i in range(0, end - start, 2):
                 odd_page_num = i
                 even_page_num = i + 1
                 if engine == "pdf2zh" and dualFirst == True:
                     odd_page_num = i + 1
                     even_page_num = i
-                # 为奇数页和偶数页各创建一个base拷贝
-                odd_base_doc = fitz.open()
-                odd_base_doc.insert_pdf(temp_src_doc, from_page=odd_page_num, to_page=odd_page_num)
-                even_base_doc = fitz.open()
-                even_base_doc.insert_pdf(temp_src_doc, from_page=even_page_num, to_page=even_page_num)
-                for clip_rect in clip_rects:
-                    if outfile_type == 'crop-compare':  # 左右拼接
-                        new_page = new_doc.new_page(width=w, height=h - 2 * h_offset)
+                for col_doc, clip_rect in zip(col_docs, clip_rects):
+                    if crop_compare_doc is not None:  # 左右拼接
+                        new_page = crop_compare_doc.new_page(width=w, height=h - 2 * h_offset)
                         target_left_rect = fitz.Rect(0, 0, w / 2, h - 2 * h_offset)
                         target_right_rect = fitz.Rect(w / 2, 0, w, h - 2 * h_offset)
-                        # 处理奇数页（原文）
-                        odd_temp_doc = fitz.open()
-                        odd_temp_doc.insert_pdf(odd_base_doc)
-                        odd_temp_page = odd_temp_doc[0]
-                        _apply_redactions_outside_clip(odd_temp_page, clip_rect)
-                        new_page.show_pdf_page(target_left_rect, odd_temp_doc, 0, clip=clip_rect)
-                        odd_temp_doc.close()
-                        # 处理偶数页（翻译）
-                        even_temp_doc = fitz.open()
-                        even_temp_doc.insert_pdf(even_base_doc)
-                        even_temp_page = even_temp_doc[0]
-                        _apply_redactions_outside_clip(even_temp_page, clip_rect)
-                        new_page.show_pdf_page(target_right_rect, even_temp_doc, 0, clip=clip_rect)
-                        even_temp_doc.close()
+                        new_page.show_pdf_page(target_left_rect, col_doc, first + odd_page_num, clip=clip_rect)   # 原文
+                        new_page.show_pdf_page(target_right_rect, col_doc, first + even_page_num, clip=clip_rect) # 翻译
                         new_page.clean_contents()
-                    elif outfile_type == 'dual-cut':
+                    if cut_doc is not None:
                         # 对于每个栏：原文半页 -> 对应翻译半页
-                        # 处理原文
-                        odd_temp_doc = fitz.open()
-                        odd_temp_doc.insert_pdf(odd_base_doc)
-                        odd_temp_page = odd_temp_doc[0]
-                        _apply_redactions_outside_clip(odd_temp_page, clip_rect)
-                        odd_new_page = new_doc.new_page(width=clip_rect.width, height=clip_rect.height)
-                        odd_new_page.show_pdf_page(odd_new_page.rect, odd_temp_doc, 0, clip=clip_rect)
-                        odd_new_page.clean_contents()
-                        odd_temp_doc.close()
-                        # 处理翻译
-                        even_temp_doc = fitz.open()
-                        even_temp_doc.insert_pdf(even_base_doc)
-                        even_temp_page = even_temp_doc[0]
-                        _apply_redactions_outside_clip(even_temp_page, clip_rect)
-                        even_new_page = new_doc.new_page(width=clip_rect.width, height=clip_rect.height)
-                        even_new_page.show_pdf_page(even_new_page.rect, even_temp_doc, 0, clip=clip_rect)
-                        even_new_page.clean_contents()
-                        even_temp_doc.close()
-                odd_base_doc.close()
-                even_base_doc.close()
-        temp_src_doc.close()
-        # 保存时优化大小：垃圾回收、压缩、清理
-        new_doc.save(output_pdf, garbage=4, deflate=True, clean=True, deflate_images=True, deflate_fonts=True)
-        new_doc.close()
-        src_doc.close()
-        print(f"✅ 处理完成，新PDF保存为 {output_pdf}. 已移除隐藏文本，并优化文件大小。")
-    
+                        for page_num in (odd_page_num, even_page_num):
+                            new_page = cut_doc.new_page(width=clip_rect.width, height=clip_rect.height)
+                            new_page.show_pdf_page(new_page.rect, col_doc, first + page_num, clip=clip_rect)
+                            new_page.clean_contents()
+                if compare_doc is not None: # 不裁剪, 将一对页面左右并排, 与 merge_pdf 相同
+                    left_rect = src_doc[start + odd_page_num].rect
+                    right_rect = src_doc[start + even_page_num].rect
+                    new_page = compare_doc.new_page(width=(left_rect.width + right_rect.width), height=left_rect.height)
+                    new_page.show_pdf_page(fitz.Rect(0, 0, left_rect.width, left_rect.height), src_doc, start + odd_page_num)
+                    new_page.show_pdf_page(fitz.Rect(left_rect.width, 0, left_rect.width + right_rect.width, right_rect.height), src_doc, start + even_page_num)
+        finally:
+            _close_column_docs(col_docs, src_doc)
+
+    # 字体子集化, 只保留用到的字形; fallback=True 使用 MuPDF 自身的子集化(与 pdf2zh 引擎相同), 不依赖 fonttools
+    # 失败时保留原文件, 返回是否成功
+    def subset_fonts(self, input_path, save_profile='balanced'):
+        subset_path = input_path + '.subset'
+        size = os.path.getsize(input_path)
+        start = time.time()
+        try:
+            doc = fitz.open(input_path)
+            try:
+                doc.subset_fonts(fallback=True)
+                save_pdf(doc, subset_path, save_profile)
+            finally:
+                doc.close()
+            os.replace(subset_path, input_path)
+        except Exception as e:
+            print(f"⚠️ 字体子集化失败, 使用未子集化的文件: {input_path}, 错误信息: {e}")
+            if os.path.exists(subset_path):
+                os.remove(subset_path)
+            return False
+        print(f"🔤 字体子集化完成: {os.path.basename(input_path)}, {size/1024.0/1024.0:.2f} MB -> {os.path.getsize(input_path)/1024.0/1024.0:.2f} MB, 用时 {time.time() - start:.2f}s")
+        return True
+
+    # 从 start 页开始每隔 step 页取一页, 保存为新文件
+    def select_pages(self, input_path, output_path, start=0, step=1, save_profile='fast'):
+        doc = fitz.open(input_path)
+        try:
+            doc.select(list(range(start, len(doc), step)))
+            save_pdf(doc, output_path, save_profile)
+        finally:
+            doc.close()
+        return output_path
+
     def pdf_dual_mode(self, dual_path, from_mode, to_mode):
         LR_dual_path = dual_path.replace('dual.pdf', f'LR_dual.pdf')
         TB_dual_path = dual_path.replace('dual.pdf', f'TB_dual.pdf')
@@ -149,10 +325,24 @@ class Cropper():
             self.split_pdf(LR_dual_path, TB_dual_path)
         return LR_dual_path, TB_dual_path
 
-    def split_pdf(self, input_path, output_path):
+    def split_pdf(self, input_path, output_path, executor=None, crop_mode='redact', save_profile='compact'):
         print(f"🐲 开始拆分PDF: {input_path} 到 {output_path}")
         src_doc = fitz.open(input_path)  # 打开输入PDF
-        new_doc = fitz.open()
+        ranges = _chunk_ranges(len(src_doc)) if executor else []
+        if len(ranges) > 1:
+            new_doc = self._run_chunks(executor, _split_chunk, ranges, output_path, input_path, crop_mode)[0]
+        else:
+            new_doc = fitz.open()
+            self._split_pages(src_doc, new_doc, 0, len(src_doc), crop_mode)
+        save_pdf(new_doc, output_path, save_profile)
+        new_doc.close()
+        src_doc.close()
+        if crop_mode == 'clip':
+            print(f"✅ 处理完成，新PDF保存为 {output_path}. 裁剪模式: clip, 未移除隐藏文本。")
+        else:
+            print(f"✅ 处理完成，新PDF保存为 {output_path}. 已移除隐藏文本，并优化文件大小。")
+
+    def _split_pages(self, src_doc, new_doc, start, end, crop_mode='redact'):
         mediabox = src_doc[0].mediabox
         w = mediabox.width
         h = mediabox.height
@@ -162,32 +352,18 @@ class Cropper():
         right_clip = fitz.Rect(half_w, 0, w, h)
         clip_rects = [left_clip, right_clip]
 
-        # 创建源文档的完整拷贝，避免多次拷贝单个页面
-        temp_src_doc = fitz.open()
-        temp_src_doc.insert_pdf(src_doc)
-        for page_num in range(len(temp_src_doc)):
-            # 为每个页面创建一个临时拷贝（仅一次），然后为每个栏分别处理redaction
-            temp_page_doc_base = fitz.open()
-            temp_page_doc_base.insert_pdf(temp_src_doc, from_page=page_num, to_page=page_num)
-            for clip_rect in clip_rects:
-                # 由于redaction是破坏性的，为每个栏拷贝base
-                temp_page_doc = fitz.open()
-                temp_page_doc.insert_pdf(temp_page_doc_base)
-                temp_page = temp_page_doc[0]
-                _apply_redactions_outside_clip(temp_page, clip_rect)
-                # 创建新页面：直接切分为上页（左栏）和下页（右栏）
-                new_page = new_doc.new_page(width=clip_rect.width, height=clip_rect.height)
-                new_page.show_pdf_page(new_page.rect, temp_page_doc, 0, clip=clip_rect)
-                new_page.clean_contents()
-                temp_page_doc.close()
-            temp_page_doc_base.close()
-        temp_src_doc.close()
-        new_doc.save(output_path, garbage=4, deflate=True, clean=True, deflate_images=True, deflate_fonts=True)
-        new_doc.close()
-        src_doc.close()
-        print(f"✅ 处理完成，新PDF保存为 {output_path}. 已移除隐藏文本，并优化文件大小。")
+        col_docs, first = _column_docs(src_doc, start, end, clip_rects, crop_mode)
+        try:
+            for page_num in range(first, first + end - start):
+                for col_doc, clip_rect in zip(col_docs, clip_rects):
+                    # 创建新页面：直接切分为上页（左栏）和下页（右栏）
+                    new_page = new_doc.new_page(width=clip_rect.width, height=clip_rect.height)
+                    new_page.show_pdf_page(new_page.rect, col_doc, page_num, clip=clip_rect)
+                    new_page.clean_contents()
+        finally:
+            _close_column_docs(col_docs, src_doc)
 
-    def merge_pdf(self, input_path, output_path, dualFirst=True, engine="pdf2zh"):
+    def merge_pdf(self, input_path, output_path, dualFirst=True, engine="pdf2zh", save_profile='balanced'):
         if len(fitz.open(input_path)) % 2 != 0:
             print(f"❌ [Zotero PDF2zh Server] merge_pdf Error: PDF page number is not even, merging skipped.")
             return None
@@ -213,7 +389,7 @@ class Cropper():
                 else:
                     new_page.show_pdf_page(fitz.Rect(0, 0, left_rect.width, left_rect.height), dual_pdf, page_num)
                     new_page.show_pdf_page(fitz.Rect(left_rect.width, 0, left_rect.width + right_rect.width, right_rect.height), dual_pdf, page_num + 1)
-            output_pdf.save(output_path, garbage=4, deflate=True)
+            save_pdf(output_pdf, output_path, save_profile)
             output_pdf.close()
             dual_pdf.close()
             print(f"🐲 合并成功，生成文件: {output_path}, 大小为: {os.path.getsize(output_path)/1024.0/1024.0:.2f} MB")
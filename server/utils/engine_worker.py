@@ -0,0 +1,66 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+import asyncio
+import json
+import os
+import sys
+import traceback
+
+# 常驻的 pdf2zh_next 工作进程, 由 worker_pool.py 使用引擎所在环境的python启动, 因此这里只能使用标准库和引擎自身的依赖
+# 启动时预先导入 pdf2zh_next / babeldoc 并预热资源(模型, 字体等), 之后每个任务只需要解析参数并翻译
+# 协议: stdin 每行一个JSON任务 {"id": ..., "args": [...]}, args 与命令行参数相同
+#       引擎日志和任务结果都写到 stderr, 结果行以 MARKER 开头, 保证日志和结果按顺序到达
+
+MARKER = '\x1ePDF2ZH_WORKER '
+
+def emit(message):
+    sys.stderr.write(MARKER + json.dumps(message) + '\n')
+    sys.stderr.flush()
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+    except Exception:
+        return 0.0
+
+def main():
+    # 引擎 print 到 stdout 的内容也转到 stderr
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    try:
+        import babeldoc.assets.assets
+        from pdf2zh_next.main import main as engine_main
+        babeldoc.assets.assets.warmup()
+    except Exception:
+        traceback.print_exc()
+        emit({'ready': False})
+        return 1
+    emit({'ready': True, 'pid': os.getpid(), 'rssMb': rss_mb()})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        task = json.loads(line)
+        sys.argv = ['pdf2zh_next'] + task['args']
+        try:
+            returncode = asyncio.run(engine_main()) or 0
+        except SystemExit as e: # argparse 参数错误等
+            returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+        sys.stdout.flush()
+        emit({'id': task['id'], 'returncode': returncode, 'rssMb': rss_mb()})
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Event
+import datetime
+import os
+import time
+import traceback
+import uuid
+from .metrics import QUEUE_WAIT_SECONDS
+
+# 异步任务: POST 立即返回 job id, 翻译/裁剪在后台线程池中执行
+# 同步接口(/translate 等)也通过线程池执行, 因此服务端并发数只由 max_workers 决定, 与HTTP连接数无关
+# 设置 admission(见 admission.py) 时由它限制同时执行的任务数和排队的任务数, 队列已满时 submit 抛出 QueueFullError
+# 设置 rate_budget(见 ratelimit.py) 时, 带有 budget 的任务先取得qps份额(job.budget_share), 再占用准入控制的名额,
+# 等待预算的任务仍然是排队状态, 不会挡住其他翻译服务的任务
+
+class Job:
+    def __init__(self, operation, filename, info=None):
+        self.id = uuid.uuid4().hex
+        self.operation = operation    # translate / crop / crop-compare / compare
+        self.filename = filename
+        self.status = 'queued'        # queued | running | success | error
+        self.file_list = []           # 生成的文件路径
+        self.error = None             # 失败时返回给客户端的 payload
+        self.status_code = 200
+        self.created_at = datetime.datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.info = info or {}        # 附加信息, 例如 fileHash 和配置, 用于记录
+        self.queued_at = time.time()
+        self.budget_share = None      # 从qps预算中分到的份额
+        self.done = Event()
+
+    def to_dict(self):
+        data = {
+            'jobId': self.id,
+            'operation': self.operation,
+            'fileName': self.filename,
+            'status': self.status,
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+            'fileList': [],
+        }
+        if self.status == 'success':
+            data['fileList'] = self.file_names()
+        if self.error:
+            data['error'] = self.error
+        return data
+
+    def file_names(self):
+        return [os.path.basename(p) for p in self.file_list]
+
+class JobManager:
+    # on_update(job): 任务状态变化(queued / running / success / error)时回调
+    def __init__(self, max_workers=2, max_history=1000, on_update=None, admission=None, rate_budget=None):
+        self.max_workers = max(1, int(max_workers))
+        self.max_history = max_history
+        self.on_update = on_update
+        self.admission = admission
+        self.rate_budget = rate_budget
+        self.jobs = {}
+        self.jobs_lock = Lock()
+        # 排队的任务也各占一个线程等待, 这样某个引擎达到上限时不会挡住其他引擎的任务
+        threads = admission.max_running + admission.max_queue if admission else self.max_workers
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='pdf2zh-job')
+
+    # func(job) 返回生成的文件路径列表; on_error(exc) 返回 (payload, status_code)
+    # key 为准入控制的分组(例如翻译引擎); budget 为 (预算的key, qps), 见 ratelimit.py
+    def submit(self, operation, filename, func, on_error, info=None, key=None, budget=None):
+        if self.admission:
+            self.admission.reserve(key)
+        if budget and self.rate_budget:
+            self.rate_budget.expect(*budget)
+        else:
+            budget = None
+        job = Job(operation, filename, info)
+        with self.jobs_lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self._notify(job)
+        self.executor.submit(self._run_with_budget, job, func, on_error, key, budget)
+        print(f"📥 [Zotero PDF2zh Server] 新任务 {job.id} ({operation}): {filename}")
+        return job
+
+    # 不需要执行的任务(例如命中缓存), 直接记录为成功
+    def add_finished(self, operation, filename, file_list, info=None):
+        job = Job(operation, filename, info)
+        job.status = 'success'
+        job.file_list = file_list
+        job.started_at = job.finished_at = datetime.datetime.now().isoformat()
+        job.done.set()
+        with self.jobs_lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self._notify(job)
+        return job
+
+    def _run_with_budget(self, job, func, on_error, key=None, budget=None):
+        if not budget:
+            return self._run(job, func, on_error, key)
+        on_wait = lambda: print(f"⏳ [Zotero PDF2zh Server] 任务 {job.id} 等待qps预算: 其他任务正在使用全部的qps")
+        with self.rate_budget.lease(*budget, on_wait=on_wait, expected=True) as share:
+            job.budget_share = share
+            self._run(job, func, on_error, key)
+
+    def _run(self, job, func, on_error, key=None):
+        started_at = self.admission.acquire(key) if self.admission else None
+        QUEUE_WAIT_SECONDS.observe(time.time() - job.queued_at, key=key or job.operation)
+        job.status = 'running'
+        job.started_at = datetime.datetime.now().isoformat()
+        self._notify(job)
+        try:
+            job.file_list = func(job) or []
+            job.status = 'success'
+        except Exception as e:
+            job.status = 'error'
+            try:
+                job.error, job.status_code = on_error(e)
+            except Exception: # on_error 本身出错时也不能让任务卡在running
+                traceback.print_exc()
+                job.error, job.status_code = {'status': 'error', 'message': str(e)}, 500
+        finally:
+            if self.admission:
+                self.admission.release(key, started_at)
+            job.finished_at = datetime.datetime.now().isoformat()
+            job.done.set()
+            self._notify(job)
+            print(f"📤 [Zotero PDF2zh Server] 任务 {job.id} 结束, 状态: {job.status}")
+
+    def _notify(self, job):
+        if not self.on_update:
+            return
+        try:
+            self.on_update(job)
+        except Exception:
+            traceback.print_exc()
+
+    def get(self, job_id):
+        with self.jobs_lock:
+            return self.jobs.get(job_id)
+
+    def wait(self, job, timeout=None):
+        return job.done.wait(timeout)
+
+    def stats(self):
+        with self.jobs_lock:
+            counts = {'queued': 0, 'running': 0, 'success': 0, 'error': 0}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        counts['maxWorkers'] = self.max_workers
+        return counts
+
+    # 只保留最近 max_history 个已结束的任务, 防止内存无限增长
+    def _prune(self):
+        if len(self.jobs) <= self.max_history:
+            return
+        finished = [j for j in self.jobs.values() if j.done.is_set()]
+        finished.sort(key=lambda j: j.finished_at or '')
+        for job in finished[:len(self.jobs) - self.max_history]:
+            del self.jobs[job.id]
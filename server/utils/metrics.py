@@ -0,0 +1,164 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+from contextlib import contextmanager
+from threading import Lock
+import os
+import time
+
+# GET /metrics: Prometheus 文本格式的监控指标, 用于评估服务器容量
+# 不依赖 prometheus_client; 指标保存在当前进程的内存中, 服务重启后清零
+# gunicorn 模式下每个工作进程各自统计, 每次抓取只能得到其中一个进程的指标
+
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+BYTES_BUCKETS = tuple(2 ** n * 1024 for n in range(6, 20, 2)) # 64KB ~ 128MB
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple((name, labels.get(name, '')) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {_format_value(value)}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.values = {} # labels -> [各区间的计数, sum, count]
+        self.lock = Lock()
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels.get(name, '')) for name in self.labelnames)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f'{self.name}_bucket{_format_labels(key + (("le", _format_value(bound)),))} {cumulative}')
+                lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(round(total, 6))}')
+                lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+# 抓取时才计算的值(例如排队的任务数), func 返回 {(标签, ...): 值}, 不带标签时返回数值
+# 只增不减的值(例如被拒绝的任务数)使用 type='counter'
+class Gauge:
+    def __init__(self, name, help, func, labelnames=(), type='gauge'):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        values = self.func()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            key = key if isinstance(key, tuple) else (key,)
+            lines.append(f'{self.name}{_format_labels(tuple(zip(self.labelnames, key)))} {_format_value(value)}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics[metric.name] = metric # 同名的指标覆盖之前的(例如重新创建 PDFTranslator 时的 Gauge)
+        return metric
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e: # 某个指标出错时不影响其他指标
+                print(f"⚠️ [metrics] 无法统计 {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+UPLOAD_BYTES = registry.register(Histogram('pdf2zh_upload_bytes', '上传的PDF大小(字节)', ('method',), BYTES_BUCKETS))
+UPLOAD_SECONDS = registry.register(Histogram('pdf2zh_upload_seconds', '接收并保存上传文件的耗时, base64方式包括解码', ('method',)))
+ENV_RESOLVE_SECONDS = registry.register(Histogram('pdf2zh_env_resolve_seconds', '解析(必要时创建/安装)翻译引擎虚拟环境的耗时', ('engine', 'cached')))
+ENGINE_SECONDS = registry.register(Histogram('pdf2zh_engine_seconds', '翻译引擎的运行时间', ('engine', 'service', 'status')))
+ARTIFACT_SECONDS = registry.register(Histogram('pdf2zh_artifact_seconds', '生成文件(裁剪, 拼接, 拆分等)的耗时', ('artifact',)))
+ARTIFACT_BYTES = registry.register(Histogram('pdf2zh_artifact_bytes', '生成文件的大小(字节)', ('artifact',), BYTES_BUCKETS))
+QUEUE_WAIT_SECONDS = registry.register(Histogram('pdf2zh_queue_wait_seconds', '任务提交后排队等待执行的时间', ('key',)))
+CACHE_LOOKUPS = registry.register(Counter('pdf2zh_result_cache_lookups_total', '查询翻译结果缓存的次数', ('result',)))
+FAILURES = registry.register(Counter('pdf2zh_failures_total', '失败的请求和任务数, errorType 与返回给客户端的相同', ('endpoint', 'errorType')))
+
+def observe_upload(method, size, seconds):
+    UPLOAD_BYTES.observe(size, method=method)
+    UPLOAD_SECONDS.observe(seconds, method=method)
+
+# paths 为单个路径或路径的 tuple
+def observe_artifact(name, seconds, paths=()):
+    if seconds is not None:
+        ARTIFACT_SECONDS.observe(seconds, artifact=name)
+    for path in paths if isinstance(paths, tuple) else (paths,):
+        if os.path.exists(path):
+            ARTIFACT_BYTES.observe(os.path.getsize(path), artifact=name)
+
+# 生成成功时记录耗时和文件大小
+@contextmanager
+def artifact_timer(name, path):
+    start = time.time()
+    yield
+    observe_artifact(name, time.time() - start, path)
+
+# 无论成功与否都记录耗时, status 为 success / error
+@contextmanager
+def timed(histogram, **labels):
+    start = time.time()
+    status = 'error'
+    try:
+        yield
+        status = 'success'
+    finally:
+        histogram.observe(time.time() - start, status=status, **labels)
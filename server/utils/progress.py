@@ -0,0 +1,62 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+import re
+
+# 从翻译引擎的输出中解析进度
+# pdf2zh 1.x (tqdm):        "Translating:  25%|████      | 3/12 [00:05<00:15,  1.70s/it]"
+# pdf2zh_next (rich进度条):  "Translate Paragraphs (1/1) ━━━━━━╸━━━━━━━ 21/40 0:00:12 0:00:11"
+
+_ANSI_RE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+_TQDM_RE = re.compile(r'(?:(?P<stage>[^|]*?):\s*)?(?P<percent>\d{1,3})%\|[^|]*\|\s*(?P<current>\d+)/(?P<total>\d+)')
+_RICH_RE = re.compile(r'^(?P<stage>.*?)\s*[━╸╺╾╼]+\s+(?:(?P<percent>\d{1,3})%\s+)?(?P<current>\d+)/(?P<total>\d+)')
+
+def parse_progress_line(line):
+    line = _ANSI_RE.sub('', line)
+    # 进度条刷新时使用 \r 覆盖同一行, 只取最后一段
+    for segment in reversed(line.split('\r')):
+        segment = segment.strip()
+        match = _TQDM_RE.search(segment) or _RICH_RE.search(segment)
+        if not match:
+            continue
+        current, total = int(match.group('current')), int(match.group('total'))
+        if match.group('percent') is not None:
+            percent = float(match.group('percent'))
+        else:
+            percent = round(current * 100.0 / total, 1) if total else 0.0
+        return {
+            'stage': (match.group('stage') or '').strip() or None,
+            'current': current,
+            'total': total,
+            'percent': min(percent, 100.0),
+        }
+    return None
+
+# 将某个任务(或某个分片)的引擎输出写入 RecordTracker
+# listeners 也会收到每一行输出(例如 autotune.ThrottleWatcher), 各分片共用同一个列表
+class ProgressReporter:
+    def __init__(self, tracker, record_id, shard=None, listeners=None):
+        self.tracker = tracker
+        self.record_id = record_id
+        self.shard = shard
+        self.listeners = listeners if listeners is not None else []
+
+    def on_line(self, line):
+        for listener in self.listeners:
+            listener(line)
+        fields = parse_progress_line(line) or {}
+        text = _ANSI_RE.sub('', line).strip()
+        if text:
+            fields['lastLine'] = text[-200:]
+        if fields:
+            self.tracker.update_progress(self.record_id, shard=self.shard, **fields)
+
+    # 服务端自身的处理阶段, 例如裁剪, 拼接
+    def stage(self, name):
+        self.tracker.update_progress(self.record_id, shard=self.shard, stage=name, current=None, total=None, percent=None)
+
+    def update(self, **fields):
+        self.tracker.update_progress(self.record_id, shard=self.shard, **fields)
+
+    def for_shard(self, shard):
+        return ProgressReporter(self.tracker, self.record_id, shard, self.listeners)
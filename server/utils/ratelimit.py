@@ -0,0 +1,85 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+from contextlib import contextmanager
+from threading import Condition
+import hashlib
+
+# 翻译服务的速率预算: 同一个翻译服务和同一个apiKey(服务商按key限流)的所有任务共用请求中设置的qps
+# 提交任务时先登记(expect), 任务开始时(在占用准入控制的名额之前)从剩余的预算中取出份额(lease), 结束后归还
+#   份额 = 剩余的预算 // (已登记但还没有开始的任务数 + 1), 至少为1; 同时提交的任务平分预算, 所有份额之和不超过预算
+# 引擎进程启动后无法修改qps, 因此预算已经全部分出时, 新任务等待其他任务归还(排队, 不占用准入控制的名额)
+# 没有apiKey的服务(免费服务, bing, google等)和 pdf2zh 1.x 不使用预算, 见 PDFTranslator._rate_budget_for
+
+def budget_key(service, api_key=''):
+    if not api_key:
+        return service
+    return f"{service}:{hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]}" # 不保存apiKey本身
+
+class RateBudget:
+    def __init__(self):
+        # key -> {'capacity': 预算, 'allocated': 已分出的份额, 'jobs': 正在使用的任务数, 'waiting': 等待预算的任务数, 'expected': 已登记还没有开始的任务数}
+        self.pools = {}
+        self.cond = Condition()
+
+    def _pool(self, key, rate):
+        return self.pools.setdefault(key, {'capacity': rate, 'allocated': 0, 'jobs': 0, 'waiting': 0, 'expected': 0})
+
+    # 提交任务时登记, 之后必须调用一次 lease 或 cancel
+    def expect(self, key, rate):
+        with self.cond:
+            self._pool(key, rate)['expected'] += 1
+
+    def cancel(self, key):
+        with self.cond:
+            self.pools[key]['expected'] -= 1
+            self._cleanup(key)
+            self.cond.notify_all()
+
+    # rate 为本任务请求的速率(qps), 返回分到的份额(1 ~ rate); expected 表示之前已经调用过 expect
+    # 没有其他任务使用该预算时, 预算为本任务请求的 rate; on_wait 在需要等待时调用一次(不持有锁)
+    @contextmanager
+    def lease(self, key, rate, on_wait=None, expected=False):
+        waited = False
+        with self.cond:
+            pool = self._pool(key, rate)
+            if expected:
+                pool['expected'] -= 1
+            pool['waiting'] += 1
+            while True:
+                if not pool['jobs']:
+                    pool['capacity'] = rate
+                remaining = pool['capacity'] - pool['allocated']
+                if remaining >= 1:
+                    break
+                if on_wait and not waited:
+                    self.cond.release()
+                    try:
+                        on_wait()
+                    finally:
+                        self.cond.acquire()
+                    waited = True
+                    continue
+                self.cond.wait()
+            pool['waiting'] -= 1
+            others = pool['waiting'] + pool['expected'] # 之后还会从剩余预算中取份额的任务
+            share = min(rate, max(1, remaining // (others + 1)))
+            pool['allocated'] += share
+            pool['jobs'] += 1
+        try:
+            yield share
+        finally:
+            with self.cond:
+                pool['allocated'] -= share
+                pool['jobs'] -= 1
+                self._cleanup(key)
+                self.cond.notify_all()
+
+    def _cleanup(self, key):
+        pool = self.pools[key]
+        if not pool['jobs'] and not pool['waiting'] and not pool['expected']:
+            del self.pools[key]
+
+    def stats(self):
+        with self.cond:
+            return {key: dict(pool) for key, pool in self.pools.items()}
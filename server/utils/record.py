@@ -1,41 +1,185 @@
 ## server.py v3.0.17
 # guaguastandup
 # zotero-pdf2zh
-from threading import Lock
+from contextlib import contextmanager
+from threading import Lock, Condition
+import copy
 import datetime
+import json
+import os
+import sqlite3
+import time
 
 # 合并翻译记录和进度条目
 # 文件名 | 状态 | 进度 | 文件大小
-# TODO: 目前进度同步逻辑还没有完成
+# 翻译记录保存在 sqlite(WAL) 中, 服务重启后仍可查询; 按任务id, 输入文件哈希, 状态和创建时间建立索引
+# 进度由翻译引擎的输出解析而来(见 progress.py), 保存在内存中供 GET /jobs/<id>/events 等待, 并按 persist_interval 节流写入数据库
 
 class RecordTracker:
-    def __init__(self):
-        self.records = []   # 翻译记录条目
+    def __init__(self, db_path, max_progress=1000, persist_interval=2.0):
+        self.db_path = db_path
         self.progress = {}  # 翻译条目对应的进度
+        self.max_progress = max_progress
+        self.persist_interval = persist_interval
+        self.persisted_at = {} # record_id -> 上次写入数据库的时间
         self.records_lock = Lock()
         self.progress_lock = Lock()
+        self.progress_changed = Condition(self.progress_lock)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS records (
+                id TEXT PRIMARY KEY,
+                operation TEXT,
+                filename TEXT NOT NULL,
+                input_hash TEXT,
+                status TEXT NOT NULL,
+                config TEXT,
+                files TEXT,
+                progress REAL,
+                progress_detail TEXT,
+                progress_version INTEGER NOT NULL DEFAULT 0,
+                error_message TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_records_input_hash ON records (input_hash)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_records_status ON records (status, created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_records_created_at ON records (created_at)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn: # 自动提交/回滚
+                yield conn
+        finally:
+            conn.close()
 
     # 当翻译指令到达时, 新增翻译记录
-    def add_record(self, filename, status, config_data, error_message=None): 
-        with self.records_lock:
-            record = {
-                'id': len(self.records) + 1,
-                'filename': filename,
-                'status': status,
-                'timestamp': datetime.datetime.now().isoformat(),
-                'config': config_data,
-                'error_message': error_message
-            }
-            self.records.append(record)
-            return record
-
-    def update_record(self, record_id, status, progress, error_message=None):
-        with self.records_lock:
-            for record in self.records:
-                if record['id'] == record_id:
-                    record['status'] = status               # 更新翻译状态
-                    record['progress'] = progress           # 更新进度
-                    record['error_message'] = error_message # 更新错误信息
-                    record['updated_at'] = datetime.datetime.now().isoformat()
-                    return record
-        return None
\ No newline at end of file
+    def add_record(self, filename, status, config_data, error_message=None, record_id=None, operation=None, input_hash=None, files=None):
+        now = datetime.datetime.now().isoformat()
+        with self.records_lock, self._connect() as conn:
+            if record_id is None:
+                record_id = str(conn.execute('SELECT COUNT(*) FROM records').fetchone()[0] + 1)
+            conn.execute('''INSERT OR REPLACE INTO records
+                (id, operation, filename, input_hash, status, config, files, error_message, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (record_id, operation, filename, input_hash, status, json.dumps(config_data, ensure_ascii=False),
+                 json.dumps(files or [], ensure_ascii=False), error_message, now, now))
+        return self.get_record(record_id)
+
+    # 记录不存在时返回 None
+    def update_record(self, record_id, status, progress, error_message=None, files=None):
+        with self.records_lock, self._connect() as conn:
+            cursor = conn.execute('''UPDATE records SET status = ?, progress = ?, error_message = ?,
+                files = COALESCE(?, files), updated_at = ? WHERE id = ?''',
+                (status, progress, error_message, json.dumps(files, ensure_ascii=False) if files is not None else None,
+                 datetime.datetime.now().isoformat(), record_id))
+            if cursor.rowcount == 0:
+                return None
+        return self.get_record(record_id)
+
+    def get_record(self, record_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM records WHERE id = ?', (record_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    # 按创建时间倒序分页查询, 可以按状态和输入文件哈希过滤
+    def list_records(self, page=1, page_size=20, status=None, input_hash=None):
+        where, params = [], []
+        if status:
+            where.append('status = ?')
+            params.append(status)
+        if input_hash:
+            where.append('input_hash = ?')
+            params.append(input_hash)
+        clause = ('WHERE ' + ' AND '.join(where)) if where else ''
+        with self._connect() as conn:
+            total = conn.execute(f'SELECT COUNT(*) FROM records {clause}', params).fetchone()[0]
+            rows = conn.execute(f'SELECT * FROM records {clause} ORDER BY created_at DESC LIMIT ? OFFSET ?',
+                                params + [page_size, (page - 1) * page_size]).fetchall()
+        return {
+            'page': page,
+            'pageSize': page_size,
+            'total': total,
+            'records': [self._to_dict(row) for row in rows],
+        }
+
+    # 服务启动时, 将上次异常退出时未完成的任务标记为 interrupted, 返回这些记录
+    def mark_interrupted(self):
+        with self.records_lock, self._connect() as conn:
+            rows = conn.execute("SELECT * FROM records WHERE status IN ('queued', 'running')").fetchall()
+            conn.execute("UPDATE records SET status = 'interrupted', error_message = ?, updated_at = ? WHERE status IN ('queued', 'running')",
+                         ('服务重启, 任务未完成', datetime.datetime.now().isoformat()))
+        return [self._to_dict(row) for row in rows]
+
+    @staticmethod
+    def _to_dict(row):
+        return {
+            'jobId': row['id'],
+            'operation': row['operation'],
+            'fileName': row['filename'],
+            'fileHash': row['input_hash'],
+            'status': row['status'],
+            'config': json.loads(row['config']) if row['config'] else None,
+            'fileList': json.loads(row['files']) if row['files'] else [],
+            'progress': json.loads(row['progress_detail']) if row['progress_detail'] else None,
+            'percent': row['progress'],
+            'errorMessage': row['error_message'],
+            'createdAt': row['created_at'],
+            'updatedAt': row['updated_at'],
+        }
+
+    # 更新进度并唤醒等待中的客户端; 分片翻译时每个分片单独记录, 总进度为各分片的平均值
+    def update_progress(self, record_id, shard=None, **fields):
+        with self.progress_changed:
+            entry = self.progress.get(record_id)
+            if entry is None:
+                entry = self.progress[record_id] = {'version': 0}
+                self._prune()
+            if shard is None:
+                entry.update(fields)
+            else:
+                shards = entry.setdefault('shards', {})
+                shards.setdefault(shard, {}).update(fields)
+                if 'lastLine' in fields:
+                    entry['lastLine'] = fields['lastLine']
+                count = max(entry.get('shardCount') or 0, len(shards))
+                entry['percent'] = round(sum(s.get('percent') or 0 for s in shards.values()) / count, 1)
+            entry['version'] += 1
+            entry['updatedAt'] = datetime.datetime.now().isoformat()
+            self.progress_changed.notify_all()
+
+            # 状态变化时立即写入, 其余的进度更新按时间间隔节流
+            now = time.time()
+            if 'status' not in fields and now - self.persisted_at.get(record_id, 0) < self.persist_interval:
+                return
+            self.persisted_at[record_id] = now
+            snapshot = copy.deepcopy(entry)
+        with self._connect() as conn:
+            # 多个线程同时写入时, 不用旧的进度覆盖新的进度
+            conn.execute('''UPDATE records SET progress = ?, progress_detail = ?, progress_version = ?, updated_at = ?
+                WHERE id = ? AND progress_version < ?''',
+                (snapshot.get('percent'), json.dumps(snapshot, ensure_ascii=False), snapshot['version'], snapshot['updatedAt'],
+                 record_id, snapshot['version']))
+
+    def get_progress(self, record_id):
+        with self.progress_lock:
+            entry = self.progress.get(record_id)
+            return copy.deepcopy(entry) if entry else None
+
+    # 等待进度版本号超过 version, 超时返回 None
+    def wait_progress(self, record_id, version, timeout):
+        with self.progress_changed:
+            changed = self.progress_changed.wait_for(
+                lambda: self.progress.get(record_id, {}).get('version', 0) > version, timeout)
+            return copy.deepcopy(self.progress[record_id]) if changed else None
+
+    # 只在内存中保留最近 max_progress 个任务的进度, 更早的进度可以从数据库中查询
+    def _prune(self):
+        while len(self.progress) > self.max_progress:
+            record_id = next(iter(self.progress))
+            del self.progress[record_id]
+            self.persisted_at.pop(record_id, None)
@@ -0,0 +1,58 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+import importlib.util
+import os
+import sys
+
+# 运行方式:
+#   dev:      Flask 自带的开发服务器(Werkzeug), 单进程, 与之前相同
+#   waitress: 单进程多线程, 支持 Windows; 所有请求共享同一个任务队列, 进程池和缓存
+#   gunicorn: 多进程(每个进程多线程), 仅限 Linux / macOS; 每个工作进程在 fork 之后创建自己的 app,
+#             翻译记录(sqlite), 上传文件(BlobStore)和翻译结果缓存保存在磁盘上, 由所有工作进程共享;
+#             任务队列, 准入控制, qps预算和相同请求的合并在各进程内存中, 不共享, 因此默认只使用一个工作进程
+# 同步接口(/translate 等)在整个翻译过程中占用一个线程, SSE 连接也一直占用一个线程, 因此线程数要比任务数多
+SERVE_MODES = ('dev', 'waitress', 'gunicorn')
+
+def serve_waitress(app, port, threads, max_body_bytes=0):
+    from waitress import serve
+    options = {'host': '0.0.0.0', 'port': port, 'threads': threads}
+    if max_body_bytes:
+        options['max_request_body_size'] = max_body_bytes
+    print(f"🚀 [Zotero PDF2zh Server] waitress 监听 0.0.0.0:{port}, 线程数: {threads}")
+    serve(app, **options)
+
+# create_app 在每个工作进程中调用一次, 返回 Flask app
+def serve_gunicorn(create_app, port, workers, threads, timeout=120):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'0.0.0.0:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread') # 长时间的同步请求和 SSE 连接只占用线程, 不阻塞工作进程的心跳
+            self.cfg.set('timeout', timeout)
+            self.cfg.set('keepalive', 5)
+
+        def load(self):
+            return create_app()
+
+    print(f"🚀 [Zotero PDF2zh Server] gunicorn 监听 0.0.0.0:{port}, 工作进程数: {workers}, 每个进程的线程数: {threads}")
+    if workers > 1:
+        print(f"⚠️ [Zotero PDF2zh Server] gunicorn 的 {workers} 个工作进程各自执行任务: 同时执行的任务数, 排队数, 各引擎的上限和qps预算都会乘以 {workers}, 相同的请求也只在同一进程内合并")
+    Application().run()
+
+# 0 表示使用 CPU 核数
+def worker_count(workers):
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+# gunicorn 不支持 Windows, 此时改用 waitress; 未安装对应的包时使用 dev
+def resolve_serve_mode(mode):
+    if mode == 'gunicorn' and sys.platform == 'win32':
+        print("⚠️ gunicorn 不支持 Windows, 改用 waitress 运行")
+        mode = 'waitress'
+    if mode != 'dev' and importlib.util.find_spec(mode) is None:
+        print(f"⚠️ 未安装 {mode}, 请先执行 pip install {mode}, 本次使用 Flask 开发服务器(dev)运行")
+        mode = 'dev'
+    return mode
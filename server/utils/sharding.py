@@ -0,0 +1,55 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+import math
+import os
+import fitz
+from .cropper import save_pdf
+
+# 长文档分片翻译: 按页拆分成若干个PDF, 分别交给翻译引擎并行翻译, 再按顺序拼接 mono / dual 文件
+# 每个分片放在单独的子目录中, 文件名与原文件相同, 因此引擎生成的文件名也与不分片时相同
+
+class PageSharder:
+    def __init__(self, shard_pages=0):
+        self.shard_pages = shard_pages # 每个分片的最大页数, 0 表示不分片
+
+    # 返回每个分片的页码范围 [(start, end), ...], 从0开始, 包含end; 各分片页数尽量平均
+    def plan(self, page_count):
+        if not self.shard_pages or page_count <= self.shard_pages:
+            return []
+        count = math.ceil(page_count / self.shard_pages)
+        size = math.ceil(page_count / count)
+        return [(start, min(start + size, page_count) - 1) for start in range(0, page_count, size)]
+
+    # 拆分 input_path, 返回各分片文件的路径; 不需要分片时返回空列表
+    def split(self, input_path, work_dir):
+        doc = fitz.open(input_path)
+        try:
+            ranges = self.plan(doc.page_count)
+            shard_paths = []
+            for i, (start, end) in enumerate(ranges):
+                shard_dir = os.path.join(work_dir, f"shard-{i:03d}")
+                os.makedirs(shard_dir, exist_ok=True)
+                shard_path = os.path.join(shard_dir, os.path.basename(input_path))
+                shard = fitz.open()
+                shard.insert_pdf(doc, from_page=start, to_page=end)
+                shard.save(shard_path, garbage=4, deflate=True)
+                shard.close()
+                shard_paths.append(shard_path)
+            if ranges:
+                print(f"✂️ 文档共 {doc.page_count} 页, 拆分为 {len(ranges)} 个分片: {[f'{s + 1}-{e + 1}' for s, e in ranges]}")
+            return shard_paths
+        finally:
+            doc.close()
+
+    # 按顺序拼接各分片的翻译结果
+    def concat(self, paths, output_path, save_profile='compact'):
+        output = fitz.open()
+        try:
+            for path in paths:
+                with fitz.open(path) as part:
+                    output.insert_pdf(part)
+            save_pdf(output, output_path, save_profile)
+        finally:
+            output.close()
+        return output_path
@@ -7,7 +7,11 @@ import subprocess
 import os
 import shutil
 import sys
+import time
 import traceback
+from threading import Lock
+from .worker_pool import EngineWorkerPool, WorkerStartError
+from .metrics import ENV_RESOLVE_SECONDS
 # e.g. "pdf2zh": { "conda": { "packages": [...], "python_version": "3.12" } }
 
 # TODO: 如果用户的conda/uv环境路径是自定义的, 需要支持自定义路径
@@ -16,6 +20,36 @@ import traceback
 def normalize_pkg_name(name: str) -> str:
     return name.lower().replace('_', '-').replace('.', '-')
 
+# 执行命令, 逐行转发 stderr 并回调 on_line(line) (用于解析进度), 返回完整的 stderr 输出
+def stream_process(cmd, on_line=None, **popen_kwargs):
+    popen_kwargs.setdefault('stdout', None)
+    process = subprocess.Popen(
+        cmd,
+        stderr=subprocess.PIPE,
+        text=True,
+        bufsize=1,
+        **popen_kwargs,
+    )
+    stderr_lines = []
+    if process.stderr:
+        for line in process.stderr:
+            stderr_lines.append(line)
+            sys.stderr.write(line)
+            sys.stderr.flush()
+            if on_line:
+                on_line(line)
+        process.stderr.close()
+    return_code = process.wait()
+    aggregated = ''.join(stderr_lines)
+    if return_code != 0:
+        raise subprocess.CalledProcessError(
+            returncode=return_code,
+            cmd=cmd,
+            output=None,
+            stderr=aggregated,
+        )
+    return aggregated
+
 class VirtualEnvManager:
     def __init__(self, config_path, env_name, default_env_tool, enable_mirror=True, skip_install=False, mirror_source=None):
         self.is_windows = platform.system() == "Windows"
@@ -23,14 +57,26 @@ class VirtualEnvManager:
         self.skip_install = skip_install
         self.mirror_source = mirror_source
 
+        self.config_mtime = os.path.getmtime(config_path)
         with open(config_path, 'r', encoding='utf-8') as f:
             self.env_configs = json.load(f)
 
+        # 已解析的环境: engine -> {envtool, envname, env_path, bin_dir, python_path, signature, ...}
+        # 只有 venv.json 中的 packages 或虚拟环境目录的 mtime 变化时才重新检查
+        self.resolved = {}
+        self.resolve_lock = Lock()
+
         self.env_name = env_name
         self.curr_envtool = None
         self.curr_envname = None
         self.default_env_tool = default_env_tool
         self.enable_mirror = enable_mirror
+
+        # pdf2zh_next 常驻工作进程, 0 表示不启用
+        self.worker_count = 0
+        self.worker_max_jobs = 0
+        self.worker_max_rss_mb = 0
+        self.worker_pools = {}
     
     """检查虚拟环境中是否安装了指定包"""
     def check_packages(self, engine, envtool, envname):
@@ -266,41 +312,118 @@ class VirtualEnvManager:
             print(f"Error locating Conda environment: {e}")
             return False
 
+    def _reload_configs_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.config_path)
+            if mtime == self.config_mtime:
+                return
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                self.env_configs = json.load(f)
+            self.config_mtime = mtime
+            print(f"🔍 检测到 {self.config_path} 已修改, 重新加载")
+        except Exception as e:
+            print(f"⚠️ 重新加载 {self.config_path} 失败: {e}")
+
+    # packages 列表 + 环境目录和 bin 目录的 mtime, 安装/卸载包时 bin 目录会发生变化
+    def _env_signature(self, engine, envtool, env_path, bin_dir):
+        packages = self.env_configs.get(engine, {}).get(envtool, {}).get('packages', [])
+        mtimes = []
+        for path in (env_path, bin_dir):
+            try:
+                mtimes.append(os.path.getmtime(path))
+            except OSError:
+                mtimes.append(None)
+        return json.dumps(packages), tuple(mtimes)
+
+    # 解析 engine 对应的虚拟环境, 首次检查成功后缓存结果, 避免每次翻译都执行 uv/conda 子进程
+    def resolve_env(self, engine):
+        start = time.time() # 包括等待其他线程解析的时间
+        with self.resolve_lock:
+            self._reload_configs_if_changed()
+            cached = self.resolved.get(engine)
+            if cached and self._env_signature(engine, cached['envtool'], cached['env_path'], cached['bin_dir']) == cached['signature']:
+                cached['hits'] += 1
+                ENV_RESOLVE_SECONDS.observe(time.time() - start, engine=engine, cached='true')
+                return cached
+
+            if not self.ensure_env(engine):
+                self.resolved.pop(engine, None)
+                return None
+            envtool, envname = self.curr_envtool, self.curr_envname
+            if envtool == 'uv':
+                env_path = os.path.abspath(envname)
+            elif envtool == 'conda':
+                env_path = self._get_conda_env_path(envname)
+                if not env_path:
+                    raise FileNotFoundError(f"无法自动定位 Conda 环境 '{envname}' 的路径。")
+            else:
+                raise ValueError(f"⚠️ 未知的环境工具: {envtool}")
+            bin_dir = os.path.join(env_path, 'Scripts' if self.is_windows else 'bin')
+            if not os.path.exists(bin_dir):
+                print(f"❌ 虚拟环境目录不存在: {bin_dir}")
+                raise FileNotFoundError(f"虚拟环境目录不存在: {bin_dir}")
+
+            resolved = {
+                'envtool': envtool,
+                'envname': envname,
+                'env_path': env_path,
+                'bin_dir': bin_dir,
+                'python_path': os.path.join(bin_dir, 'python.exe' if self.is_windows else 'python'),
+                'signature': self._env_signature(engine, envtool, env_path, bin_dir),
+                'resolved_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'resolve_seconds': round(time.time() - start, 3),
+                'hits': 0,
+            }
+            self.resolved[engine] = resolved
+            ENV_RESOLVE_SECONDS.observe(time.time() - start, engine=engine, cached='false')
+            print(f"✅ 已缓存 {engine} 的虚拟环境: {env_path} (耗时 {resolved['resolve_seconds']}s)")
+            return resolved
+
+    def status(self):
+        with self.resolve_lock:
+            status = {
+                engine: {k: v for k, v in info.items() if k != 'signature'}
+                for engine, info in self.resolved.items()
+            }
+            for engine, pool in self.worker_pools.items():
+                status.setdefault(engine, {})['workers'] = pool.status()
+            return status
+
+    def configure_workers(self, count, max_jobs=20, max_rss_mb=0):
+        self.worker_count = count
+        self.worker_max_jobs = max_jobs
+        self.worker_max_rss_mb = max_rss_mb
+
+    # 环境重新解析(例如更新了包)后, 旧的工作进程会被关闭, 使用新环境重新启动
+    def _worker_pool(self, engine, resolved, env):
+        if engine != 'pdf2zh_next' or not self.worker_count:
+            return None
+        with self.resolve_lock:
+            pool = self.worker_pools.get(engine)
+            if pool and pool.signature != resolved['signature']:
+                pool.shutdown()
+                pool = None
+            if pool is None:
+                pool = EngineWorkerPool(resolved['python_path'], self.worker_count, self.worker_max_jobs, self.worker_max_rss_mb, env)
+                pool.signature = resolved['signature']
+                self.worker_pools[engine] = pool
+                pool.prewarm()
+        return None if pool.disabled else pool
+
     # 在虚拟环境中执行
-    def execute_in_env(self, command):
+    def execute_in_env(self, command, on_line=None):
         engine = 'pdf2zh_next' if 'pdf2zh_next' in ' '.join(command).lower() else 'pdf2zh'
 
-        def _run(cmd, **popen_kwargs):
-            popen_kwargs.setdefault('stdout', None)
-            process = subprocess.Popen(
-                cmd,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                **popen_kwargs,
-            )
-            stderr_lines = []
-            if process.stderr:
-                for line in process.stderr:
-                    stderr_lines.append(line)
-                    sys.stderr.write(line)
-                    sys.stderr.flush()
-                process.stderr.close()
-            return_code = process.wait()
-            aggregated = ''.join(stderr_lines)
-            if return_code != 0:
-                raise subprocess.CalledProcessError(
-                    returncode=return_code,
-                    cmd=cmd,
-                    output=None,
-                    stderr=aggregated,
-                )
-            return aggregated
-
-        if not self.ensure_env(engine):
+        try:
+            resolved = self.resolve_env(engine)
+        except FileNotFoundError as e:
+            print(f"❌ 环境的可执行文件未找到: {e}")
+            print(f"请检查虚拟环境是否正确安装: {self.curr_envname}")
+            raise
+        if not resolved:
             print(f"❌ 无法找到或创建 {engine} 的虚拟环境，尝试直接执行命令...")
             try:
-                aggregated = _run(command)
+                aggregated = stream_process(command, on_line)
                 print(f"✅ 命令执行成功: {' '.join(command)}")
                 return aggregated
             except subprocess.CalledProcessError:
@@ -311,22 +434,23 @@ class VirtualEnvManager:
                 raise
 
         try:
-            if self.curr_envtool == 'uv':
-                bin_dir = os.path.join(self.curr_envname, 'Scripts' if self.is_windows else 'bin')
-            elif self.curr_envtool == 'conda':
-                env_full_path = self._get_conda_env_path(self.curr_envname)
-                if not env_full_path:
-                    raise FileNotFoundError(f"无法自动定位 Conda 环境 '{self.curr_envname}' 的路径。")
-                bin_dir = os.path.join(env_full_path, 'Scripts' if self.is_windows else 'bin')
-                if not os.path.exists(bin_dir):
-                    print(f"❌ 虚拟环境目录不存在: {bin_dir}")
-                    raise FileNotFoundError(f"虚拟环境目录不存在: {bin_dir}")
-            else:
-                raise ValueError(f"⚠️ 未知的环境工具: {self.curr_envtool}")
-
+            bin_dir = resolved['bin_dir']
             # --- 命令组装 (保留优点：优先可执行文件，并用-u强制无缓冲) ---
-            python_executable = 'python.exe' if self.is_windows else 'python'
-            python_path = os.path.join(bin_dir, python_executable)
+            python_path = resolved['python_path']
+
+            env = os.environ.copy()
+            env['PYTHONUNBUFFERED'] = '1'  # 再次确保无缓冲
+            env['PATH'] = bin_dir + os.pathsep + env.get('PATH', '')
+
+            pool = self._worker_pool(engine, resolved, env) if command[0].lower() == 'pdf2zh_next' else None
+            if pool:
+                try:
+                    print(f"🔥 使用常驻工作进程执行: {' '.join(command)}\n")
+                    aggregated = pool.run(command[1:], on_line)
+                    print(f"✅ 命令执行成功: {' '.join(command)}")
+                    return aggregated
+                except WorkerStartError as e:
+                    print(f"⚠️ {e}\n⚠️ 回退到启动新进程的方式执行")
 
             # 直接执行
             if command[0].lower() in ['pdf2zh', 'pdf2zh_next']:
@@ -347,12 +471,7 @@ class VirtualEnvManager:
 
             # 虚拟环境之行
             print(f"🚀 在虚拟环境中执行命令: {' '.join(cmd)}\n")
-            # --- 环境变量设置 (保留优点) ---
-            env = os.environ.copy()
-            env['PYTHONUNBUFFERED'] = '1'  # 再次确保无缓冲
-            env['PATH'] = bin_dir + os.pathsep + env.get('PATH', '')
-
-            aggregated = _run(cmd, env=env)
+            aggregated = stream_process(cmd, on_line, env=env)
             print()
             print(f"✅ 命令执行成功: {' '.join(cmd)}")
             return aggregated
@@ -361,7 +480,7 @@ class VirtualEnvManager:
             raise
         except FileNotFoundError as e:
             print(f"❌ 环境的可执行文件未找到: {e}")
-            print(f"请检查虚拟环境是否正确安装: {self.curr_envname}")
+            print(f"请检查虚拟环境是否正确安装: {resolved['envname']}")
             raise
         except Exception as e:
             print(f"❌ 执行命令出错: {e}")
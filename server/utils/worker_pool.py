@@ -0,0 +1,175 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+from threading import Lock, Semaphore, Thread
+import json
+import os
+import queue
+import subprocess
+import sys
+import uuid
+
+# 常驻的 pdf2zh_next 工作进程池, 避免每次翻译都重新导入 babeldoc, 加载模型和字体
+# 每个工作进程同一时间只执行一个任务; 执行 max_jobs 个任务, 内存超过 max_rss_mb 或任务失败后会被回收, 下次使用时重新启动
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'engine_worker.py')
+MARKER = '\x1ePDF2ZH_WORKER ' # 与 engine_worker.py 保持一致
+
+class WorkerStartError(RuntimeError):
+    pass
+
+class EngineWorker:
+    def __init__(self, python_path, env=None):
+        self.process = subprocess.Popen(
+            [python_path, '-u', WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1,
+            env=env,
+        )
+        self.jobs = 0
+        self.rss_mb = 0.0
+        lines = []
+        message = self._read_message(lines, None)
+        if not message or not message.get('ready'):
+            self.stop()
+            raise WorkerStartError(f"pdf2zh_next 工作进程启动失败:\n{''.join(lines)}")
+        self.pid = message.get('pid')
+        self.rss_mb = message.get('rssMb', 0.0)
+
+    def alive(self):
+        return self.process.poll() is None
+
+    # 逐行读取工作进程的输出并转发到 stderr, 直到读到结果行; 工作进程退出时返回 None
+    def _read_message(self, lines, on_line):
+        for line in self.process.stderr:
+            if line.startswith(MARKER):
+                return json.loads(line[len(MARKER):])
+            lines.append(line)
+            sys.stderr.write(line)
+            sys.stderr.flush()
+            if on_line:
+                on_line(line)
+        return None
+
+    def run(self, args, on_line=None):
+        task_id = uuid.uuid4().hex
+        self.process.stdin.write(json.dumps({'id': task_id, 'args': args}) + '\n')
+        self.process.stdin.flush()
+        lines = []
+        message = self._read_message(lines, on_line)
+        self.jobs += 1
+        if message is None: # 工作进程崩溃
+            returncode = self.process.wait()
+            return returncode or -1, ''.join(lines)
+        self.rss_mb = message.get('rssMb', self.rss_mb)
+        return message.get('returncode', 1), ''.join(lines)
+
+    def stop(self):
+        try:
+            self.process.stdin.close() # 工作进程读到EOF后自行退出
+            self.process.wait(timeout=10)
+        except Exception:
+            self.process.kill()
+
+class EngineWorkerPool:
+    def __init__(self, python_path, size=1, max_jobs=20, max_rss_mb=0, env=None):
+        self.python_path = python_path
+        self.size = max(1, int(size))
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb   # 0 表示不限制
+        self.env = env
+        self.idle = queue.LifoQueue()  # 优先复用最近使用过的进程
+        self.slots = Semaphore(self.size)
+        self.lock = Lock()
+        self.disabled = False          # 工作进程无法启动时, 回退到每次启动新的子进程
+        self.counters = {'jobs': 0, 'started': 0, 'recycled': 0, 'busy': 0}
+
+    # 在后台预先启动工作进程
+    def prewarm(self):
+        def _prewarm():
+            for _ in range(self.size - self.idle.qsize()):
+                try:
+                    self.idle.put(self._spawn())
+                except WorkerStartError as e:
+                    print(f"⚠️ {e}")
+                    return
+        Thread(target=_prewarm, daemon=True, name='pdf2zh-worker-prewarm').start()
+
+    def _spawn(self):
+        try:
+            worker = EngineWorker(self.python_path, self.env)
+        except WorkerStartError:
+            self.disabled = True
+            raise
+        with self.lock:
+            self.counters['started'] += 1
+        print(f"🔥 pdf2zh_next 工作进程已启动, pid: {worker.pid}")
+        return worker
+
+    # 与 subprocess 的行为一致: 返回 stderr 输出, 失败时抛出 CalledProcessError; 工作进程无法启动时抛出 WorkerStartError
+    def run(self, args, on_line=None):
+        self.slots.acquire()
+        try:
+            worker = None
+            while worker is None:
+                try:
+                    worker = self.idle.get_nowait()
+                    if not worker.alive():
+                        worker = None
+                except queue.Empty:
+                    worker = self._spawn()
+            with self.lock:
+                self.counters['busy'] += 1
+            try:
+                returncode, aggregated = worker.run(args, on_line)
+            finally:
+                with self.lock:
+                    self.counters['busy'] -= 1
+                    self.counters['jobs'] += 1
+            self._release(worker, healthy=returncode == 0)
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode=returncode, cmd=['pdf2zh_next'] + args, output=None, stderr=aggregated)
+            return aggregated
+        finally:
+            self.slots.release()
+
+    def _release(self, worker, healthy):
+        reason = None
+        if not healthy or not worker.alive():
+            reason = '任务失败'
+        elif self.max_jobs and worker.jobs >= self.max_jobs:
+            reason = f'已执行 {worker.jobs} 个任务'
+        elif self.max_rss_mb and worker.rss_mb > self.max_rss_mb:
+            reason = f'内存占用 {worker.rss_mb:.0f} MB'
+        elif self.idle.qsize() >= self.size:
+            reason = '空闲进程过多'
+        if reason is None:
+            self.idle.put(worker)
+            return
+        worker.stop()
+        with self.lock:
+            self.counters['recycled'] += 1
+        print(f"♻️ 回收 pdf2zh_next 工作进程 {worker.pid}: {reason}")
+
+    def shutdown(self):
+        while True:
+            try:
+                self.idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+    def status(self):
+        with self.lock:
+            counters = dict(self.counters)
+        return {
+            'python': self.python_path,
+            'size': self.size,
+            'idle': self.idle.qsize(),
+            'disabled': self.disabled,
+            **counters,
+        }
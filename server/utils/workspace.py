@@ -0,0 +1,69 @@
+## server.py v3.0.17
+# guaguastandup
+# zotero-pdf2zh
+from threading import Lock
+import os
+import shutil
+import time
+import uuid
+
+# 每个任务使用独立的工作目录(translated/.workspace/<id>), 输入文件, 引擎输出和裁剪结果都在其中生成
+# 任务成功后, 结果通过 os.replace 原子地移动到 translated/ 目录, 然后删除工作目录
+# 如果有正在执行的任务使用了相同的文件名, 新任务的文件名会加上前缀, 避免互相覆盖
+
+class Workspace:
+    def __init__(self, manager, path, file_name):
+        self.manager = manager
+        self.path = path
+        self.file_name = file_name
+        self.input_path = os.path.join(path, file_name)
+
+    # 将生成的文件移动到输出目录, 返回移动后的路径
+    def publish(self, paths):
+        published = []
+        for path in paths:
+            target = os.path.join(self.manager.output_folder, os.path.basename(path))
+            os.replace(path, target)
+            published.append(target)
+        return published
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.manager.release(self.file_name)
+
+class WorkspaceManager:
+    def __init__(self, output_folder, stale_seconds=24 * 3600):
+        self.output_folder = output_folder
+        # 放在输出目录内部, 保证 os.replace 不会跨文件系统(例如docker挂载的volume)
+        self.root = os.path.join(output_folder, '.workspace')
+        self.claims = set()
+        self.claims_lock = Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._remove_stale(stale_seconds)
+
+    def create(self, file_name):
+        workspace_id = uuid.uuid4().hex
+        file_name = os.path.basename(file_name)
+        with self.claims_lock:
+            if file_name in self.claims:
+                file_name = f"{workspace_id[:8]}_{file_name}"
+            self.claims.add(file_name)
+        path = os.path.join(self.root, workspace_id)
+        os.makedirs(path)
+        return Workspace(self, path, file_name)
+
+    def release(self, file_name):
+        with self.claims_lock:
+            self.claims.discard(file_name)
+
+    # 清理异常退出时遗留的工作目录
+    def _remove_stale(self, stale_seconds):
+        now = time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.isdir(path) and now - os.path.getmtime(path) > stale_seconds:
+                    shutil.rmtree(path, ignore_errors=True)
+                    print(f"🧹 [Zotero PDF2zh Server] 清理遗留的工作目录: {path}")
+            except OSError:
+                pass